@@ -1,19 +1,39 @@
 # app/__init__.py
+import click
 from sqlalchemy import or_
-from flask import Flask, jsonify, redirect, request, render_template, url_for, flash, session
+from flask import Flask, jsonify, redirect, request, render_template, url_for, flash, session, Response, stream_with_context, get_template_attribute, send_from_directory
 from functools import wraps
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime, timedelta
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from flask_apscheduler import APScheduler
-from flask_mail import Mail, Message
 from sqlalchemy import func
+from app.sharding import ShardedSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": ShardedSession})
 login = LoginManager()
 login.login_view = 'auth_login'
-mail = Mail()
-sched = APScheduler()
+
+
+class LazyMail:
+    """Flask-Mail, imported and bound to the app on the first message sent."""
+
+    def state(self):
+        from flask import current_app
+        if 'mail' not in current_app.extensions:
+            from flask_mail import Mail
+            Mail(current_app)
+        return current_app.extensions['mail']
+
+    def message(self, **kwargs):
+        self.state()
+        from flask_mail import Message
+        return Message(**kwargs)
+
+    def send(self, msg):
+        self.state().send(msg)
+
+
+mail = LazyMail()
 def admin_required(f):
     @wraps(f)
     @login_required
@@ -32,46 +52,59 @@ def rep_required(f):
         return f(*args, **kwargs)
     return decorated
     
-def create_app():
+def create_app(scheduler=None):
+    """
+    Build the app without touching the schema; run `flask --app run init-db`
+    (or `migrate`) first. Background jobs only start when `scheduler` is True
+    or, if it is None, when SCHEDULER_ENABLED is set.
+    """
     app = Flask(__name__)
     app.config.from_object("config.Config")
-    mail.init_app(app)
 
+    from app.engine import pool_options, sqlite_pragmas, apply_sqlite_pragmas
+    app.config.setdefault(
+        "SQLALCHEMY_ENGINE_OPTIONS",
+        pool_options(app.config["SQLALCHEMY_DATABASE_URI"], app.config)
+    )
     db.init_app(app)
     with app.app_context():
-        from app.models import User, Category, Item, Auction
-        db.create_all()
+        apply_sqlite_pragmas(db.engine, sqlite_pragmas(app.config))
     
     login.init_app(app)
 
-    sched.init_app(app)
-    sched.start()   
+    from app import metrics, slowlog, profiling, sharding
+    with app.app_context():
+        metrics.init_app(app, db.engine)
+        slowlog.init_app(app, db.engine)
+        sharding.init_app(app, db.engine)
+        profiling.init_app(app, db.engine)      # after sharding: shard engines are profiled too
+    from app import identity, passwords, membership, fragments, ratelimit
+    identity.init_app(app)
+    passwords.init_app(app)
+    membership.init_app(app)
+    fragments.init_app(app)
+    ratelimit.init_app(app)
+
+    @app.errorhandler(passwords.PoolSaturated)
+    def password_pool_saturated(e):
+        return (jsonify(error="Too many sign-ins right now, please retry shortly"), 503,
+                {"Retry-After": str(e.retry_after)})
+
+    @app.errorhandler(ratelimit.RateLimited)
+    def bids_rate_limited(e):
+        return (jsonify(ratelimit.error_body(e)), 429,
+                {"Retry-After": str(ratelimit.retry_after(e))})
+
     @login.user_loader
     def load_user(user_id):
-        from app.models import User
-        return User.query.get(int(user_id))   
+        return identity.load_user(user_id)
 
-    
-    @sched.task('interval', id='close_auctions', seconds=60, misfire_grace_time=120)
-    def close_expired_auctions():
-        now = datetime.utcnow()
-        expired = Auction.query.filter(
-            Auction.status=='open',
-            Auction.end_time <= now
-        ).all()
-        for a in expired:
-            top = (Bid.query
-                      .filter_by(auction_id=a.id)
-                      .order_by(Bid.amount.desc())
-                      .first())
-            if top and top.amount >= a.reserve_price:
-                usr = User.query.filter_by(username=top.bidder).first()
-                a.winner_id   = usr.id if usr else None
-                a.winning_bid = top.amount
-            else:
-                a.winning_bid = top.amount if top else None
-            a.status = 'closed'
-        db.session.commit()
+
+    if scheduler is None:
+        scheduler = app.config["SCHEDULER_ENABLED"]
+    if scheduler:
+        from app.jobs import start_scheduler
+        start_scheduler(app)
 
     @app.route("/auctions/open/<int:item_id>", methods=["GET","POST"])
     @login_required
@@ -118,23 +151,24 @@ def create_app():
     @app.route("/auctions/<int:auc_id>/detail", methods=["GET","POST"])
     @login_required
     def auction_detail(auc_id):
-        auction = Auction.query.get_or_404(auc_id)
+        from app.archive import auction_or_404
+        from app.compaction import bids_of
+        if request.method == "POST":
+            ratelimit.admit_bid(auc_id, current_user.username)
+        auction, BidTable = auction_or_404(auc_id)
         item    = auction.item
 
         def get_top_bid():
-            return (Bid.query
+            if auction.compacted_at is not None:
+                bids = bids_of(auction, BidTable, BidTable.amount)
+                return bids[0] if bids else None
+            return (BidTable.query
                         .filter_by(auction_id=auc_id)
-                        .order_by(Bid.amount.desc())
+                        .order_by(BidTable.amount.desc())
                         .first())
 
         if auction.status == 'open' and datetime.now() >= auction.end_time:
-            top = get_top_bid()
-            if top and top.amount >= auction.reserve_price:
-                auction.winner_id   = top.bidder_id
-                auction.winning_bid = top.amount
-            else:
-                auction.winning_bid = top.amount if top else None
-            auction.status = 'closed'
+            close_auction(auction)
             db.session.commit()
 
         top = get_top_bid()
@@ -207,7 +241,7 @@ def create_app():
                 prev_user = User.query.get(prev_bidder_id)
                 if prev_user and prev_user.email:
                     with app.app_context():
-                        msg = Message(
+                        msg = mail.message(
                             subject="You’ve been outbid!",
                             recipients=[prev_user.email]
                         )
@@ -263,95 +297,81 @@ def create_app():
 
             return redirect(url_for("auction_detail", auc_id=auc_id))
 
-        bids = (Bid.query
-                    .filter_by(auction_id=auc_id)
-                    .order_by(Bid.timestamp.desc())
-                    .all())
-
+        # the bid list is read only if its cached fragment is out of date
         return render_template(
             "auctions/detail.html",
             auction=        auction,
             item=           item,
-            bids=           bids,
+            bids_version=   fragments.bid_history_version(auction, BidTable),
+            load_bids=      lambda: bids_of(auction, BidTable, BidTable.timestamp),
             current_price=  current_price,
             highest_bidder= highest_bidder
         )
 
 
-
-    @app.route('/auctions', methods=['GET'])
-    def list_auctions():
-        status      = request.args.get('status')
-        title       = request.args.get('title')
-        description = request.args.get('description')
-        category_id = request.args.get('category_id', type=int)
-        min_price   = request.args.get('min_price',   type=float)
-        max_price   = request.args.get('max_price',   type=float)
-
-        q = Auction.query.join(Item)
+    # JSON list endpoints: Core row tuples straight to JSON text (app/rowjson.py)
+    from app.rowjson import RowEncoder
+    from app.models import Auction, Item, Bid, Question
+    auctions_json  = RowEncoder(Auction.id, Auction.item_id, Auction.seller_id, Auction.start_time,
+                                Auction.end_time, Auction.init_price, Auction.increment,
+                                Auction.reserve_price, Auction.status)
+    search_json    = RowEncoder(Auction.id, Auction.item_id, Item.title, Auction.init_price,
+                                Auction.status, names={'id': 'auction_id'})
+    seller_json    = RowEncoder(Auction.id, Auction.item_id, Auction.start_time, Auction.end_time,
+                                Auction.status, names={'id': 'auction_id'})
+    bids_json      = RowEncoder(Bid.id, Bid.bidder, Bid.amount, Bid.timestamp)
+    questions_json = RowEncoder(Question.id, Question.auction_id, Question.user_id,
+                                Question.question_text, Question.created_at,
+                                Question.answer_text, Question.answered_at,
+                                names={'user_id':       'asker_id',
+                                       'question_text': 'question',
+                                       'created_at':    'asked_at',
+                                       'answer_text':   'answer'})
+
+    def filter_auctions(stmt, args):
+        status      = args.get('status')
+        title       = args.get('title')
+        description = args.get('description')
+        category_id = args.get('category_id', type=int)
+        min_price   = args.get('min_price',   type=float)
+        max_price   = args.get('max_price',   type=float)
 
         if status in ('open', 'closed'):
-            q = q.filter(Auction.status == status)
+            stmt = stmt.where(Auction.status == status)
         if min_price is not None:
-            q = q.filter(Auction.init_price >= min_price)
+            stmt = stmt.where(Auction.init_price >= min_price)
         if max_price is not None:
-            q = q.filter(Auction.init_price <= max_price)
+            stmt = stmt.where(Auction.init_price <= max_price)
 
         if title:
-            q = q.filter(Item.title.ilike(f'%{title}%'))
+            stmt = stmt.where(Item.title.ilike(f'%{title}%'))
         if description:
-            q = q.filter(Item.description.ilike(f'%{description}%'))
+            stmt = stmt.where(Item.description.ilike(f'%{description}%'))
         if category_id:
-            q = q.filter(Item.category_id == category_id)        
-        all_aucs = q.all()
-        return jsonify([{
-            'id':            a.id,
-            'item_id':       a.item_id,
-            'seller_id':     a.seller_id,
-            'start_time':    a.start_time.isoformat(),
-            'end_time':      a.end_time.isoformat(),
-            'init_price':    a.init_price,
-            'increment':     a.increment,
-            'reserve_price': a.reserve_price,
-            'status':        a.status,
-        } for a in all_aucs]), 200
+            stmt = stmt.where(Item.category_id == category_id)
+        # every shard returns its part in id order; gather merges them
+        return stmt.order_by(Auction.id)
+
+    @app.route('/auctions', methods=['GET'])
+    def list_auctions():
+        stmt = filter_auctions(auctions_json.select().join(Item), request.args)
+        return auctions_json.response(sharding.gather(stmt, key=lambda r: r.id))
 
     
     @app.route('/auctions/search', methods=['GET'])
     def search_auctions():
-        q = Auction.query.join(Item)
-
-        title       = request.args.get('title')
-        category_id = request.args.get('category_id', type=int)
-        min_price   = request.args.get('min_price',   type=float)
-        max_price   = request.args.get('max_price',   type=float)
-        status      = request.args.get('status')
-
-        if title:
-            q = q.filter(Item.title.ilike(f'%{title}%'))
-        if category_id:
-            q = q.filter(Item.category_id == category_id)
-        if min_price is not None:
-            q = q.filter(Auction.init_price >= min_price)
-        if max_price is not None:
-            q = q.filter(Auction.init_price <= max_price)
-        if status in ('open','closed'):
-            q = q.filter(Auction.status == status)
-
-        results = q.all()
-        return jsonify([{
-            'auction_id': a.id,
-            'item_id':    a.item_id,
-            'title':      a.item.title,
-            'init_price': a.init_price,
-            'status':     a.status
-        } for a in results]), 200
+        # same filters as /auctions except description
+        args = request.args.copy()
+        args.pop('description', None)
+        stmt = filter_auctions(search_json.select().join(Item), args)
+        return search_json.response(sharding.gather(stmt, key=lambda r: r.id))
     
     @app.route('/auctions/<int:auc_id>', methods=['GET'])
     def get_auction(auc_id):
-        a = Auction.query.get_or_404(auc_id)
-        bids = Bid.query.filter_by(auction_id=auc_id)\
-                        .order_by(Bid.amount.desc()).all()
+        from app.archive import auction_or_404
+        from app.compaction import bids_of
+        a, BidTable = auction_or_404(auc_id)
+        bids = bids_of(a, BidTable, BidTable.amount)
         bid_list = [{
             'id':        b.id,
             'bidder':    b.bidder,
@@ -403,19 +423,11 @@ def create_app():
     @login_required
     def list_questions():
         aq = request.args.get('auction_id', type=int)
-        q = Question.query
+        stmt = questions_json.select()
         if aq is not None:
-            q = q.filter_by(auction_id=aq)
-        qs = q.order_by(Question.created_at).all()
-        return jsonify([{
-          'id':           ques.id,
-          'auction_id':   ques.auction_id,
-          'asker_id':     ques.user_id,
-          'question':     ques.question_text,
-          'asked_at':     ques.created_at.isoformat(),
-          'answer':       ques.answer_text,
-          'answered_at':  ques.answered_at and ques.answered_at.isoformat()
-        } for ques in qs]), 200   
+            stmt = stmt.where(Question.auction_id == aq)
+        return questions_json.response(
+            db.session.execute(stmt.order_by(Question.created_at)).all())
 
     @app.route('/questions/<int:q_id>', methods=['GET'])
     @login_required
@@ -465,11 +477,46 @@ def create_app():
         flash("Your reply has been posted.", "success")
         return redirect(url_for('rep_detail', id=current_user.id))
         
-    from app.models import User, Category, Item, Auction, Bid, Alert, Question
+    from app.models import User, Category, Item, Auction, Bid, Alert, Question, JobLease
+    from app.tasks import close_auction
+    from app import rollups
 
     @app.route("/users", methods=["GET"])
     def list_users():
-        return jsonify([u.username for u in User.query.all()]), 200
+        # the full dump; autocomplete should use /users/search
+        return jsonify(db.session.scalars(db.select(User.username)).all()), 200
+
+    @app.route("/users/search", methods=["GET"])
+    def search_users():
+        """
+        Usernames starting with ?q=, alphabetically, for autocomplete.
+        ?limit=<n>&after=<cursor from the previous page>. Reps and admins may
+        also search by ?field=full_name and get full names back.
+        """
+        from app import directory
+        prefix = request.args.get('q', '').strip()
+        if not prefix:
+            return jsonify(error="q required"), 400
+        field = request.args.get('field', 'username')
+        if field not in directory.FIELDS:
+            return jsonify(error=f"Unknown field {field!r}"), 400
+        staff = current_user.is_authenticated and (current_user.is_rep or current_user.is_admin)
+        if field != 'username' and not staff:
+            return jsonify(error="Forbidden"), 403
+
+        limit = min(request.args.get('limit', app.config["USER_SEARCH_LIMIT"], type=int),
+                    app.config["USER_SEARCH_MAX_LIMIT"])
+        try:
+            rows, nxt = directory.search(prefix, field, request.args.get('after') or None,
+                                         max(limit, 1))
+        except ValueError as e:
+            return jsonify(error=str(e)), 400
+        if staff:
+            results = [{'id': r.id, 'username': r.username, 'full_name': r.full_name}
+                       for r in rows]
+        else:
+            results = [{'username': r.username} for r in rows]
+        return jsonify(results=results, next=nxt), 200
     
     @app.route("/categories/create", methods=["GET","POST"])
     @login_required
@@ -508,15 +555,9 @@ def create_app():
 
     @app.route("/users/<string:username>/auctions", methods=["GET"])
     def user_auctions(username):
-        u = User.query.filter_by(username=username).first_or_404()
-        auctions = Auction.query.filter_by(seller_id=u.id).all()
-        return jsonify([{
-            "auction_id": a.id,
-            "item_id":    a.item_id,
-            "start_time": a.start_time.isoformat(),
-            "end_time":   a.end_time.isoformat(),
-            "status":     a.status
-        } for a in auctions]), 200
+        uid = db.first_or_404(db.select(User.id).where(User.username == username))
+        return seller_json.response(
+            db.session.execute(seller_json.select().where(Auction.seller_id == uid)).all())
 
     @app.route('/users/<string:username>/items', methods=['GET'])
     def user_items(username):
@@ -527,10 +568,10 @@ def create_app():
     @app.route("/users/<string:username>/bids", methods=["GET"])
     def user_bids(username):
         """
-        List all bids placed by this user across all auctions.
+        List all bids placed by this user across all auctions, archived ones included.
         """
-        bids = Bid.query.filter_by(bidder=username)\
-                        .order_by(Bid.timestamp.desc()).all()
+        from app.archive import bids_by_bidder
+        bids = bids_by_bidder(username)
         return jsonify([{
             "bid_id":      b.id,
             "auction_id":  b.auction_id,
@@ -682,9 +723,12 @@ def create_app():
             return render_template('auth/delete.html'), 400
 
         logout_user()
-        db.session.delete(user)
-        db.session.commit()
-        flash('Your account and all associated data have been removed.', 'success')
+        from app import purge
+        job = purge.submit('user', user.id, user.username, requested_by=user.id)
+        if job.status == 'done':
+            flash('Your account and all associated data have been removed.', 'success')
+        else:
+            flash('Your account and all associated data are being removed.', 'success')
         return redirect(url_for('home'))
     
     @app.route("/auth/check_username", methods=["GET"])
@@ -693,7 +737,7 @@ def create_app():
         if not uname:
             return jsonify(error="No username provided"), 400
 
-        taken = User.query.filter_by(username=uname).first() is not None
+        taken = uname in membership.USERNAMES
         return jsonify(available=not taken), 200
     
     @app.route("/auth/check_email", methods=["GET"])
@@ -701,7 +745,7 @@ def create_app():
         email = request.args.get("email", "").strip()
         if not email:
             return jsonify(error="No email provided"), 400
-        taken = User.query.filter_by(email=email).first() is not None
+        taken = email in membership.EMAILS
         return jsonify(available=not taken), 200
     
     
@@ -717,6 +761,9 @@ def create_app():
         user = User.query.filter_by(username=username).first()
         if user is None or not user.check_password(password):
             return render_template('auth/login.html'), 400
+        if user in db.session.dirty:                 # rehashed with the current method
+            db.session.commit()
+            identity.invalidate(user.id)
 
         login_user(user)
 
@@ -732,16 +779,9 @@ def create_app():
     def user_detail(id):
         user = User.query.get_or_404(id)
 
-        created_aucs = Auction.query.filter_by(seller_id=user.id).all()
-
-        participated = (
-            Auction.query
-                   .join(Bid, Bid.auction_id == Auction.id)
-                   .filter(Bid.bidder == user.username)
-                   .filter(Auction.seller_id != user.id)
-                   .distinct()
-                   .all()
-        )
+        from app import archive
+        created_aucs = archive.auctions_by_seller(user.id)
+        participated = archive.auctions_bid_on(user.username, exclude_seller_id=user.id)
 
         created_items = user.items
 
@@ -767,17 +807,10 @@ def create_app():
 
     @app.route("/auctions/<int:auction_id>/bids", methods=["GET"])
     def list_bids(auction_id):
-        Auction.query.get_or_404(auction_id)
-        bids = Bid.query.filter_by(auction_id=auction_id)\
-                        .order_by(Bid.amount.desc()).all()
-        return jsonify([
-            {
-                "id":        b.id,
-                "bidder":    b.bidder,
-                "amount":    b.amount,
-                "timestamp": b.timestamp.isoformat()
-            } for b in bids
-        ]), 200
+        from app.archive import auction_or_404
+        from app.compaction import bid_rows
+        auction, BidTable = auction_or_404(auction_id)
+        return bids_json.response(bid_rows(auction, BidTable, 'id', 'bidder', 'amount', 'timestamp'))
     
     @app.route("/auctions/<int:auction_id>/bid", methods=["POST"])
     def place_bid(auction_id):
@@ -794,6 +827,8 @@ def create_app():
         user = data.get("username")
         if not user:
             return jsonify(error="username required"), 400
+        # the body's username is only a claim here: bucket it with the client address
+        ratelimit.admit_bid(auction_id, f"{request.remote_addr}/{user}")
 
         auction = Auction.query.get_or_404(auction_id)
         now = datetime.utcnow()
@@ -898,19 +933,7 @@ def create_app():
         if a.status == "closed":
             return jsonify(message=f"Auction {auction_id} already closed"), 200
 
-        a.status = "closed"
-
-        top = (
-            Bid.query
-               .filter_by(auction_id=auction_id)
-               .order_by(Bid.amount.desc())
-               .first()
-        )
-        if top and top.amount >= a.reserve_price:
-            a.winning_bid = top.amount
-            winner = User.query.filter_by(username=top.bidder).first()
-            a.winner_id   = winner.id if winner else None
-
+        close_auction(a)
         db.session.commit()
         return jsonify(
             message     = f"Auction {auction_id} closed",
@@ -923,9 +946,10 @@ def create_app():
     def similar_auctions(auc_id):
         """
         Return auctions on similar items (same category) in the last 30 days,
-        excluding auction `auc_id` itself.
+        excluding auction `auc_id` itself (which may be archived).
         """
-        a = Auction.query.get_or_404(auc_id)
+        from app.archive import auction_or_404
+        a, _ = auction_or_404(auc_id)
     
         cutoff = datetime.utcnow() - timedelta(days=30)
     
@@ -940,6 +964,8 @@ def create_app():
               .order_by(Auction.start_time.desc())
               .all()
         )
+        # with sharding each shard's part comes back sorted; restore the overall order
+        sims.sort(key=lambda s: s.start_time, reverse=True)
     
         out = []
         for s in sims:
@@ -955,6 +981,21 @@ def create_app():
             })
         return jsonify(out), 200
     
+    @app.route('/auctions/<int:auc_id>/analytics', methods=['GET'])
+    def auction_analytics(auc_id):
+        """Price curve, bid velocity, time-to-close and auto-bid share for one auction."""
+        from app import analytics
+        from app.archive import auction_or_404
+        a, bid = auction_or_404(auc_id)
+        return jsonify(auction_id=auc_id, **analytics.for_auction(auc_id, type(a), bid)), 200
+
+    @app.route('/categories/<int:cat_id>/analytics', methods=['GET'])
+    def category_analytics(cat_id):
+        """The same bid analytics aggregated over every auction in a category."""
+        from app import analytics
+        Category.query.get_or_404(cat_id)
+        return jsonify(category_id=cat_id, **analytics.for_category(cat_id)), 200
+
     @app.route('/categories/<int:cat_id>', methods=['PUT'])
     @login_required
     def update_category(cat_id):
@@ -1012,19 +1053,11 @@ def create_app():
         item = Item.query.get_or_404(item_id)
 
         now = datetime.now()
+        closed_ids = []
         for auc in item.auctions:
             if auc.status == 'open' and now >= auc.end_time:
-                top = (Bid.query
-                        .filter_by(auction_id=auc.id)
-                        .order_by(Bid.amount.desc())
-                        .first())
-                if top and top.amount >= auc.reserve_price:
-                    winner = User.query.filter_by(username=top.bidder).first()
-                    auc.winner_id   = winner.id if winner else None
-                    auc.winning_bid = top.amount
-                else:
-                    auc.winning_bid = top.amount if top else None
-                auc.status = 'closed'
+                close_auction(auc, closed_ids)
+        rollups.record_sales(closed_ids)
         db.session.commit()
 
         return render_template("items/detail.html", item=item)
@@ -1043,7 +1076,10 @@ def create_app():
         if 'category_id' in data:
             if not Category.query.get(data['category_id']):
                 return jsonify(error="category_id not found"), 404
-            item.category_id = data['category_id']
+            # its sales are counted under the category: move them along
+            rollups.move_sales(lambda t: t.item_id == item.id,
+                               lambda: setattr(item, 'category_id', data['category_id']),
+                               dimensions=('category',))
         db.session.commit()
         resp = item.to_dict()
         resp['owner_id'] = item.owner_id
@@ -1056,6 +1092,78 @@ def create_app():
             return jsonify(error="Item not found"), 404
         return jsonify(item.to_dict()), 200
         
+    @app.cli.command("init-db")
+    def init_db_command():
+        """Create every table and index on an empty database."""
+        from app.schema import init_db
+        print(f"Created {init_db()} tables")
+
+    @app.cli.command("migrate")
+    def migrate_command():
+        """Add the tables, indexes and nullable columns an existing database is missing."""
+        from app.schema import migrate
+        changes = migrate()
+        for change in changes:
+            print(change)
+        print(f"{len(changes)} change(s) applied")
+
+    @app.cli.command("scheduler")
+    def scheduler_command():
+        """Run only the background jobs, in the foreground."""
+        import time
+        from app.jobs import release_leases, start_scheduler
+        scheduler = start_scheduler(app)
+        print("Scheduler running; Ctrl+C to stop")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            scheduler.shutdown()
+            with app.app_context():
+                release_leases()
+
+    @app.cli.command("archive")
+    @click.option("--days", type=int, default=None,
+                  help="Age of closed auctions to move (default ARCHIVE_AFTER_DAYS).")
+    def archive_command(days):
+        """Move old closed auctions with their bids and questions to the archive tables."""
+        from app.archive import archive_closed
+        moved = archive_closed(days)
+        print(", ".join(f"{n} {table}" for table, n in moved.items()) + " archived")
+
+    @app.cli.command("compact-bids")
+    @click.option("--min-run", type=int, default=None,
+                  help="Shortest ladder to compact (default BID_COMPACT_MIN_RUN).")
+    def compact_bids_command(min_run):
+        """Collapse auto-bid ladders of closed auctions into bid ranges."""
+        from app.compaction import compact_closed
+        done = compact_closed(min_run)
+        print(f"{done['bids']} bids in {done['ranges']} ranges "
+              f"from {done['auctions']} auctions compacted")
+
+    @app.cli.command("rebuild-rollups")
+    def rebuild_rollups_command():
+        """Recompute the sales-report rollups from auction history."""
+        print(f"Rebuilt rollups from {rollups.rebuild_rollups()} sales")
+
+    @app.route("/jobs", methods=["GET"])
+    @admin_required
+    def list_jobs():
+        from app.jobs import worker_id
+        now = datetime.utcnow()
+        return jsonify(
+            worker = worker_id(),
+            leases = [l.to_dict(now) for l in JobLease.query.order_by(JobLease.name)]
+        ), 200
+
+    @app.route("/metrics")
+    def metrics_endpoint():
+        if not app.config["METRICS_ENABLED"]:
+            return jsonify(error="Not Found"), 404
+        if not metrics.may_scrape():
+            return jsonify(error="Unauthorized"), 401
+        return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
     @app.route("/ping")
     def ping():
         return "pong", 200
@@ -1067,23 +1175,16 @@ def create_app():
             Auction.status == 'open',
             Auction.end_time <= now
         ).all()
+        closed_ids = []
         for auc in expired:
-            top = (Bid.query
-                    .filter_by(auction_id=auc.id)
-                    .order_by(Bid.amount.desc())
-                    .first())
-            if top and top.amount >= auc.reserve_price:
-                usr = User.query.filter_by(username=top.bidder).first()
-                auc.winner_id   = usr.id if usr else None
-                auc.winning_bid = top.amount
-            else:
-                auc.winning_bid = top.amount if top else None
-            auc.status = 'closed'
+            close_auction(auc, closed_ids)
         if expired:
+            rollups.record_sales(closed_ids)
             db.session.commit()
 
         items = Item.query.order_by(Item.id.desc()).all()
-        return render_template("index.html", items=items)
+        return render_template("index.html", items=items,
+                               versions=fragments.item_card_versions())
 
     @app.route('/browse', methods=['GET'])
     def browse():
@@ -1093,10 +1194,7 @@ def create_app():
         max_price    = request.args.get('max_price',   type=float)
         status       = request.args.get('status')
 
-        query = (
-            Item.query
-                .outerjoin(Auction, Auction.item_id == Item.id)
-        )
+        query = Item.query
 
         if q:
             query = query.filter(or_(
@@ -1107,17 +1205,26 @@ def create_app():
         if category_id:
             query = query.filter(Item.category_id == category_id)
 
+        # auction filters: items with at least one matching auction on any shard
+        matching = db.select(Auction.item_id).distinct()
         if min_price is not None:
-            query = query.filter(Auction.init_price >= min_price)
+            matching = matching.where(Auction.init_price >= min_price)
         if max_price is not None:
-            query = query.filter(Auction.init_price <= max_price)
+            matching = matching.where(Auction.init_price <= max_price)
         if status in ('open', 'closed'):
-            query = query.filter(Auction.status == status)
+            matching = matching.where(Auction.status == status)
 
+        if matching.whereclause is not None and not sharding.ROUTER.enabled:
+            query = query.filter(Item.id.in_(matching))
         items = query.order_by(Item.id.desc()).all()
+        if matching.whereclause is not None and sharding.ROUTER.enabled:
+            # the shards can't be joined from the main file: match ids in Python
+            ids   = {r.item_id for r in sharding.gather(matching)}
+            items = [i for i in items if i.id in ids]
         return render_template(
             'browse.html',
             items=items,
+            versions=fragments.item_card_versions(),
             q=q,
             categories=Category.query.order_by(Category.name).all(),
             selected_category=category_id,
@@ -1162,69 +1269,113 @@ def create_app():
         if current_user.id != id:
             return jsonify(error="Forbidden"), 403
 
-        success_filter = (
-            Auction.status == 'closed',
-            Auction.winning_bid != None,
-            Auction.winning_bid >= Auction.reserve_price
-        )
+        # optional ?start=YYYY-MM-DD&end=YYYY-MM-DD, read from the daily rollups
+        start = request.args.get('start') or None
+        end   = request.args.get('end')   or None
+        for d in (start, end):
+            if d:
+                try:
+                    datetime.strptime(d, "%Y-%m-%d")
+                except ValueError:
+                    return jsonify(error="start/end must be YYYY-MM-DD"), 400
 
-        total = (
-            db.session
-              .query(func.coalesce(func.sum(Auction.winning_bid), 0.0))
-              .filter(*success_filter)
-              .scalar()
+        return render_template(
+            'admin/detail.html',
+            total=rollups.total(start, end),
+            per_item=rollups.top('item', start=start, end=end),
+            per_category=rollups.top('category', start=start, end=end),
+            per_user=rollups.top('buyer', start=start, end=end),
+            best_items=rollups.top('item', 5, start, end),
+            best_buyers=rollups.top('buyer', 5, start, end),
+            start=start,
+            end=end
         )
 
-        per_item = (
-            db.session
-              .query(
-                  Item.title,
-                  func.coalesce(func.sum(Auction.winning_bid), 0.0).label('earnings')
-              )
-              .join(Auction, Auction.item_id == Item.id)
-              .filter(*success_filter)
-              .group_by(Item.id)
-              .order_by(func.sum(Auction.winning_bid).desc())
-              .all()
+    @app.route('/admin/export/<string:dataset>', methods=['GET'])
+    @admin_required
+    def admin_export(dataset):
+        """
+        Stream bids / auctions / sales as CSV (default) or NDJSON.
+          ?format=csv|ndjson  ?since_id=<last exported id>
+          ?start=<ISO datetime>  ?end=<ISO datetime>  ?limit=<rows>
+        """
+        from app import export
+        fmt = request.args.get('format', 'csv')
+        if dataset not in export.DATASETS:
+            return jsonify(error=f"Unknown dataset {dataset!r}"), 404
+        if fmt not in export.FORMATS:
+            return jsonify(error="format must be csv or ndjson"), 400
+        try:
+            start = request.args.get('start')
+            end   = request.args.get('end')
+            start = datetime.fromisoformat(start) if start else None
+            end   = datetime.fromisoformat(end)   if end   else None
+        except ValueError:
+            return jsonify(error="start/end must be ISO datetimes"), 400
+
+        since_id = request.args.get('since_id', type=int)
+        stmt = export.build_query(
+            dataset,
+            since_id = since_id,
+            start    = start,
+            end      = end,
+            limit    = request.args.get('limit', type=int)
         )
-
-        per_category = (
-            db.session
-              .query(
-                  Category.name,
-                  func.coalesce(func.sum(Auction.winning_bid), 0.0).label('earnings')
-              )
-              .join(Item, Item.category_id == Category.id)
-              .join(Auction, Auction.item_id == Item.id)
-              .filter(*success_filter)
-              .group_by(Category.id)
-              .all()
+        body = export.stream(stmt, fmt, app.config["EXPORT_CHUNK_SIZE"],
+                             limit=request.args.get('limit', type=int),
+                             ladders=export.build_ladders(dataset, since_id, start, end))
+        return Response(
+            stream_with_context(body),
+            mimetype=export.FORMATS[fmt],
+            headers={'Content-Disposition': f'attachment; filename={dataset}.{fmt}'}
         )
 
-        per_user = (
-            db.session
-              .query(
-                  User.username,
-                  func.coalesce(func.sum(Auction.winning_bid), 0.0).label('earnings')
-              )
-              .join(Auction, Auction.winner_id == User.id)
-              .filter(*success_filter)
-              .group_by(User.id)
-              .all()
+    @app.route('/admin/slow-queries', methods=['GET'])
+    @admin_required
+    def admin_slow_queries():
+        """Slow statements seen by this process, by total time. ?format=json"""
+        entries = slowlog.LOG.ranked(request.args.get('limit', type=int))
+        if request.args.get('format') == 'json':
+            return jsonify(
+                threshold_ms = app.config["SLOW_QUERY_MS"],
+                entries      = [dict(e, first_at=e['first_at'].isoformat(),
+                                        last_at=e['last_at'].isoformat()) for e in entries]
+            ), 200
+        return render_template(
+            "admin/slow_queries.html",
+            entries=entries,
+            threshold_ms=app.config["SLOW_QUERY_MS"]
         )
 
-        best_items  = per_item[:5]
-        best_buyers = per_user[:5]
+    @app.route('/admin/slow-queries/reset', methods=['POST'])
+    @admin_required
+    def admin_slow_queries_reset():
+        slowlog.LOG.clear()
+        return redirect(url_for('admin_slow_queries'))
 
-        return render_template(
-            'admin/detail.html',
-            total=total,
-            per_item=per_item,
-            per_category=per_category,
-            per_user=per_user,
-            best_items=best_items,
-            best_buyers=best_buyers
-        )
+    @app.route('/admin/profiles', methods=['GET'])
+    @admin_required
+    def admin_profiles():
+        """Requests profiled with X-Profile / ?_profile=, newest first."""
+        return jsonify(profiles=profiling.saved_profiles(app.config["PROFILE_DIR"])), 200
+
+    @app.route('/admin/profiles/<string:name>', methods=['GET'])
+    @admin_required
+    def admin_profile_file(name):
+        """Download a saved profile; ?format=text prints a .prof with pstats."""
+        folder = app.config["PROFILE_DIR"]
+        if name.endswith('.prof') and request.args.get('format') == 'text':
+            import io, os, pstats
+            from werkzeug.security import safe_join
+            path = safe_join(folder, name)
+            if path is None or not os.path.exists(path):
+                return jsonify(error="Not Found"), 404
+            out = io.StringIO()
+            stats = pstats.Stats(path, stream=out)
+            stats.sort_stats(request.args.get('sort', 'cumulative')).print_stats(
+                request.args.get('limit', 50, type=int))
+            return Response(out.getvalue(), mimetype='text/plain')
+        return send_from_directory(folder, name, as_attachment=True)
 
     @app.route('/admin/create', methods=['GET','POST'])
     @admin_required
@@ -1261,29 +1412,39 @@ def create_app():
         if current_user.id != id and not current_user.is_admin:
             return jsonify(error="Forbidden"), 403
 
-        users = User.query.filter(
-            User.is_rep == False,
-            User.is_admin == False
-        ).all()
-
-        bids = Bid.query.order_by(Bid.timestamp.desc()).all()
-        auctions = Auction.query.order_by(Auction.start_time.desc()).all()
-
-        from app.models import Question
-        questions = (
-            Question.query
-                    .order_by(Question.created_at.desc())
-                    .all()
-        )
+        # only the first page of each panel; the rest comes from rep_panel
+        from app import dashboard
+        limit = app.config["REP_PAGE_SIZE"]
+        pages = {}
+        for name in dashboard.PANELS:
+            items, nxt = dashboard.page(name, request.args, limit)
+            pages[name] = {'rows': items, 'next': nxt}
 
         return render_template(
             'rep/detail.html',
-            users=users,
-            bids=bids,
-            auctions=auctions,
-            questions=questions
+            pages=pages,
+            counts=dashboard.summary_counts()
         )
-        
+
+    @app.route('/rep/api/<string:panel>', methods=['GET'])
+    @rep_required
+    def rep_panel(panel):
+        """
+        One page of a dashboard panel (users, bids, auctions, questions, unanswered).
+        ?after=<cursor from the previous page>&limit=<n> plus the panel's filters.
+        """
+        from app import dashboard
+        if panel not in dashboard.PANELS:
+            return jsonify(error=f"Unknown panel {panel!r}"), 404
+        limit = min(request.args.get('limit', app.config["REP_PAGE_SIZE"], type=int), 200)
+        items, nxt = dashboard.page(panel, request.args, limit)
+        rows = get_template_attribute('rep/_panels.html', 'rows')
+        return jsonify(
+            ids  = [i.id for i in items],
+            html = str(rows(panel, items)),
+            next = nxt
+        ), 200
+
     @app.route('/rep/edit_user/<string:username>', methods=['GET','POST'])
     @rep_required
     def rep_edit_user(username):
@@ -1298,6 +1459,7 @@ def create_app():
                 flash("Invalid date format; use YYYY-MM-DD.", "danger")
                 return redirect(request.url)
             db.session.commit()
+            identity.invalidate(user.id)
             flash(f"User {username!r} updated.", "success")
             return redirect(url_for('rep_detail', id=current_user.id))
         return render_template('rep/edit_user.html', user=user)
@@ -1306,9 +1468,12 @@ def create_app():
     @rep_required
     def rep_delete_user(username):
         user = User.query.filter_by(username=username).first_or_404()
-        db.session.delete(user)
-        db.session.commit()
-        flash(f"User {username!r} deleted.", "info")
+        from app import purge
+        job = purge.submit('user', user.id, username, requested_by=current_user.id)
+        if job.status == 'done':
+            flash(f"User {username!r} deleted.", "info")
+        else:
+            flash(f"Deleting user {username!r} (job {job.id}).", "info")
         return redirect(url_for('rep_detail', id=current_user.id))
     
     @app.route('/rep/reset_password/<string:username>', methods=['POST'])
@@ -1321,6 +1486,7 @@ def create_app():
         user = User.query.filter_by(username=username).first_or_404()
         user.set_password(new_p)
         db.session.commit()
+        identity.invalidate(user.id)
         return jsonify(message=f"Password for {username} reset"), 200
     
     @app.route('/rep/remove_bid/<int:bid_id>', methods=['POST'])
@@ -1336,9 +1502,19 @@ def create_app():
     @rep_required
     def rep_remove_auction(auction_id):
         auc = Auction.query.get_or_404(auction_id)
-        db.session.delete(auc)
-        db.session.commit()
+        from app import purge
+        purge.submit('auction', auc.id, f"auction #{auc.id}", requested_by=current_user.id)
         return redirect(url_for('rep_detail', id=current_user.id))
+
+    @app.route('/rep/deletions/<int:job_id>', methods=['GET'])
+    @rep_required
+    def rep_deletion(job_id):
+        """Progress of a user/auction deletion: status, current step, rows per step."""
+        from app.models import PurgeJob
+        job = db.session.get(PurgeJob, job_id)
+        if job is None:
+            return jsonify(error="Deletion job not found"), 404
+        return jsonify(job.to_dict()), 200
     @app.route('/qna', methods=['GET','POST'])
     @login_required
     def qna():
@@ -1350,6 +1526,7 @@ def create_app():
                    .order_by(Auction.id.desc())
                    .all()
         )
+        auctions.sort(key=lambda a: a.id, reverse=True)   # shards come back one by one
 
         if request.method == 'POST':
             auction_id = request.form.get('auction_id', type=int)
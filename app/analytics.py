@@ -0,0 +1,199 @@
+# app/analytics.py
+"""
+Vectorized bid analytics.
+
+An auction's (or a whole category's) bids are pulled with one columnar select
+and turned into NumPy arrays; price curves, bid velocity, time-to-close and
+the auto-bid share are then computed with array ops instead of walking ORM
+`Bid` objects. Results are cached per auction/category and reused until a new
+bid changes the (count, max id) version of that scope. Archived auctions
+(app/archive.py) are read from the archive tables, and compacted auto-bid
+ladders (app/compaction.py) are expanded back into the arrays.
+"""
+import heapq
+
+import numpy as np
+from sqlalchemy import select, func
+
+from app import db
+from app.cache import LRUCache
+from app.compaction import expand
+from app.models import Auction, ArchivedAuction, ArchivedBid, Bid, BidRange, Item
+
+_cache = LRUCache(maxsize=512)
+
+PERCENTILES = (50, 90, 99)
+
+
+SOURCES = ((Auction, Bid), (ArchivedAuction, ArchivedBid))
+
+
+def _scope(stmt, auction_id=None, category_id=None, auction=Auction, model=Bid):
+    if auction_id is not None:
+        return stmt.where(model.auction_id == auction_id)
+    return (stmt.join(auction, auction.id == model.auction_id)
+                .join(Item, Item.id == auction.item_id)
+                .where(Item.category_id == category_id))
+
+
+def bids_version(auction_id=None, category_id=None, sources=SOURCES):
+    rows = []
+    for auction, bid in sources:
+        stmt = _scope(select(func.count(bid.id), func.max(bid.id)),
+                      auction_id, category_id, auction, bid)
+        # a category spans every shard: one (count, max) row each
+        rows += db.session.execute(stmt).all()
+    return (sum(n for n, _ in rows),
+            max((m for _, m in rows if m is not None), default=None))
+
+
+def _ladders(auction_id=None, category_id=None, auction=Auction):
+    """Compacted auto-bid steps in scope, expanded into rows shaped like load_bids'."""
+    stmt = select(BidRange.__table__, auction.increment, auction.start_time, auction.end_time)
+    if auction_id is not None:
+        stmt = stmt.join(auction, auction.id == BidRange.auction_id) \
+                   .where(BidRange.auction_id == auction_id)
+    else:
+        stmt = _scope(stmt, category_id=category_id, auction=auction, model=BidRange)
+    return [(b.id, b.auction_id, b.bidder, b.amount, b.max_bid, b.timestamp,
+             r.increment, r.start_time, r.end_time)
+            for r in db.session.execute(stmt) for b in expand(r)]
+
+
+def load_bids(auction_id=None, category_id=None, sources=SOURCES):
+    """All bids in scope as a dict of column arrays, ordered by (auction, id)."""
+    parts = []
+    for auction, bid in sources:
+        stmt = select(bid.id, bid.auction_id, bid.bidder, bid.amount, bid.max_bid, bid.timestamp,
+                      auction.increment, auction.start_time, auction.end_time)
+        if auction_id is not None:
+            stmt = stmt.join(auction, auction.id == bid.auction_id) \
+                       .where(bid.auction_id == auction_id)
+        else:
+            stmt = _scope(stmt, category_id=category_id, auction=auction, model=bid)
+        parts.append(db.session.execute(stmt.order_by(bid.auction_id, bid.id)).all())
+        ladders = _ladders(auction_id, category_id, auction)
+        if ladders:
+            parts[-1] = sorted([*parts[-1], *ladders], key=lambda row: (row[1], row[0]))
+    # live and archived auctions are disjoint, each part already in (auction, id) order
+    rows = list(heapq.merge(*parts, key=lambda row: (row[1], row[0])))
+
+    cols = list(zip(*rows)) if rows else [()] * 9
+    _, auction, bidder, amount, max_bid, ts, inc, start, end = cols
+    as_seconds = lambda v: np.array(v, dtype='datetime64[us]').astype(np.int64) / 1e6
+    return {
+        'auction':   np.array(auction, dtype=np.int64),
+        'bidder':    np.unique(np.array(bidder, dtype=object), return_inverse=True)[1]
+                     if rows else np.array([], dtype=np.int64),
+        'amount':    np.array(amount, dtype=np.float64),
+        'max_bid':   np.array([np.nan if m is None else m for m in max_bid], dtype=np.float64),
+        'ts':        as_seconds(ts),
+        'increment': np.array(inc, dtype=np.float64),
+        'start':     as_seconds(start),
+        'end':       as_seconds(end),
+    }
+
+
+def auto_bid_mask(b):
+    """
+    Rows that look like proxy steps: same auction as the previous bid, a
+    different bidder, a max_bid on file and exactly one increment higher.
+    """
+    n = len(b['amount'])
+    mask = np.zeros(n, dtype=bool)
+    if n < 2:
+        return mask
+    mask[1:] = ((b['auction'][1:] == b['auction'][:-1])
+                & (b['bidder'][1:] != b['bidder'][:-1])
+                & ~np.isnan(b['max_bid'][1:])
+                & np.isclose(np.diff(b['amount']), b['increment'][1:]))
+    return mask
+
+
+def _percentiles(values):
+    if not len(values):
+        return {f'p{p}': None for p in PERCENTILES}
+    return {f'p{p}': float(v) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+
+
+def _histogram(values, bins):
+    if not len(values):
+        return {'edges': [], 'counts': []}
+    counts, edges = np.histogram(values, bins=bins)
+    return {'edges': edges.round(3).tolist(), 'counts': counts.tolist()}
+
+
+def auction_stats(b, bins=20):
+    n        = len(b['amount'])
+    elapsed  = b['ts'] - b['start']
+    to_close = b['end'] - b['ts']
+    duration = float(b['end'][0] - b['start'][0]) if n else 0.0
+    gaps     = np.diff(b['ts'])
+    auto     = auto_bid_mask(b)
+    return {
+        'bids': n,
+        'price_curve': {
+            'seconds': elapsed.round(3).tolist(),
+            'price':   np.maximum.accumulate(b['amount']).tolist() if n else [],
+        },
+        'velocity': {
+            'bids_per_hour':     n / (duration / 3600) if duration > 0 else None,
+            'histogram':         _histogram(elapsed, bins),
+            'inter_bid_seconds': _percentiles(gaps),
+        },
+        'time_to_close': {
+            'seconds':   _percentiles(to_close),
+            'histogram': _histogram(to_close, bins),
+        },
+        'auto_bid_share': float(auto.mean()) if n else 0.0,
+    }
+
+
+def category_stats(b, bins=20):
+    n = len(b['amount'])
+    if not n:
+        return {'auctions': 0, 'bids': 0}
+    # boundaries of each auction's run in the (auction, id)-sorted arrays
+    starts   = np.flatnonzero(np.r_[True, b['auction'][1:] != b['auction'][:-1]])
+    counts   = np.diff(np.r_[starts, n])
+    lasts    = starts + counts - 1
+    final    = np.maximum.reduceat(b['amount'], starts)
+    duration = b['end'][starts] - b['start'][starts]
+    rate     = np.divide(counts, duration / 3600, out=np.full(len(counts), np.nan),
+                         where=duration > 0)
+    return {
+        'auctions': int(len(starts)),
+        'bids':     n,
+        'final_price':         _percentiles(final),
+        'bids_per_auction':    _percentiles(counts),
+        'bids_per_hour':       _percentiles(rate[~np.isnan(rate)]),
+        'time_to_close': {
+            'all_bids':  _percentiles(b['end'] - b['ts']),
+            'last_bid':  _percentiles(b['end'][lasts] - b['ts'][lasts]),
+            'histogram': _histogram(b['end'] - b['ts'], bins),
+        },
+        'auto_bid_share': float(auto_bid_mask(b).mean()),
+    }
+
+
+def _cached(key, version, compute):
+    hit = _cache.get(key)
+    if hit and hit[0] == version:
+        return hit[1]
+    result = compute()
+    _cache.set(key, (version, result))
+    return result
+
+
+def for_auction(auction_id, auction=Auction, bid=Bid):
+    """`auction`/`bid`: the tables the auction is in (archive.auction_or_404)."""
+    sources = ((auction, bid),)
+    version = bids_version(auction_id=auction_id, sources=sources)
+    return _cached(('auction', auction_id), version,
+                   lambda: auction_stats(load_bids(auction_id=auction_id, sources=sources)))
+
+
+def for_category(category_id):
+    version = bids_version(category_id=category_id)
+    return _cached(('category', category_id), version,
+                   lambda: category_stats(load_bids(category_id=category_id)))
@@ -0,0 +1,130 @@
+# app/archive.py
+"""
+Hot/cold split of auction history.
+
+Auctions closed more than ARCHIVE_AFTER_DAYS ago are moved, with their bids
+and questions, from the live tables into auction_archive / bid_archive /
+question_archive (same columns, same ids). The live tables and their
+indexes then only hold recent history, which is what bidding, browsing and
+the close job scan.
+
+The move runs in chunks of ARCHIVE_CHUNK_SIZE auctions. Each chunk is one
+transaction, INSERT ... SELECT into the archive then DELETE from the live
+table, so a row is always in exactly one of the two places. The `archive`
+scheduler job runs it under its lease; `flask --app run archive` runs it by
+hand.
+
+Read paths use `auction_or_404` and the helpers below to fall back to the
+archive. Auction ids stay unique across both tables (the live tables are
+AUTOINCREMENT, so an archived id is never handed out again), and a link to
+an archived auction keeps working.
+"""
+from datetime import datetime, timedelta
+
+from flask import abort, current_app
+from sqlalchemy import select, insert, delete, literal
+
+from app import db, sharding
+from app.jobs import heartbeat
+from app.models import (Auction, Bid, Question, BidRange,
+                        ArchivedAuction, ArchivedBid, ArchivedQuestion)
+
+
+def _copy(src, dst, condition, **extra):
+    names = [c.name for c in src.__table__.columns]
+    cols  = [src.__table__.c[n] for n in names]
+    cols += [literal(v) for v in extra.values()]
+    return insert(dst).from_select(names + list(extra), select(*cols).where(condition))
+
+
+def archive_closed(days=None, chunk=None):
+    """Move auctions closed more than `days` ago; returns rows moved per table."""
+    days   = current_app.config["ARCHIVE_AFTER_DAYS"] if days is None else days
+    chunk  = chunk or current_app.config["ARCHIVE_CHUNK_SIZE"]
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    moved  = {'auctions': 0, 'bids': 0, 'questions': 0}
+    # one shard at a time: the chunks walk each shard's ids in order
+    for shard in sharding.ROUTER.shards():
+        with sharding.using(shard):
+            _archive_shard(cutoff, chunk, moved)
+
+    if moved['auctions']:
+        current_app.logger.info(
+            f"Archived {moved['auctions']} auctions closed before {cutoff:%Y-%m-%d} "
+            f"({moved['bids']} bids, {moved['questions']} questions)"
+        )
+    return moved
+
+
+def _archive_shard(cutoff, chunk, moved):
+    last = 0
+    while True:
+        ids = db.session.scalars(
+            select(Auction.id)
+            .where(Auction.status == 'closed', Auction.end_time < cutoff,
+                   Auction.id > last)
+            .order_by(Auction.id).limit(chunk)
+        ).all()
+        if not ids:
+            break
+        now = datetime.utcnow()
+        db.session.execute(_copy(Auction, ArchivedAuction, Auction.id.in_(ids), archived_at=now))
+        db.session.execute(_copy(Bid, ArchivedBid, Bid.auction_id.in_(ids)))
+        db.session.execute(_copy(Question, ArchivedQuestion, Question.auction_id.in_(ids)))
+        moved['bids']      += db.session.execute(delete(Bid).where(Bid.auction_id.in_(ids))).rowcount
+        moved['questions'] += db.session.execute(
+            delete(Question).where(Question.auction_id.in_(ids))).rowcount
+        moved['auctions']  += db.session.execute(delete(Auction).where(Auction.id.in_(ids))).rowcount
+        db.session.commit()
+        heartbeat()
+        last = ids[-1]
+
+
+def archive_job():
+    # scheduler entry point: a no-op when archival is switched off
+    if current_app.config["ARCHIVE_AFTER_DAYS"] > 0:
+        archive_closed()
+
+
+# ---- read fallbacks ----
+
+def auction_or_404(auction_id):
+    """(auction, bid model): the live auction, or its archived copy and ArchivedBid."""
+    a = db.session.get(Auction, auction_id)
+    if a is not None:
+        return a, Bid
+    a = db.session.get(ArchivedAuction, auction_id)
+    if a is None:
+        abort(404)
+    return a, ArchivedBid
+
+
+def auctions_by_seller(seller_id):
+    return (Auction.query.filter_by(seller_id=seller_id).all()
+            + ArchivedAuction.query.filter_by(seller_id=seller_id).all())
+
+
+def auctions_bid_on(username, exclude_seller_id):
+    """Auctions (live and archived) with a bid by `username`, not sold by them."""
+    out = []
+    for auction, bid in ((Auction, Bid), (ArchivedAuction, ArchivedBid)):
+        # compacted ladders (app/compaction.py) count as bids too
+        for table in (bid, BidRange):
+            out += [a for a in (auction.query
+                                       .join(table, table.auction_id == auction.id)
+                                       .filter(table.bidder == username,
+                                               auction.seller_id != exclude_seller_id)
+                                       .distinct()
+                                       .all())
+                    if a not in out]
+    return out
+
+
+def bids_by_bidder(username):
+    """Every bid by `username`, live, archived and compacted, newest first."""
+    from app.compaction import expand_all
+    ranges = BidRange.query.filter_by(bidder=username).order_by(BidRange.id)
+    bids = (Bid.query.filter_by(bidder=username).all()
+            + ArchivedBid.query.filter_by(bidder=username).all()
+            + list(expand_all(ranges)))
+    return sorted(bids, key=lambda b: b.timestamp or datetime.min, reverse=True)
@@ -0,0 +1,409 @@
+# app/asgi.py
+"""
+Async (ASGI) serving mode for the JSON API.
+
+The read/bid endpoints below run directly on the event loop against an async
+SQLAlchemy engine (aiosqlite for SQLite, aiomysql for MySQL), so a slow client
+only costs a coroutine instead of a worker thread. Every other path falls
+through to the regular Flask app via asgiref's WSGI adapter, so the HTML pages
+keep working unchanged.
+
+    uvicorn asgi:app
+
+A database without an installed async driver (aiomysql is not in
+requirements.txt, other dialects have none listed) is not an error: the whole
+app, JSON API included, is then served through the WSGI adapter.
+"""
+import asyncio
+import heapq
+import json
+import math
+import re
+import time
+from datetime import datetime
+from urllib.parse import parse_qs
+
+from asgiref.wsgi import WsgiToAsgi
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app import create_app, db, membership, metrics, ratelimit, sharding, slowlog
+from app.compaction import expand_all
+from app.engine import apply_sqlite_pragmas, sqlite_pragmas
+from app.models import Auction, ArchivedAuction, ArchivedBid, Bid, BidRange, Item, User
+
+ASYNC_DRIVERS = {
+    "sqlite":        "sqlite+aiosqlite",
+    "mysql":         "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+}
+
+
+class NoAsyncDriver(Exception):
+    """A database URL with no async driver available in this environment."""
+
+
+def async_engine(url):
+    """Async engine on the same file / server as the sync `url`."""
+    driver = ASYNC_DRIVERS.get(url.drivername)
+    if driver is None:
+        raise NoAsyncDriver(f"no async driver for {url.drivername!r} "
+                            f"(known: {', '.join(ASYNC_DRIVERS)})")
+    try:
+        return create_async_engine(url.set(drivername=driver))
+    except ImportError as e:
+        raise NoAsyncDriver(f"{driver!r} needs a module that is not installed ({e})") from e
+
+
+def async_database_engine(flask_app):
+    """Async twin of the Flask-SQLAlchemy engine, or of ASYNC_DATABASE_URI if set."""
+    override = flask_app.config.get("ASYNC_DATABASE_URI")
+    if override:
+        return create_async_engine(override)
+    with flask_app.app_context():
+        return async_engine(db.engine.url)
+
+
+class Request:
+    def __init__(self, scope, body=b""):
+        self.method = scope["method"]
+        self.path   = scope["path"]
+        self.client = (scope.get("client") or ("", 0))[0]
+        self.args   = {k: v[0] for k, v in parse_qs(scope.get("query_string", b"").decode()).items()}
+        self.body   = body
+
+    def arg(self, name, type=str):
+        raw = self.args.get(name)
+        if raw is None:
+            return None
+        try:
+            return type(raw)
+        except ValueError:
+            return None
+
+    def json(self):
+        return json.loads(self.body or b"{}")
+
+
+class AsyncJSONAPI:
+    """Minimal ASGI router for the async JSON endpoints."""
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.fallback  = WsgiToAsgi(flask_app)
+        self.engine    = async_database_engine(flask_app)
+        # shard 0 is the main database; app/sharding.py has the layout
+        self.engines   = [self.engine] + [async_engine(url) for url in sharding.ROUTER.urls[1:]]
+        self.metrics   = flask_app.config["METRICS_ENABLED"]
+        for i, engine in enumerate(self.engines):
+            apply_sqlite_pragmas(engine, sqlite_pragmas(flask_app.config))
+            if i:
+                sharding.attach_home(engine, sharding.ROUTER.urls[0].database)
+            if self.metrics:
+                metrics.instrument_engine(engine.sync_engine)
+            if flask_app.config["SLOW_QUERY_MS"] > 0:
+                slowlog.instrument_engine(engine.sync_engine)
+        self.routes    = [
+            ("GET",  "/auctions",                    self.list_auctions),
+            ("GET",  "/auctions/search",             self.search_auctions),
+            ("GET",  "/auctions/<int:auc_id>",       self.get_auction),
+            ("GET",  "/auctions/<int:auc_id>/bids",  self.list_bids),
+            ("POST", "/auctions/<int:auc_id>/bid",   self.place_bid),
+        ]
+        self.patterns  = [re.compile("^" + re.sub(r"<int:(\w+)>", r"(?P<\1>\\d+)", rule) + "$")
+                          for _, rule, _ in self.routes]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self.lifespan(receive, send)
+        if scope["type"] == "http":
+            for (method, rule, handler), pattern in zip(self.routes, self.patterns):
+                m = pattern.match(scope["path"])
+                if m and scope["method"] == method:
+                    started = time.perf_counter()
+                    slowlog.current_route.set(f"{method} {rule}")
+                    body = await read_body(receive) if method == "POST" else b""
+                    headers = []
+                    try:
+                        payload, status = await handler(
+                            Request(scope, body), **{k: int(v) for k, v in m.groupdict().items()})
+                    except ratelimit.RateLimited as e:
+                        payload, status = ratelimit.error_body(e), 429
+                        headers = [(b"retry-after", str(ratelimit.retry_after(e)).encode())]
+                    if self.metrics:
+                        metrics.observe_request(rule, method, status,
+                                                time.perf_counter() - started)
+                    return await send_json(send, payload, status, headers)
+        return await self.fallback(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                for engine in self.engines:
+                    await engine.dispose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def engine_for(self, auc_id):
+        """The engine holding auction `auc_id` (None if no shard owns its id range)."""
+        shard = sharding.shard_of(auc_id)
+        return self.engines[shard] if shard < len(self.engines) else None
+
+    async def gather(self, stmt):
+        """Run `stmt` on every shard concurrently; parts merged by id (first column)."""
+        async def run(engine):
+            async with engine.connect() as conn:
+                return (await conn.execute(stmt)).all()
+        parts = await asyncio.gather(*(run(e) for e in self.engines))
+        return list(heapq.merge(*parts, key=lambda row: row[0]))
+
+    # ---- endpoints (same contracts as the Flask views) ----
+
+    def _filtered(self, stmt, req):
+        status      = req.arg("status")
+        title       = req.arg("title")
+        description = req.arg("description")
+        category_id = req.arg("category_id", int)
+        min_price   = req.arg("min_price",   float)
+        max_price   = req.arg("max_price",   float)
+
+        if status in ("open", "closed"):
+            stmt = stmt.where(Auction.status == status)
+        if min_price is not None:
+            stmt = stmt.where(Auction.init_price >= min_price)
+        if max_price is not None:
+            stmt = stmt.where(Auction.init_price <= max_price)
+        if title:
+            stmt = stmt.where(Item.title.ilike(f"%{title}%"))
+        if description:
+            stmt = stmt.where(Item.description.ilike(f"%{description}%"))
+        if category_id:
+            stmt = stmt.where(Item.category_id == category_id)
+        return stmt.order_by(Auction.id)
+
+    async def list_auctions(self, req):
+        stmt = self._filtered(
+            select(Auction.id, Auction.item_id, Auction.seller_id, Auction.start_time,
+                   Auction.end_time, Auction.init_price, Auction.increment,
+                   Auction.reserve_price, Auction.status).join(Item),
+            req)
+        rows = await self.gather(stmt)
+        return [{
+            "id":            r.id,
+            "item_id":       r.item_id,
+            "seller_id":     r.seller_id,
+            "start_time":    r.start_time.isoformat(),
+            "end_time":      r.end_time.isoformat(),
+            "init_price":    r.init_price,
+            "increment":     r.increment,
+            "reserve_price": r.reserve_price,
+            "status":        r.status,
+        } for r in rows], 200
+
+    async def search_auctions(self, req):
+        stmt = self._filtered(
+            select(Auction.id, Auction.item_id, Item.title, Auction.init_price,
+                   Auction.status).join(Item),
+            req)
+        rows = await self.gather(stmt)
+        return [{
+            "auction_id": r.id,
+            "item_id":    r.item_id,
+            "title":      r.title,
+            "init_price": r.init_price,
+            "status":     r.status,
+        } for r in rows], 200
+
+    async def get_auction(self, req, auc_id):
+        engine = self.engine_for(auc_id)
+        if engine is None:
+            return {"error": "Not Found"}, 404
+        async with engine.connect() as conn:
+            a, bid = await find_auction(conn, auc_id, lambda t: (
+                select(t.__table__, User.username.label("winner_name"))
+                .outerjoin(User, User.id == t.winner_id)))
+            if a is None:
+                return {"error": "Not Found"}, 404
+            bids = (await conn.execute(
+                select(bid.id, bid.bidder, bid.amount, bid.max_bid, bid.timestamp)
+                .where(bid.auction_id == auc_id)
+                .order_by(bid.amount.desc())
+            )).all()
+            bids = await with_ladders(conn, a, bids)
+        return {
+            "id":            a.id,
+            "item_id":       a.item_id,
+            "seller_id":     a.seller_id,
+            "start_time":    a.start_time.isoformat(),
+            "end_time":      a.end_time.isoformat(),
+            "init_price":    a.init_price,
+            "increment":     a.increment,
+            "reserve_price": a.reserve_price,
+            "status":        a.status,
+            "current_high":  bids[0].amount if bids else a.init_price,
+            "bids": [{
+                "id":        b.id,
+                "bidder":    b.bidder,
+                "amount":    b.amount,
+                "max_bid":   b.max_bid,
+                "timestamp": b.timestamp.isoformat(),
+            } for b in bids],
+            "winner":        a.winner_name,
+            "winning_bid":   a.winning_bid,
+        }, 200
+
+    async def list_bids(self, req, auc_id):
+        engine = self.engine_for(auc_id)
+        if engine is None:
+            return {"error": "Not Found"}, 404
+        async with engine.connect() as conn:
+            a, bid = await find_auction(conn, auc_id, lambda t: select(t.id, t.compacted_at))
+            if a is None:
+                return {"error": "Not Found"}, 404
+            bids = (await conn.execute(
+                select(bid.id, bid.bidder, bid.amount, bid.timestamp)
+                .where(bid.auction_id == auc_id)
+                .order_by(bid.amount.desc())
+            )).all()
+            bids = await with_ladders(conn, a, bids)
+        return [{
+            "id":        b.id,
+            "bidder":    b.bidder,
+            "amount":    b.amount,
+            "timestamp": b.timestamp.isoformat(),
+        } for b in bids], 200
+
+    async def place_bid(self, req, auc_id):
+        try:
+            data = req.json()
+        except ValueError:
+            return {"error": "invalid JSON body"}, 400
+        user = data.get("username")
+        if not user:
+            return {"error": "username required"}, 400
+        for key in ("max_bid", "amount"):
+            if key in data:
+                data[key] = finite(data[key])
+                if data[key] is None:
+                    return {"error": f"'{key}' must be a number"}, 400
+        # same buckets as the Flask view: client address plus the claimed username;
+        # off the event loop, as the shared (SQLite) buckets are a blocking transaction
+        await asyncio.to_thread(ratelimit.admit_bid, auc_id, f"{req.client}/{user}")
+
+        engine = self.engine_for(auc_id)
+        if engine is None:
+            return {"error": "Not Found"}, 404
+        async with engine.begin() as conn:
+            auction = (await conn.execute(
+                select(Auction.status, Auction.end_time, Auction.init_price,
+                       Auction.increment, Auction.reserve_price)
+                .where(Auction.id == auc_id))).first()
+            if auction is None:
+                return {"error": "Not Found"}, 404
+            now = datetime.utcnow()
+            if auction.status != "open" or now > auction.end_time:
+                return {"error": "Auction closed"}, 400
+            user_id = (await conn.execute(
+                select(User.id).where(User.username == user))).scalar()
+            if user_id is None:
+                return {"error": "Not Found"}, 404
+            highest = (await conn.execute(
+                select(func.max(Bid.amount)).where(Bid.auction_id == auc_id)
+            )).scalar() or auction.init_price
+
+            if "max_bid" in data:
+                max_bid = data["max_bid"]
+                if max_bid <= highest:
+                    return {"error": f"Your max_bid must exceed current bid ({highest})"}, 400
+                amount = min(max_bid, highest + auction.increment)
+            elif "amount" in data:
+                amount, max_bid = data["amount"], None
+                if amount < highest + auction.increment:
+                    return {"error": f"Bid must be ≥ {highest + auction.increment}"}, 400
+                if amount < auction.reserve_price:
+                    return {"error": "Bid below reserve price"}, 400
+            else:
+                return {"error": "Either 'amount' or 'max_bid' is required"}, 400
+
+            insert = Bid.__table__.insert().values(
+                auction_id=auc_id, bidder=user, bidder_id=user_id,
+                amount=amount, max_bid=max_bid, timestamp=now)
+            shard = sharding.shard_of(auc_id)
+            if shard:
+                # ids come from the shard's own range; RETURNING hands it back
+                insert = insert.values(id=sharding.next_id(Bid.__table__, shard)).return_defaults()
+            result = await conn.execute(insert)
+            bid_id = result.inserted_primary_key[0]
+
+        resp = {"id": bid_id, "bidder": user, "amount": amount, "timestamp": now.isoformat()}
+        if max_bid is not None:
+            resp.update(bidder_id=user_id, max_bid=max_bid)
+        return resp, 201
+
+
+def finite(value):
+    """`value` as a finite float, or None if it is not a number (bools are not)."""
+    if isinstance(value, bool):
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) else None
+
+
+async def find_auction(conn, auc_id, query):
+    """
+    (row, bid model) for auction `auc_id`: `query(Auction)`'s row, or failing
+    that `query(ArchivedAuction)`'s and ArchivedBid, like archive.auction_or_404.
+    (None, None) when neither table has it.
+    """
+    for auction, bid in ((Auction, Bid), (ArchivedAuction, ArchivedBid)):
+        row = (await conn.execute(query(auction).where(auction.id == auc_id))).first()
+        if row is not None:
+            return row, bid
+    return None, None
+
+
+async def with_ladders(conn, auction, bids):
+    """`bids` plus the expanded steps of a compacted auction, highest amount first."""
+    if auction.compacted_at is None:
+        return bids
+    ranges = (await conn.execute(
+        select(BidRange.__table__).where(BidRange.auction_id == auction.id).order_by(BidRange.id)
+    )).all()
+    merged = sorted([*bids, *expand_all(ranges)], key=lambda b: b.id)
+    return sorted(merged, key=lambda b: b.amount, reverse=True)
+
+
+async def read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+async def send_json(send, payload, status, headers=()):
+    body = json.dumps(payload).encode()
+    await send({
+        "type":    "http.response.start",
+        "status":  status,
+        "headers": [(b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()), *headers],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def create_asgi_app(flask_app=None):
+    flask_app = flask_app or create_app()
+    membership.preload(flask_app)
+    try:
+        return AsyncJSONAPI(flask_app)
+    except NoAsyncDriver as e:
+        flask_app.logger.warning(f"Async JSON API unavailable, {e}; serving it through Flask")
+        return WsgiToAsgi(flask_app)
@@ -0,0 +1,231 @@
+# app/compaction.py
+"""
+Compaction of auto-bid ladders on closed auctions.
+
+The proxy loop in `auction_detail` stores every increment step as its own
+`Bid` row, so one contested auction can leave thousands of rows. Once an
+auction is closed, each ladder (a run of consecutive bid ids where two
+bidders alternate, each exactly one increment above the last, all with a
+max_bid) is replaced by two `BidRange` rows, one per bidder. A range holds
+the first id, amount and timestamp, the steps between them, and each bid's
+time as a 4-byte offset, so expansion gives back exactly the rows it
+replaced. A side whose amounts are not exact multiples of the step (float
+increments such as 0.1) or whose bids span more than ~71 minutes is left as
+it is.
+
+The job works in chunks of BID_COMPACT_CHUNK_SIZE auctions, one transaction
+each, over live and archived auctions, then stamps `compacted_at` so an
+auction is read once. The bid table is AUTOINCREMENT, so the ids a range
+stands for are never handed out again.
+
+Readers expand on demand: `bids_of` and `bid_rows` for the auction pages and APIs,
+`expand_all` for Core rows (ASGI, exports, analytics).
+"""
+import heapq
+import struct
+from collections import namedtuple
+from datetime import datetime, timedelta
+from itertools import groupby
+from operator import attrgetter, itemgetter
+
+from flask import current_app
+from sqlalchemy import select, insert, update, delete
+
+from app import db, sharding
+from app.jobs import heartbeat
+from app.models import Auction, Bid, ArchivedAuction, ArchivedBid, BidRange
+
+# an expanded bid, in the column order of the bids export
+BidStep = namedtuple('BidStep', 'id auction_id bidder bidder_id amount max_bid timestamp')
+
+MAX_OFFSET   = 2 ** 32 - 1   # microseconds, ~71 minutes
+DELETE_BATCH = 500
+
+
+# ---- reading ----
+
+def expand(r):
+    """The bids a BidRange (or a Core row of bid_range) stands for, in id order."""
+    offsets = struct.unpack(f'<{r.steps}I', r.offsets)
+    for i, offset in enumerate(offsets):
+        yield BidStep(r.id + i * r.id_step, r.auction_id, r.bidder, r.bidder_id,
+                      r.first_amount + i * r.amount_step, r.max_bid,
+                      r.first_at + timedelta(microseconds=offset))
+
+
+def expand_all(ranges):
+    """Steps of id-ordered `ranges` in id order, reading one range ahead at most."""
+    heap = []
+
+    def push(steps):
+        step = next(steps, None)
+        if step is not None:
+            heapq.heappush(heap, (step.id, step, steps))
+
+    for r in ranges:
+        # both sides of a ladder interleave; anything below the next range's id is final
+        while heap and heap[0][0] < r.id:
+            _, step, steps = heapq.heappop(heap)
+            yield step
+            push(steps)
+        push(expand(r))
+    while heap:
+        _, step, steps = heapq.heappop(heap)
+        yield step
+        push(steps)
+
+
+def bids_of(auction, model, column, descending=True):
+    """
+    Bids of `auction` sorted by `column`: `model` objects, plus BidStep tuples
+    (same attribute names, read-only) for the steps of compacted ladders.
+    """
+    query = model.query.filter_by(auction_id=auction.id)
+    if auction.compacted_at is None:
+        return query.order_by(column.desc() if descending else column).all()
+    ranges = BidRange.query.filter_by(auction_id=auction.id).order_by(BidRange.id)
+    bids   = sorted([*query, *expand_all(ranges)], key=lambda b: b.id)
+    # NULLs sort first ascending and last descending, as in SQLite
+    key = lambda b: (getattr(b, column.key) is not None, getattr(b, column.key))
+    return sorted(bids, key=key, reverse=descending)
+
+
+def bid_rows(auction, model, *columns):
+    """
+    Core counterpart of bids_of for the JSON lists: tuples of `columns` (names
+    of `model` attributes, including 'id' and 'amount'), highest amount first.
+    """
+    stmt = select(*(getattr(model, c) for c in columns)).where(model.auction_id == auction.id)
+    if auction.compacted_at is None:
+        return db.session.execute(stmt.order_by(model.amount.desc())).all()
+    ranges = BidRange.query.filter_by(auction_id=auction.id).order_by(BidRange.id)
+    steps  = map(attrgetter(*columns), expand_all(ranges))
+    rows   = sorted([*db.session.execute(stmt), *steps], key=itemgetter(columns.index('id')))
+    return sorted(rows, key=itemgetter(columns.index('amount')), reverse=True)
+
+
+# ---- compaction ----
+
+def _follows(run, b, increment):
+    prev = run[-1]
+    return (b.id == prev.id + 1
+            and b.max_bid is not None and b.timestamp is not None
+            and b.bidder != prev.bidder
+            and b.amount == prev.amount + increment
+            and (len(run) < 2 or b.bidder == run[-2].bidder))
+
+
+def ladders(bids, increment, min_run):
+    """Runs of at least `min_run` id-ordered bids that look like a proxy ladder."""
+    run = []
+    for b in bids:
+        if run and _follows(run, b, increment):
+            run.append(b)
+            continue
+        if len(run) >= min_run:
+            yield run
+        run = [b] if b.max_bid is not None and b.timestamp is not None else []
+    if len(run) >= min_run:
+        yield run
+
+
+def to_range(side):
+    """A BidRange row (as a dict) for one bidder's bids of a ladder, or None if lossy."""
+    first = side[0]
+    id_step     = side[1].id - first.id         if len(side) > 1 else 0
+    amount_step = side[1].amount - first.amount if len(side) > 1 else 0.0
+    offsets = []
+    for i, b in enumerate(side):
+        offset = (b.timestamp - first.timestamp) // timedelta(microseconds=1)
+        if (b.bidder_id != first.bidder_id or b.max_bid != first.max_bid
+                or b.amount != first.amount + i * amount_step
+                or not 0 <= offset <= MAX_OFFSET):
+            return None
+        offsets.append(offset)
+    return {
+        'id':           first.id,
+        'auction_id':   first.auction_id,
+        'bidder':       first.bidder,
+        'bidder_id':    first.bidder_id,
+        'max_bid':      first.max_bid,
+        'steps':        len(side),
+        'id_step':      id_step,
+        'first_amount': first.amount,
+        'amount_step':  amount_step,
+        'first_at':     first.timestamp,
+        'offsets':      struct.pack(f'<{len(side)}I', *offsets),
+    }
+
+
+def _compact_chunk(auction_model, bid_model, auctions, min_run):
+    """Compact the bids of `auctions` ((id, increment) pairs); returns (bids, ranges)."""
+    increments = dict(auctions)
+    rows = db.session.execute(
+        select(bid_model.id, bid_model.auction_id, bid_model.bidder, bid_model.bidder_id,
+               bid_model.amount, bid_model.max_bid, bid_model.timestamp)
+        .where(bid_model.auction_id.in_(list(increments)))
+        .order_by(bid_model.auction_id, bid_model.id)
+    ).all()
+    ranges, replaced = [], []
+    for auction_id, bids in groupby(rows, key=lambda b: b.auction_id):
+        for run in ladders(bids, increments[auction_id], min_run):
+            for side in (run[0::2], run[1::2]):
+                r = to_range(side)
+                if r is not None:
+                    ranges.append(r)
+                    replaced += [b.id for b in side]
+    if ranges:
+        db.session.execute(insert(BidRange.__table__), ranges)
+        # a contested auction alone can replace thousands of rows
+        for i in range(0, len(replaced), DELETE_BATCH):
+            db.session.execute(delete(bid_model)
+                               .where(bid_model.id.in_(replaced[i:i + DELETE_BATCH]))
+                               .execution_options(synchronize_session=False))
+    db.session.execute(update(auction_model).where(auction_model.id.in_(list(increments)))
+                                            .values(compacted_at=datetime.utcnow())
+                                            .execution_options(synchronize_session=False))
+    db.session.commit()
+    return len(replaced), len(ranges)
+
+
+def _compact_shard(min_run, chunk, done):
+    for auction_model, bid_model in ((Auction, Bid), (ArchivedAuction, ArchivedBid)):
+        last = 0
+        while True:
+            auctions = db.session.execute(
+                select(auction_model.id, auction_model.increment)
+                .where(auction_model.status == 'closed', auction_model.compacted_at.is_(None),
+                       auction_model.id > last)
+                .order_by(auction_model.id).limit(chunk)
+            ).all()
+            if not auctions:
+                break
+            bids, ranges = _compact_chunk(auction_model, bid_model, auctions, min_run)
+            done['auctions'] += len(auctions)
+            done['bids']     += bids
+            done['ranges']   += ranges
+            heartbeat()
+            last = auctions[-1].id
+
+
+def compact_closed(min_run=None, chunk=None):
+    """Compact the ladders of every closed auction not done yet; returns the counts."""
+    min_run = min_run or current_app.config["BID_COMPACT_MIN_RUN"]
+    chunk   = chunk or current_app.config["BID_COMPACT_CHUNK_SIZE"]
+    done    = {'auctions': 0, 'bids': 0, 'ranges': 0}
+    for shard in sharding.ROUTER.shards():
+        with sharding.using(shard):
+            _compact_shard(min_run, chunk, done)
+
+    if done['bids']:
+        current_app.logger.info(
+            f"Compacted {done['bids']} auto-bids into {done['ranges']} ranges "
+            f"on {done['auctions']} closed auctions"
+        )
+    return done
+
+
+def compact_job():
+    # scheduler entry point: a no-op when compaction is switched off
+    if current_app.config["BID_COMPACT_MIN_RUN"] > 0:
+        compact_closed()
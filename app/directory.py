@@ -0,0 +1,65 @@
+# app/directory.py
+"""
+Prefix search over the user directory, for autocomplete.
+
+A prefix is a range on a sorted index: `username >= 'ab' AND username <
+'ab\uffff'`, walked in index order, so the first k matches cost the same
+at a thousand users or at millions. Usernames use their unique index;
+full names use ix_user_full_name. Matching is case-sensitive, like the
+indexes.
+
+Pages are keyset-paged like the rep dashboard, except that the cursor carries
+the last row's whole key, (value, id), rather than just its id: the next page
+resumes right after that key even if the user has since been deleted or
+renamed. It is opaque to clients (URL-safe base64 of the JSON pair).
+"""
+import base64
+import binascii
+import json
+
+from sqlalchemy import select, tuple_
+
+from app import db
+from app.models import User
+
+FIELDS = {
+    'username':  User.username,
+    'full_name': User.full_name,
+}
+
+
+def _cursor(value, user_id):
+    return base64.urlsafe_b64encode(json.dumps([value, user_id]).encode()).decode()
+
+
+def _after(cursor):
+    """(value, id) from a cursor; ValueError if it isn't one of ours."""
+    try:
+        value, user_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeError, TypeError, ValueError):
+        raise ValueError(f"Bad cursor {cursor!r}") from None
+    if not isinstance(value, str) or type(user_id) is not int:
+        raise ValueError(f"Bad cursor {cursor!r}")
+    return value, user_id
+
+
+def search(prefix, field='username', after=None, limit=10):
+    """
+    Users whose `field` starts with `prefix`, in `field` order; returns
+    (rows, next_cursor), rows being (id, username, full_name) tuples.
+    Raises ValueError for an `after` cursor that can't be decoded.
+    """
+    column = FIELDS[field]
+    q = (select(User.id, User.username, User.full_name)
+         .where(column >= prefix, column < prefix + '\uffff'))
+    if after is not None:
+        # (value, id) so equal full names still page in a stable order
+        q = q.where(tuple_(column, User.id) > tuple_(*_after(after)))
+    q = q.order_by(column, User.id).limit(limit + 1)
+
+    rows = db.session.execute(q).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if not more:
+        return rows, None
+    return rows, _cursor(getattr(rows[-1], field), rows[-1].id)
@@ -0,0 +1,79 @@
+# app/engine.py
+"""
+Database engine tuning.
+
+SQLite connections get a PRAGMA profile applied on connect (see
+SQLITE_PROFILES; individual PRAGMAs can be overridden from config). Server
+databases such as the PyMySQL URI get their pool settings through
+SQLALCHEMY_ENGINE_OPTIONS instead, see `pool_options`.
+"""
+from sqlalchemy import event
+
+# PRAGMA name -> value; applied in this order on every new connection
+SQLITE_PROFILES = {
+    # SQLite's own defaults: rollback journal, synchronous=FULL
+    'default': {},
+    # readers no longer block on writers; fsync only at checkpoints
+    'wal': {
+        'journal_mode': 'WAL',
+        'synchronous':  'NORMAL',
+        'busy_timeout': 5000,
+        'cache_size':   -20000,        # KiB, i.e. ~20 MB of page cache
+        'temp_store':   'MEMORY',
+        'mmap_size':    268435456,     # 256 MB
+    },
+    # bulk loads / benchmarks only: a crash can lose recent commits
+    'unsafe': {
+        'journal_mode': 'WAL',
+        'synchronous':  'OFF',
+        'busy_timeout': 5000,
+        'cache_size':   -65536,
+        'temp_store':   'MEMORY',
+        'mmap_size':    1073741824,
+    },
+}
+
+PRAGMA_OVERRIDES = {
+    'journal_mode': 'SQLITE_JOURNAL_MODE',
+    'synchronous':  'SQLITE_SYNCHRONOUS',
+    'busy_timeout': 'SQLITE_BUSY_TIMEOUT',
+    'cache_size':   'SQLITE_CACHE_SIZE',
+    'temp_store':   'SQLITE_TEMP_STORE',
+    'mmap_size':    'SQLITE_MMAP_SIZE',
+}
+
+
+def sqlite_pragmas(config):
+    """The profile named by SQLITE_PROFILE with any per-PRAGMA overrides applied."""
+    pragmas = dict(SQLITE_PROFILES[config.get('SQLITE_PROFILE', 'wal')])
+    for pragma, key in PRAGMA_OVERRIDES.items():
+        if config.get(key) is not None:
+            pragmas[pragma] = config[key]
+    return pragmas
+
+
+def apply_sqlite_pragmas(engine, pragmas):
+    """Run `pragmas` on every new DBAPI connection of a (sync or async) engine."""
+    sync_engine = getattr(engine, 'sync_engine', engine)
+    if sync_engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(sync_engine, 'connect')
+    def set_pragmas(dbapi_conn, _record):
+        cursor = dbapi_conn.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def pool_options(uri, config):
+    """SQLALCHEMY_ENGINE_OPTIONS for server databases (empty for SQLite)."""
+    if uri.startswith('sqlite'):
+        return {}
+    return {
+        'pool_size':     int(config.get('DB_POOL_SIZE', 10)),
+        'max_overflow':  int(config.get('DB_MAX_OVERFLOW', 20)),
+        'pool_recycle':  int(config.get('DB_POOL_RECYCLE', 280)),
+        'pool_pre_ping': str(config.get('DB_POOL_PRE_PING', 'true')).lower() in ('1', 'true', 'yes'),
+        'pool_timeout':  int(config.get('DB_POOL_TIMEOUT', 30)),
+    }
@@ -0,0 +1,158 @@
+# app/export.py
+"""
+Streaming CSV / NDJSON exports for the finance and data teams.
+
+Rows come off a server-side cursor (`stream_results`) in `yield_per` chunks
+and are written out chunk by chunk, so memory stays flat however much history
+is exported. Every dataset covers the live and the archived tables
+(app/archive.py), so the sales export agrees with the admin report, and is
+ordered by id, which makes `since_id` (the last id of the previous export) a
+cheap incremental cursor for nightly jobs. Compacted auto-bid ladders are
+expanded back into the bids export in id order (app/compaction.py).
+"""
+import csv
+import heapq
+import io
+import json
+from contextlib import ExitStack
+from datetime import date, datetime
+from itertools import islice
+
+from sqlalchemy import select, union_all
+
+from app import sharding
+from app.compaction import expand_all
+from app.models import (Auction, Bid, BidRange, Item, Category, User,
+                        ArchivedAuction, ArchivedBid)
+
+FORMATS = {
+    'csv':    'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+SOURCES = ((Auction, Bid), (ArchivedAuction, ArchivedBid))
+
+
+def bids_query(auction, bid):
+    return select(bid.id, bid.auction_id, bid.bidder, bid.bidder_id,
+                  bid.amount, bid.max_bid, bid.timestamp), bid.id, bid.timestamp
+
+
+def auctions_query(auction, bid):
+    return select(auction.id, auction.item_id, auction.seller_id, auction.start_time,
+                  auction.end_time, auction.init_price, auction.increment,
+                  auction.reserve_price, auction.status, auction.winner_id,
+                  auction.winning_bid), auction.id, auction.start_time
+
+
+def sales_query(auction, bid):
+    # the sales the admin report's rollups count (app/rollups.py)
+    stmt = (select(auction.id.label('auction_id'), auction.end_time,
+                   Item.id.label('item_id'), Item.title,
+                   Category.name.label('category'),
+                   User.username.label('buyer'), auction.winning_bid)
+            .join(Item, Item.id == auction.item_id)
+            .join(Category, Category.id == Item.category_id)
+            .outerjoin(User, User.id == auction.winner_id)
+            .where(auction.status == 'closed',
+                   auction.winning_bid != None,
+                   auction.winning_bid >= auction.reserve_price))
+    return stmt, auction.id, auction.end_time
+
+
+DATASETS = {
+    'bids':     bids_query,
+    'auctions': auctions_query,
+    'sales':    sales_query,
+}
+
+
+def build_query(dataset, since_id=None, start=None, end=None, limit=None):
+    """The live and archived rows of `dataset` as one UNION ALL, ordered by id."""
+    parts = []
+    for auction, bid in SOURCES:
+        stmt, id_col, time_col = DATASETS[dataset](auction, bid)
+        if since_id is not None:
+            stmt = stmt.where(id_col > since_id)
+        if start is not None:
+            stmt = stmt.where(time_col >= start)
+        if end is not None:
+            stmt = stmt.where(time_col < end)
+        parts.append(stmt)
+    stmt = union_all(*parts)
+    # ids never repeat across the two tables (app/archive.py)
+    stmt = stmt.order_by(stmt.selected_columns[0])
+    if limit:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+def build_ladders(dataset, since_id=None, start=None, end=None):
+    """
+    (select, keep) for the compacted ladders that may hold bids of the export,
+    or None for datasets without any; `keep` filters the expanded bids.
+    """
+    if dataset != 'bids':
+        return None
+    last_id = BidRange.id + (BidRange.steps - 1) * BidRange.id_step
+    stmt = select(BidRange.__table__).where(
+        BidRange.auction_id.in_(union_all(select(Auction.id), select(ArchivedAuction.id))))
+    if since_id is not None:
+        stmt = stmt.where(last_id > since_id)
+    if end is not None:
+        stmt = stmt.where(BidRange.first_at < end)
+    keep = lambda b: ((since_id is None or b.id > since_id)
+                      and (start is None or b.timestamp >= start)
+                      and (end is None or b.timestamp < end))
+    return stmt.order_by(BidRange.id), keep
+
+
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def stream(stmt, fmt, chunk_size=1000, limit=None, ladders=None):
+    """
+    Yield the export body in chunks of `chunk_size` rows. With sharding every
+    shard streams its part and the parts are merged on the id (first column);
+    `limit` then caps the merged stream. `ladders` (from build_ladders) adds
+    the expanded compacted bids to the merge.
+    """
+    def execute(engine, stmt):
+        return (stack.enter_context(engine.connect())
+                     .execution_options(stream_results=True, yield_per=chunk_size)
+                     .execute(stmt))
+
+    with ExitStack() as stack:
+        results = [execute(engine, stmt) for engine in sharding.ROUTER.engines]
+        columns = list(results[0].keys())
+        parts   = list(results)
+        if ladders is not None:
+            ladder_stmt, keep = ladders
+            parts += [filter(keep, expand_all(execute(engine, ladder_stmt)))
+                      for engine in sharding.ROUTER.engines]
+        rows    = heapq.merge(*parts, key=lambda row: row[0])
+        if limit:
+            rows = islice(rows, limit)
+        chunks  = iter(lambda: list(islice(rows, chunk_size)), [])
+
+        if fmt == 'csv':
+            buf = io.StringIO()
+            out = csv.writer(buf)
+            out.writerow(columns)
+            for chunk in chunks:
+                out.writerows([_plain(v) for v in row] for row in chunk)
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+            if buf.tell():
+                yield buf.getvalue()
+        else:
+            for chunk in chunks:
+                yield ''.join(
+                    json.dumps(dict(zip(columns, map(_plain, row)))) + '\n'
+                    for row in chunk
+                )
@@ -0,0 +1,94 @@
+# app/fragments.py
+"""
+Template caching: compiled Jinja bytecode on disk, rendered fragments in memory.
+
+Each worker used to compile every template from source on its first render.
+With JINJA_BYTECODE_CACHE on, the compiled code is written to JINJA_CACHE_DIR
+(default instance/jinja-cache) once and loaded from there by later workers and
+restarts; Jinja compares a checksum of the source, so an edited template is
+compiled again.
+
+A template caches a part of itself with a call block:
+
+    {% call fragment('bid-history', auction.id, version) %} ... {% endcall %}
+
+The body is rendered only when nothing is cached under that key. The key must
+cover everything the body shows that can change, so views pass a version read
+from the database (`item_card_versions`, `bid_history_version`): a write made
+by another worker changes the version, never leaves a stale copy behind. The
+cache is per process, FRAGMENT_CACHE_SIZE entries, least recently used out.
+"""
+import os
+
+from jinja2 import FileSystemBytecodeCache
+from sqlalchemy import select, func, case
+
+from app import db, metrics, sharding
+from app.cache import LRUCache
+from app.models import Auction, Bid, BidRange
+
+_fragments = LRUCache(maxsize=65536)
+
+RENDERS = metrics.Counter("template_fragments_total",
+                          "Cached template fragments by outcome (hit, miss).",
+                          ("outcome",))
+
+
+def fragment(*key, caller):
+    if _fragments.maxsize <= 0:
+        return caller()
+    html = _fragments.get(key)
+    if html is None:
+        RENDERS.inc(outcome="miss")
+        html = caller()
+        _fragments.set(key, html)
+    else:
+        RENDERS.inc(outcome="hit")
+    return html
+
+
+def item_card_versions():
+    """
+    item id -> version of what its card on / and /browse shows: its auctions'
+    status and result, and the bids on the open ones. Items without auctions
+    are missing (version None).
+    """
+    auctions = (select(Auction.item_id, func.count(), func.max(Auction.id),
+                       func.sum(case((Auction.status == 'open', 1), else_=0)),
+                       func.total(Auction.winning_bid), func.total(Auction.reserve_price))
+                .group_by(Auction.item_id))
+    bids = (select(Auction.item_id, func.count(), func.max(Bid.id), func.total(Bid.amount))
+            .join(Bid, Bid.auction_id == Auction.id)
+            .where(Auction.status == 'open')
+            .group_by(Auction.item_id))
+    # one row per item and shard from each select
+    parts = {}
+    for tag, stmt in (('a', auctions), ('b', bids)):
+        for item_id, *values in sharding.gather(stmt):
+            parts.setdefault(item_id, []).append((tag, *values))
+    return {item_id: tuple(sorted(rows)) for item_id, rows in parts.items()}
+
+
+def bid_history_version(auction, model):
+    """Version of an auction's bid history in `model` (live or archived bids)."""
+    stmt = (select(func.count(), func.max(model.id), func.total(model.amount))
+            .where(model.auction_id == auction.id))
+    version = (model.__tablename__, *db.session.execute(stmt).one())
+    if auction.compacted_at is not None:
+        # a purge can drop one side of a ladder without touching `model`
+        ranges = (select(func.count(), func.total(BidRange.steps))
+                  .where(BidRange.auction_id == auction.id))
+        version += tuple(db.session.execute(ranges).one())
+    return version
+
+
+def init_app(app):
+    _fragments.maxsize = app.config["FRAGMENT_CACHE_SIZE"]
+    _fragments.clear()
+    app.jinja_env.globals["fragment"] = fragment
+
+    app.config["JINJA_CACHE_DIR"] = app.config["JINJA_CACHE_DIR"] or os.path.join(app.instance_path,
+                                                                                 "jinja-cache")
+    if app.config["JINJA_BYTECODE_CACHE"]:
+        os.makedirs(app.config["JINJA_CACHE_DIR"], exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config["JINJA_CACHE_DIR"])
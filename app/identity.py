@@ -0,0 +1,66 @@
+# app/identity.py
+"""
+Cached user loader for Flask-Login.
+
+Every authenticated request used to start with `User.query.get`. The first
+load of a user now stores a snapshot of its columns; later requests rebuild
+the instance from that snapshot and attach it with `merge(load=False)`, which
+puts it in the session without a SELECT. Relationships still lazy-load.
+
+The cache is per process: views that change a user call `invalidate`, and
+USER_CACHE_TTL bounds how long another worker can serve a stale copy. A user
+with a deletion under way (app/purge.py) no longer loads: `purge.submit`
+invalidates them here, and other workers refuse them once their copy expires.
+"""
+from sqlalchemy import inspect, select
+from sqlalchemy.orm import make_transient_to_detached
+
+from app import db
+from app.cache import LRUCache
+from app.models import PurgeJob, User
+
+_users = LRUCache(maxsize=10000, ttl=60)
+
+
+def snapshot(user):
+    return {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+
+
+def _fetch(uid):
+    user = db.session.get(User, uid)
+    if user is None:
+        return None
+    purging = db.session.scalar(
+        select(PurgeJob.id).where(PurgeJob.kind == 'user', PurgeJob.target_id == uid,
+                                  PurgeJob.status != 'done').limit(1))
+    return None if purging is not None else user
+
+
+def load_user(user_id):
+    try:
+        uid = int(user_id)
+    except (TypeError, ValueError):
+        return None
+    if _users.maxsize <= 0:
+        return _fetch(uid)
+
+    columns = _users.get(uid)
+    if columns is None:
+        user = _fetch(uid)
+        if user is not None:
+            _users.set(uid, snapshot(user))
+        return user
+
+    user = User(**columns)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+
+def invalidate(user_id):
+    _users.pop(user_id)
+
+
+def init_app(app):
+    _users.maxsize = app.config["USER_CACHE_SIZE"]
+    _users.ttl     = app.config["USER_CACHE_TTL"] or None
+    _users.clear()
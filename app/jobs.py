@@ -0,0 +1,229 @@
+# app/jobs.py
+"""
+Coordinated background jobs.
+
+Every worker process schedules the same APScheduler interval jobs, but a tick
+only does work after winning the job's row in `job_lease`. The lease is taken
+with a compare-and-set UPDATE (same behaviour on SQLite and MySQL) and renewed
+on every run, so the holder stays leader; if it dies the lease expires after
+JOB_LEASE_SECONDS and whichever process ticks next takes it over.
+
+A run that outlasts the lease would let another process start the same job
+alongside it, so long chunked jobs (archive, compaction, purges) call
+`heartbeat()` between chunks: it renews the lease, and stops the run with
+`LeaseLost` if another process has taken it over meanwhile. A purge job
+holds a lease of its own for as long as it runs.
+
+Sharded jobs get one lease per shard ("close_auctions/0", "close_auctions/1",
+...) so several processes can split the work between them.
+
+The scheduler is opt-in per process (SCHEDULER_ENABLED, or the dedicated
+`flask --app run scheduler` process), so web workers and CLI commands don't
+pay for importing and starting it.
+"""
+import os
+import socket
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import update, delete
+from sqlalchemy.exc import IntegrityError
+
+from app import db, metrics
+from app.models import JobLease
+
+
+class LeaseLost(Exception):
+    """Another process took over the lease of the job this one is running."""
+
+
+# lease of the job running in this context: {'name', 'ttl', 'renewed'}
+_running = ContextVar("job_lease", default=None)
+
+
+def worker_id():
+    # evaluated per call so forked workers don't inherit the parent's id
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def acquire_lease(name, ttl):
+    """Take or renew the lease `name`; returns True if this process holds it."""
+    me    = worker_id()
+    now   = datetime.utcnow()
+    until = now + timedelta(seconds=ttl)
+
+    lease = db.session.get(JobLease, name)
+    if lease is None:
+        try:
+            db.session.add(JobLease(name=name, owner=me, acquired_at=now,
+                                    heartbeat_at=now, expires_at=until))
+            db.session.commit()
+            return True
+        except IntegrityError:
+            db.session.rollback()
+            return False
+
+    prev_owner, prev_expiry = lease.owner, lease.expires_at
+    if prev_owner not in (me, None) and prev_expiry and prev_expiry >= now:
+        db.session.rollback()
+        return False
+
+    takeover = prev_owner not in (me, None)
+    t = JobLease.__table__
+    stmt = (update(t)
+            .where(t.c.name == name,
+                   t.c.owner.is_(None) if prev_owner is None else t.c.owner == prev_owner,
+                   t.c.expires_at.is_(None) if prev_expiry is None else t.c.expires_at == prev_expiry)
+            .values(owner=me, heartbeat_at=now, expires_at=until,
+                    acquired_at=lease.acquired_at if prev_owner == me else now,
+                    takeovers=t.c.takeovers + (1 if takeover else 0)))
+    won = db.session.execute(stmt).rowcount == 1
+    db.session.commit()
+    if won and takeover:
+        current_app.logger.warning(
+            f"Lease {name!r} expired at {prev_expiry}; {me} took over from {prev_owner}"
+        )
+    return won
+
+
+def heartbeat():
+    """
+    Renew the running job's lease (at most every third of its TTL); raises
+    LeaseLost if it is no longer ours. Call between chunks, after a commit.
+    A no-op outside a scheduled run, e.g. from the CLI.
+    """
+    lease = _running.get()
+    if lease is None or time.monotonic() - lease['renewed'] < lease['ttl'] / 3:
+        return
+    now = datetime.utcnow()
+    t   = JobLease.__table__
+    held = db.session.execute(
+        update(t).where(t.c.name == lease['name'], t.c.owner == worker_id())
+                 .values(heartbeat_at=now, expires_at=now + timedelta(seconds=lease['ttl']))
+    ).rowcount == 1
+    db.session.commit()
+    if not held:
+        raise LeaseLost(f"lease {lease['name']!r} was taken over")
+    lease['renewed'] = time.monotonic()
+
+
+@contextmanager
+def running(name, ttl):
+    """Make `name` the lease that heartbeat() renews in this context."""
+    token = _running.set({'name': name, 'ttl': ttl, 'renewed': time.monotonic()})
+    try:
+        yield
+    finally:
+        _running.reset(token)
+
+
+def drop_lease(name):
+    """Delete a one-off lease (e.g. a purge job's) held by this process."""
+    t = JobLease.__table__
+    db.session.execute(delete(t).where(t.c.name == name, t.c.owner == worker_id()))
+    db.session.commit()
+
+
+def release_leases():
+    """Give up every lease held by this process (e.g. on graceful shutdown)."""
+    t = JobLease.__table__
+    db.session.execute(update(t).where(t.c.owner == worker_id())
+                                .values(owner=None, expires_at=None))
+    db.session.commit()
+
+
+def record_run(name, started, error=None):
+    lease = db.session.get(JobLease, name)
+    if lease is None or lease.owner != worker_id():
+        return
+    now = datetime.utcnow()
+    lease.last_run_at   = now
+    lease.last_duration = time.perf_counter() - started
+    lease.last_error    = error
+    lease.heartbeat_at  = now
+    lease.expires_at    = now + timedelta(seconds=current_app.config["JOB_LEASE_SECONDS"])
+    db.session.commit()
+
+
+def run_job(app, name, fn, shards=1):
+    """One scheduler tick: run `fn` for every shard whose lease we hold or can take."""
+    with app.app_context():
+        ttl       = app.config["JOB_LEASE_SECONDS"]
+        max_owned = app.config["JOB_MAX_SHARDS_PER_WORKER"]
+        me        = worker_id()
+        owned     = {l.name for l in JobLease.query.filter(
+                        (JobLease.name == name) | JobLease.name.like(f"{name}/%"),
+                        JobLease.owner == me)}
+
+        for shard in range(shards):
+            lease_name = name if shards == 1 else f"{name}/{shard}"
+            if lease_name not in owned and max_owned and len(owned) >= max_owned:
+                continue
+            if not acquire_lease(lease_name, ttl):
+                owned.discard(lease_name)
+                metrics.observe_job(name, "skipped")
+                continue
+            owned.add(lease_name)
+
+            started, error = time.perf_counter(), None
+            try:
+                with running(lease_name, ttl):
+                    if shards > 1:
+                        fn(shard=shard, shards=shards)
+                    else:
+                        fn()
+            except LeaseLost as e:
+                db.session.rollback()
+                error = repr(e)
+                owned.discard(lease_name)
+                app.logger.warning(f"Job {lease_name!r} stopped: {e}")
+            except Exception as e:
+                db.session.rollback()
+                error = repr(e)
+                app.logger.exception(f"Job {lease_name!r} failed")
+            metrics.observe_job(name, "error" if error else "ok", time.perf_counter() - started)
+            record_run(lease_name, started, error)
+
+
+def schedule(app, name, fn, seconds, shards=1):
+    app.apscheduler.add_job(
+        id=name,
+        func=run_job,
+        args=(app, name, fn, shards),
+        trigger='interval',
+        seconds=seconds,
+        misfire_grace_time=2 * seconds,
+        max_instances=1,
+        replace_existing=True,
+    )
+
+
+def register_jobs(app):
+    from app.tasks import close_auctions
+    schedule(app, 'close_auctions', close_auctions,
+             seconds=app.config["CLOSE_AUCTIONS_INTERVAL"],
+             shards=app.config["JOB_SHARDS"])
+    from app.purge import resume_stalled
+    schedule(app, 'purges', resume_stalled, seconds=app.config["PURGE_RESUME_INTERVAL"])
+    from app.archive import archive_job
+    schedule(app, 'archive', archive_job, seconds=app.config["ARCHIVE_INTERVAL"])
+    from app.compaction import compact_job
+    schedule(app, 'compact_bids', compact_job, seconds=app.config["BID_COMPACT_INTERVAL"])
+
+
+def start_scheduler(app):
+    """Start APScheduler with every job registered; returns the scheduler."""
+    existing = getattr(app, "apscheduler", None)
+    if existing is not None and existing.running:
+        return existing
+    from flask_apscheduler import APScheduler
+    scheduler = APScheduler()
+    scheduler.init_app(app)
+    register_jobs(app)
+    if app.config["METRICS_ENABLED"]:
+        metrics.instrument_scheduler(scheduler)
+    scheduler.start()
+    return scheduler
@@ -0,0 +1,186 @@
+# app/membership.py
+"""
+In-memory membership index for the username/email availability checks.
+
+The registration form calls /auth/check_username and /auth/check_email on
+every keystroke. Each column gets a `MembershipIndex`: a Bloom filter that
+answers "definitely free" without touching anything else, backed by an exact
+set (MEMBERSHIP_EXACT) or, when that would cost too much memory, by the
+database for the rare "maybe taken".
+
+Indexes are filled on the first check, or up front by the serving entry points
+(the gunicorn master before it forks, the ASGI app) with MEMBERSHIP_PRELOAD:
+scanning the user table would otherwise slow every CLI command and script
+that builds the app. Every user this process commits, whichever view creates it, is
+added by a session hook; the views that delete users remove them. Other
+worker processes' registrations are picked up every MEMBERSHIP_REFRESH
+seconds with one `id > last seen` query. A user deleted by another process
+still reads as taken in this one until it restarts; registration itself
+always checks the database, so the index can only make the hint stale.
+"""
+import hashlib
+import math
+import threading
+import time
+
+from sqlalchemy import event, select
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.orm import Session, object_session
+
+from app import db, metrics
+from app.models import User
+
+CHECKS = metrics.Counter("membership_checks_total",
+                         "Availability checks by index and what answered them "
+                         "(bloom, exact, database).",
+                         ("index", "answer"))
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings; no false negatives, no removal."""
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = max(int(capacity), 1)
+        self.size     = max(64, int(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes   = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits     = bytearray((self.size + 7) // 8)
+        self.count    = 0
+
+    def _positions(self, value):
+        # double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, value):
+        for p in self._positions(value):
+            self.bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(value))
+
+
+class MembershipIndex:
+    def __init__(self, column, exact=True, error_rate=0.01, refresh=5):
+        self.column     = column
+        self.exact      = exact
+        self.error_rate = error_rate
+        self.refresh    = refresh
+        self.bloom      = None
+        self.values     = None
+        self.last_id    = 0
+        self.loaded_at  = 0.0
+        self._lock      = threading.Lock()
+
+    def load(self):
+        """Rebuild from the user table; returns the number of values loaded."""
+        rows = db.session.execute(select(User.id, self.column)).all()
+        with self._lock:
+            # room to double before the false-positive rate degrades
+            self.bloom   = BloomFilter(max(2 * len(rows), 1024), self.error_rate)
+            self.values  = set() if self.exact else None
+            self.last_id = 0
+            self._add_rows(rows)
+            self.loaded_at = time.monotonic()
+        return len(rows)
+
+    def _add_rows(self, rows):
+        for uid, value in rows:
+            self._add(value)
+            self.last_id = max(self.last_id, uid)
+
+    def _add(self, value):
+        self.bloom.add(value)
+        if self.values is not None:
+            self.values.add(value)
+        if self.bloom.count > self.bloom.capacity:
+            self.loaded_at = 0.0          # full rebuild, sized for the new count, on next check
+
+    def _catch_up(self):
+        if self.bloom is None or self.loaded_at == 0.0:
+            self.load()
+        elif self.refresh and time.monotonic() - self.loaded_at > self.refresh:
+            rows = db.session.execute(
+                select(User.id, self.column).where(User.id > self.last_id)
+            ).all()
+            with self._lock:
+                self._add_rows(rows)
+                self.loaded_at = time.monotonic()
+
+    def add(self, value):
+        # last_id is left to _catch_up: another worker's lower ids may not be in yet
+        if self.bloom is None:
+            return
+        with self._lock:
+            self._add(value)
+
+    def discard(self, value):
+        # the Bloom bits stay set; the value just becomes a false positive
+        if self.values is not None:
+            with self._lock:
+                self.values.discard(value)
+
+    def __contains__(self, value):
+        self._catch_up()
+        if value not in self.bloom:
+            CHECKS.inc(index=self.column.key, answer="bloom")
+            return False
+        if self.values is not None:
+            CHECKS.inc(index=self.column.key, answer="exact")
+            return value in self.values
+        CHECKS.inc(index=self.column.key, answer="database")
+        return db.session.execute(
+            select(User.id).where(self.column == value).limit(1)
+        ).first() is not None
+
+
+USERNAMES = MembershipIndex(User.username)
+EMAILS    = MembershipIndex(User.email)
+
+
+def _user_inserted(mapper, connection, user):
+    session = object_session(user)
+    session.info.setdefault("membership_added", []).append((user.username, user.email))
+
+
+def _after_commit(session):
+    for username, email in session.info.pop("membership_added", ()):
+        USERNAMES.add(username)
+        EMAILS.add(email)
+
+
+def _after_rollback(session):
+    session.info.pop("membership_added", None)
+
+
+def removed(username, email):
+    USERNAMES.discard(username)
+    EMAILS.discard(email)
+
+
+def init_app(app):
+    for index in (USERNAMES, EMAILS):
+        index.exact      = app.config["MEMBERSHIP_EXACT"]
+        index.error_rate = app.config["MEMBERSHIP_ERROR_RATE"]
+        index.refresh    = app.config["MEMBERSHIP_REFRESH"]
+        index.bloom      = None
+    if not event.contains(User, "after_insert", _user_inserted):
+        event.listen(User, "after_insert", _user_inserted)
+        event.listen(Session, "after_commit", _after_commit)
+        event.listen(Session, "after_rollback", _after_rollback)
+
+
+def preload(app):
+    """Fill the indexes now rather than on the first check (MEMBERSHIP_PRELOAD)."""
+    if not app.config["MEMBERSHIP_PRELOAD"]:
+        return
+    with app.app_context():
+        try:
+            USERNAMES.load()
+            EMAILS.load()
+        except (OperationalError, ProgrammingError):
+            # no schema yet; load on first check
+            db.session.rollback()
+            USERNAMES.bloom = EMAILS.bloom = None
@@ -0,0 +1,284 @@
+# app/metrics.py
+"""
+Request, SQL and background-job metrics, served as Prometheus text on /metrics.
+
+Counters and histograms are kept in this process: with several workers each
+one reports its own numbers, which is what Prometheus expects when it scrapes
+every instance. Recording a sample is a dict lookup and a couple of additions
+under a lock, so this stays on in production.
+"""
+import bisect
+import heapq
+import threading
+import time
+from datetime import datetime, timezone
+
+from flask import current_app, g, request, has_request_context
+from sqlalchemy import event
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+SQL_BUCKETS     = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1)
+COUNT_BUCKETS   = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+JOB_BUCKETS     = (.01, .05, .1, .5, 1, 5, 10, 30, 60, 300)
+
+SLOWEST_PER_REQUEST = 3
+
+REGISTRY = []
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, help, labels=()):
+        self.name   = name
+        self.help   = help
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock   = threading.Lock()
+        REGISTRY.append(self)
+
+    def key(self, labels):
+        return tuple(str(labels[l]) for l in self.labels)
+
+    def snapshot(self):
+        with self.lock:
+            return sorted((k, list(v) if isinstance(v, list) else v)
+                          for k, v in self.values.items())
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        k = self.key(labels)
+        with self.lock:
+            self.values[k] = self.values.get(k, 0) + amount
+
+    def samples(self):
+        for k, v in self.snapshot():
+            yield self.name, k, (), v
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value, **labels):
+        k = self.key(labels)
+        with self.lock:
+            self.values[k] = value
+
+    def samples(self):
+        for k, v in self.snapshot():
+            yield self.name, k, (), v
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        k = self.key(labels)
+        i = bisect.bisect_left(self.buckets, value)     # first bucket with le >= value
+        with self.lock:
+            v = self.values.get(k)
+            if v is None:
+                # per-bucket counts, then the +Inf bucket, then the sum
+                v = self.values[k] = [0] * (len(self.buckets) + 2)
+            v[i]  += 1
+            v[-1] += value
+
+    def samples(self):
+        for k, v in self.snapshot():
+            total = 0
+            for bound, n in zip(self.buckets + (float("inf"),), v):
+                total += n
+                yield self.name + "_bucket", k, (("le", format_value(bound)),), total
+            yield self.name + "_count", k, (), total
+            yield self.name + "_sum",   k, (), v[-1]
+
+
+REQUESTS = Counter("http_requests_total",
+                   "HTTP requests by route, method and status.", ("route", "method", "status"))
+ERRORS   = Counter("http_request_errors_total",
+                   "HTTP requests answered with a 5xx status.", ("route", "method"))
+LATENCY  = Histogram("http_request_duration_seconds",
+                     "Time spent handling a request.", ("route", "method"))
+REQ_SQL_COUNT = Histogram("http_request_db_queries",
+                          "SQL statements executed per request.", ("route",), COUNT_BUCKETS)
+REQ_SQL_TIME  = Histogram("http_request_db_seconds",
+                          "Time spent in SQL per request.", ("route",), LATENCY_BUCKETS)
+QUERIES    = Counter("db_queries_total", "SQL statements executed.", ("operation",))
+QUERY_TIME = Histogram("db_query_duration_seconds",
+                       "SQL statement execution time.", ("operation",), SQL_BUCKETS)
+JOB_RUNS     = Counter("job_runs_total",
+                       "Scheduler ticks by outcome (ok, error, skipped = lease held elsewhere).",
+                       ("job", "outcome"))
+JOB_DURATION = Histogram("job_duration_seconds",
+                         "Time spent running a job while holding its lease.", ("job",), JOB_BUCKETS)
+JOB_LAG      = Histogram("job_lag_seconds",
+                         "Delay between a job's scheduled and actual start.", ("job",), JOB_BUCKETS)
+JOB_MISSED   = Counter("job_missed_total",
+                       "Runs skipped because they were later than the misfire grace time.", ("job",))
+JOB_LAST_OK  = Gauge("job_last_success_timestamp_seconds",
+                     "Unix time of the job's last successful run in this process.", ("job",))
+STARTED      = Gauge("process_start_time_seconds", "Unix time the process started.")
+STARTED.set(time.time())
+
+
+def format_value(v):
+    if v == float("inf"):
+        return "+Inf"
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return repr(v) if isinstance(v, float) else str(v)
+
+
+def escape(value):
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r'\"')
+
+
+def render():
+    """The whole registry in the Prometheus text exposition format."""
+    lines = []
+    for m in REGISTRY:
+        lines.append(f"# HELP {m.name} {m.help}")
+        lines.append(f"# TYPE {m.name} {m.type}")
+        for name, key, extra, value in m.samples():
+            pairs = list(zip(m.labels, key)) + list(extra)
+            labels = ",".join(f'{k}="{escape(v)}"' for k, v in pairs)
+            lines.append(f"{name}{{{labels}}} {format_value(value)}" if labels
+                         else f"{name} {format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# ---- HTTP requests ----
+
+def route_label():
+    # the URL rule, not the path, so /auctions/1 and /auctions/2 share a series
+    rule = request.url_rule
+    return rule.rule if rule is not None else "<unmatched>"
+
+
+def observe_request(route, method, status, elapsed, sql_count=None, sql_time=None):
+    REQUESTS.inc(route=route, method=method, status=status)
+    LATENCY.observe(elapsed, route=route, method=method)
+    if status >= 500:
+        ERRORS.inc(route=route, method=method)
+    if sql_count is not None:
+        REQ_SQL_COUNT.observe(sql_count, route=route)
+        REQ_SQL_TIME.observe(sql_time, route=route)
+
+
+def before_request():
+    g.metrics_started = time.perf_counter()
+    g.sql_count, g.sql_time, g.sql_slowest = 0, 0.0, []
+
+
+def is_admin():
+    from flask_login import current_user
+    return current_user.is_authenticated and current_user.is_admin
+
+
+def show_server_timing():
+    # query counts and SQL time tell an outsider too much about the schema and data
+    mode = current_app.config["SERVER_TIMING"]
+    return mode == "all" or (mode == "admin" and is_admin())
+
+
+def may_scrape():
+    """/metrics: a logged-in admin, or the bearer token when METRICS_TOKEN is set."""
+    token = current_app.config["METRICS_TOKEN"]
+    if token and request.headers.get("Authorization") == f"Bearer {token}":
+        return True
+    return is_admin()
+
+
+def after_request(response):
+    started = g.pop("metrics_started", None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    route   = route_label()
+    observe_request(route, request.method, response.status_code, elapsed,
+                    g.sql_count, g.sql_time)
+    if show_server_timing():
+        response.headers.add("Server-Timing",
+                             f'db;dur={g.sql_time * 1000:.1f};desc="{g.sql_count} queries", '
+                             f"app;dur={elapsed * 1000:.1f}")
+
+    threshold = current_app.config["METRICS_SLOW_REQUEST_MS"]
+    if threshold and elapsed * 1000 >= threshold:
+        slowest = "; ".join(f"{t * 1000:.1f}ms {' '.join(s.split())[:200]}"
+                            for t, s in sorted(g.sql_slowest, reverse=True))
+        current_app.logger.warning(
+            f"Slow request {request.method} {route}: {elapsed * 1000:.0f}ms, "
+            f"{g.sql_count} queries in {g.sql_time * 1000:.0f}ms; slowest: {slowest or '-'}"
+        )
+    return response
+
+
+# ---- SQL ----
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed   = time.perf_counter() - conn.info["metrics_started"].pop()
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "?"
+    QUERIES.inc(operation=operation)
+    QUERY_TIME.observe(elapsed, operation=operation)
+    if has_request_context() and "sql_slowest" in g:
+        g.sql_count += 1
+        g.sql_time  += elapsed
+        if len(g.sql_slowest) < SLOWEST_PER_REQUEST:
+            heapq.heappush(g.sql_slowest, (elapsed, statement))
+        elif elapsed > g.sql_slowest[0][0]:
+            heapq.heapreplace(g.sql_slowest, (elapsed, statement))
+
+
+def instrument_engine(engine):
+    """Time every statement on `engine` (a sync Engine, or an AsyncEngine's sync_engine)."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute",  _after_cursor_execute)
+
+
+# ---- scheduler ----
+
+def job_name(job_id):
+    return job_id.split("/", 1)[0]
+
+
+def observe_job(name, outcome, elapsed=None):
+    JOB_RUNS.inc(job=name, outcome=outcome)
+    if elapsed is not None:
+        JOB_DURATION.observe(elapsed, job=name)
+    if outcome == "ok":
+        JOB_LAST_OK.set(round(time.time(), 3), job=name)
+
+
+def instrument_scheduler(sched):
+    from apscheduler.events import EVENT_JOB_SUBMITTED, EVENT_JOB_MISSED
+
+    def listener(e):
+        if e.code == EVENT_JOB_MISSED:
+            JOB_MISSED.inc(job=job_name(e.job_id))
+        elif e.scheduled_run_times:
+            lag = datetime.now(timezone.utc) - min(e.scheduled_run_times)
+            JOB_LAG.observe(max(lag.total_seconds(), 0.0), job=job_name(e.job_id))
+
+    sched.add_listener(listener, EVENT_JOB_SUBMITTED | EVENT_JOB_MISSED)
+
+
+def init_app(app, engine):
+    if not app.config["METRICS_ENABLED"]:
+        return
+    app.before_request(before_request)
+    app.after_request(after_request)
+    instrument_engine(engine)
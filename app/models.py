@@ -1,7 +1,6 @@
 # app/models.py
-from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
-from app import db
+from app import db, passwords
 from flask_login import UserMixin
 
 
@@ -10,7 +9,7 @@ class User(UserMixin, db.Model):
     username       = db.Column(db.String(64), unique=True, nullable=False)
     email          = db.Column(db.String(64), unique=True, nullable=False)
     password_hash  = db.Column(db.String(128), nullable=False)
-    full_name       = db.Column(db.String(128), nullable=True)
+    full_name       = db.Column(db.String(128), nullable=True, index=True)
     date_of_birth   = db.Column(db.Date, nullable=True)
     is_rep         = db.Column(db.Boolean, default=False, nullable=False)
     is_admin       = db.Column(db.Boolean, default=False, nullable=False)   
@@ -28,10 +27,15 @@ class User(UserMixin, db.Model):
     )
      
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = passwords.hash_password(password)
  
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        # a match may come back with a hash in the current PASSWORD_HASH_METHOD;
+        # storing it is left to the caller's commit
+        ok, new_hash = passwords.verify_password(self.password_hash, password)
+        if ok and new_hash:
+            self.password_hash = new_hash
+        return ok
     
     def __repr__(self):
         return f"<User {self.username!r}>"   
@@ -98,6 +102,10 @@ class Auction(db.Model):
     winning_bid   = db.Column(db.Float, nullable=True)
     winner        = db.relationship('User', foreign_keys=[winner_id])
     winning_id    = db.Column(db.Integer, default='open', nullable=True)
+    compacted_at  = db.Column(db.DateTime, nullable=True)   # auto-bid ladders -> bid_range
+
+    # AUTOINCREMENT: ids of archived and deleted auctions are never handed out again
+    __table_args__ = {'sqlite_autoincrement': True}
 
     seller = db.relationship(
         'User',
@@ -117,14 +125,16 @@ class Auction(db.Model):
         
 class Bid(db.Model):
     id          = db.Column(db.Integer, primary_key=True)
-    auction_id  = db.Column(db.Integer, db.ForeignKey('auction.id'), nullable=False)
+    auction_id  = db.Column(db.Integer, db.ForeignKey('auction.id'), nullable=False, index=True)
     bidder      = db.Column(db.String(64), nullable=False)
     amount      = db.Column(db.Float,   nullable=False)
     max_bid     = db.Column(db.Float,   nullable=True)
     timestamp   = db.Column(db.DateTime, default=datetime.utcnow)
     bidder_id   = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    
-    
+
+    # archived and compacted bids keep their ids (see Auction)
+    __table_args__ = {'sqlite_autoincrement': True}
+
     person_bidder      = db.relationship(
             'User', 
             backref='bids', 
@@ -164,7 +174,183 @@ class Question(db.Model):
     answered_by = db.relationship('User', foreign_keys=[answered_by_id])
     auction     = db.relationship('Auction', backref='questions')
 
+    __table_args__ = (
+        # the reps' unanswered-questions queue: WHERE answered_at IS NULL ORDER BY id
+        db.Index('ix_question_unanswered', 'answered_at', 'id'),
+        {'sqlite_autoincrement': True},
+    )
     
     def __repr__(self):
         return (f"<Question #{self.id} on auction={self.auction_id} "
                 f"asked_by=user_id={self.user_id!r}>")
+
+
+class JobLease(db.Model):
+    __tablename__ = 'job_lease'
+    name          = db.Column(db.String(64), primary_key=True)
+    owner         = db.Column(db.String(128), nullable=True)
+    acquired_at   = db.Column(db.DateTime, nullable=True)
+    heartbeat_at  = db.Column(db.DateTime, nullable=True)
+    expires_at    = db.Column(db.DateTime, nullable=True)
+    last_run_at   = db.Column(db.DateTime, nullable=True)
+    last_duration = db.Column(db.Float,    nullable=True)
+    last_error    = db.Column(db.Text,     nullable=True)
+    takeovers     = db.Column(db.Integer,  default=0, nullable=False)
+
+    def to_dict(self, now=None):
+        now = now or datetime.utcnow()
+        iso = lambda d: d and d.isoformat()
+        return {
+            'name':          self.name,
+            'owner':         self.owner,
+            'acquired_at':   iso(self.acquired_at),
+            'heartbeat_at':  iso(self.heartbeat_at),
+            'expires_at':    iso(self.expires_at),
+            'expired':       self.expires_at is None or self.expires_at < now,
+            'last_run_at':   iso(self.last_run_at),
+            'last_duration': self.last_duration,
+            'last_error':    self.last_error,
+            'takeovers':     self.takeovers,
+        }
+
+    def __repr__(self):
+        return f"<JobLease {self.name!r} owner={self.owner!r} expires={self.expires_at}>"
+
+
+class ArchivedAuction(db.Model):
+    """A closed auction moved out of the live table by app/archive.py; same columns."""
+    __tablename__ = 'auction_archive'
+    id            = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    item_id       = db.Column(db.Integer, db.ForeignKey('item.id'), nullable=False)
+    seller_id     = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    start_time    = db.Column(db.DateTime, nullable=False)
+    end_time      = db.Column(db.DateTime, nullable=False)
+    init_price    = db.Column(db.Float, nullable=False)
+    increment     = db.Column(db.Float, nullable=False)
+    reserve_price = db.Column(db.Float, nullable=False)
+    status        = db.Column(db.String(10), nullable=False)
+    winner_id     = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    winning_bid   = db.Column(db.Float, nullable=True)
+    winning_id    = db.Column(db.Integer, nullable=True)
+    compacted_at  = db.Column(db.DateTime, nullable=True)
+    archived_at   = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    item   = db.relationship('Item')
+    seller = db.relationship('User', foreign_keys=[seller_id])
+    winner = db.relationship('User', foreign_keys=[winner_id])
+    bids   = db.relationship('ArchivedBid', back_populates='auction')
+
+    def __repr__(self):
+        return f"<ArchivedAuction #{self.id} item={self.item_id} seller={self.seller_id}>"
+
+
+class ArchivedBid(db.Model):
+    __tablename__ = 'bid_archive'
+    id          = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    auction_id  = db.Column(db.Integer, db.ForeignKey('auction_archive.id'), nullable=False, index=True)
+    bidder      = db.Column(db.String(64), nullable=False, index=True)
+    amount      = db.Column(db.Float,   nullable=False)
+    max_bid     = db.Column(db.Float,   nullable=True)
+    timestamp   = db.Column(db.DateTime)
+    bidder_id   = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+
+    auction     = db.relationship('ArchivedAuction', back_populates='bids')
+
+    def __repr__(self):
+        return f"<ArchivedBid {self.amount} by {self.bidder} on auction {self.auction_id}>"
+
+
+class ArchivedQuestion(db.Model):
+    __tablename__ = 'question_archive'
+    id              = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id         = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    auction_id      = db.Column(db.Integer, db.ForeignKey('auction_archive.id'), nullable=False, index=True)
+    question_text   = db.Column(db.Text,    nullable=False)
+    created_at      = db.Column(db.DateTime, nullable=False)
+    answer_text     = db.Column(db.Text,    nullable=True)
+    answered_by_id  = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    answered_at     = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<ArchivedQuestion #{self.id} on auction={self.auction_id}>"
+
+
+class BidRange(db.Model):
+    """
+    One bidder's side of a compacted auto-bid ladder (app/compaction.py): the
+    bids id, id + id_step, ... with amounts first_amount, + amount_step, ...
+    and timestamps first_at + the packed microsecond offsets. Keyed by the
+    auction id, so it serves live and archived auctions alike.
+    """
+    __tablename__ = 'bid_range'
+    id           = db.Column(db.Integer, primary_key=True, autoincrement=False)   # first bid's id
+    auction_id   = db.Column(db.Integer, nullable=False, index=True)
+    bidder       = db.Column(db.String(64), nullable=False, index=True)
+    bidder_id    = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    max_bid      = db.Column(db.Float,   nullable=True)
+    steps        = db.Column(db.Integer, nullable=False)
+    id_step      = db.Column(db.Integer, nullable=False)
+    first_amount = db.Column(db.Float,   nullable=False)
+    amount_step  = db.Column(db.Float,   nullable=False)
+    first_at     = db.Column(db.DateTime, nullable=False)
+    offsets      = db.Column(db.LargeBinary, nullable=False)   # little-endian uint32 per bid
+
+    def __repr__(self):
+        return (f"<BidRange {self.steps} bids by {self.bidder} on auction {self.auction_id} "
+                f"from #{self.id}>")
+
+
+class PurgeJob(db.Model):
+    """A chunked, resumable deletion of a user or an auction and everything under it."""
+    __tablename__ = 'purge_job'
+    id           = db.Column(db.Integer, primary_key=True)
+    kind         = db.Column(db.String(10), nullable=False)                   # 'user' | 'auction'
+    target_id    = db.Column(db.Integer, nullable=False)
+    label        = db.Column(db.String(128), nullable=True)
+    status       = db.Column(db.String(10), default='queued', nullable=False)  # queued|running|done|failed
+    step         = db.Column(db.String(64), nullable=True)
+    progress     = db.Column(db.JSON, nullable=True)                          # step -> rows so far
+    requested_by = db.Column(db.Integer, nullable=True)
+    created_at   = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at   = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    finished_at  = db.Column(db.DateTime, nullable=True)
+    error        = db.Column(db.Text, nullable=True)
+
+    def to_dict(self):
+        iso = lambda d: d and d.isoformat()
+        return {
+            'id':           self.id,
+            'kind':         self.kind,
+            'target_id':    self.target_id,
+            'label':        self.label,
+            'status':       self.status,
+            'step':         self.step,
+            'progress':     self.progress or {},
+            'requested_by': self.requested_by,
+            'created_at':   iso(self.created_at),
+            'updated_at':   iso(self.updated_at),
+            'finished_at':  iso(self.finished_at),
+            'error':        self.error,
+        }
+
+    def __repr__(self):
+        return f"<PurgeJob #{self.id} {self.kind}={self.target_id} status={self.status!r}>"
+
+
+class SalesRollup(db.Model):
+    """Earnings per (period, dimension, key), maintained as auctions close."""
+    __tablename__ = 'sales_rollup'
+    period    = db.Column(db.String(10), primary_key=True)   # 'all' or 'YYYY-MM-DD'
+    dimension = db.Column(db.String(10), primary_key=True)   # 'total' | 'item' | 'category' | 'buyer'
+    key_id    = db.Column(db.Integer,    primary_key=True)
+    label     = db.Column(db.String(128), nullable=False)
+    earnings  = db.Column(db.Float,   default=0.0, nullable=False)
+    sales     = db.Column(db.Integer, default=0,   nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_sales_rollup_top', 'dimension', 'period', 'earnings'),
+    )
+
+    def __repr__(self):
+        return (f"<SalesRollup {self.period} {self.dimension}={self.key_id} "
+                f"earnings={self.earnings}>")
@@ -0,0 +1,138 @@
+# app/passwords.py
+"""
+Password hashing off the request threads.
+
+Werkzeug's hashes are deliberately slow (scrypt by default). They run on a
+small process pool instead of the worker thread, so a burst of logins can
+use at most PASSWORD_POOL_WORKERS cores while bids keep being served. At most
+PASSWORD_POOL_QUEUE further requests may wait for the pool; beyond that
+`PoolSaturated` is raised at once and the app answers 503 with Retry-After.
+
+`verify_password` also reports when a stored hash was made with different
+parameters than PASSWORD_HASH_METHOD, and returns a fresh hash to store. That
+way the method can be tuned and users are migrated as they log in.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from app import metrics
+
+OPS = metrics.Counter("password_hash_ops_total",
+                      "Password hash/verify calls by outcome (ok, rejected, timeout).",
+                      ("op", "outcome"))
+
+
+class PoolSaturated(Exception):
+    """Every worker is busy and the wait queue is full."""
+
+    def __init__(self, retry_after):
+        super().__init__("password hashing pool saturated")
+        self.retry_after = retry_after
+
+
+def _verify_and_rehash(pwhash, password, method):
+    # runs in a pool process: one round trip for the check and the rehash
+    if not check_password_hash(pwhash, password):
+        return False, None
+    if pwhash.split("$", 1)[0] != method_prefix(method):
+        return True, generate_password_hash(password, method=method)
+    return True, None
+
+
+def _exit_with_parent(parent):
+    # runs in each pool process: a parent killed without shutting the pool down
+    # (SIGKILL, os._exit) would otherwise leave the workers blocked forever
+    def watch():
+        while os.getppid() == parent:
+            time.sleep(1)
+        os._exit(0)
+    threading.Thread(target=watch, daemon=True).start()
+
+
+_prefixes = {}
+
+
+def method_prefix(method):
+    """The parameter string Werkzeug writes for `method`, e.g. "scrypt:32768:8:1"."""
+    if method not in _prefixes:
+        # hashing a throwaway value is the only way to learn Werkzeug's defaults
+        _prefixes[method] = generate_password_hash("", method=method).split("$", 1)[0]
+    return _prefixes[method]
+
+
+class PasswordPool:
+    def __init__(self, workers=2, queue=16, timeout=10, retry_after=1, method="scrypt"):
+        self.configure(workers, queue, timeout, retry_after, method)
+        self._executor = None
+        self._pid      = None
+        self._lock     = threading.Lock()
+
+    def configure(self, workers, queue, timeout, retry_after, method):
+        self.workers     = workers
+        self.timeout     = timeout
+        self.retry_after = retry_after
+        self.method      = method
+        self._slots      = threading.BoundedSemaphore(max(workers, 1) + queue)
+
+    def executor(self):
+        # created on first use and again after a fork, so pre-forked workers
+        # each get their own pool instead of sharing the parent's pipes
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    # default start method: spawn/forkserver children would re-import
+                    # __main__ (run.py builds the whole app); the children only ever
+                    # call werkzeug.security
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                         initializer=_exit_with_parent,
+                                                         initargs=(os.getpid(),))
+                    self._pid = os.getpid()
+        return self._executor
+
+    def run(self, op, fn, *args):
+        if self.workers <= 0:
+            return fn(*args)
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            OPS.inc(op=op, outcome="rejected")
+            raise PoolSaturated(self.retry_after)
+        try:
+            future = self.executor().submit(fn, *args)
+        except Exception:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            result = future.result(timeout=self.timeout)
+        except TimeoutError:
+            OPS.inc(op=op, outcome="timeout")
+            raise PoolSaturated(self.retry_after)
+        OPS.inc(op=op, outcome="ok")
+        return result
+
+    def shutdown(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+
+
+POOL = PasswordPool()
+
+
+def hash_password(password):
+    return POOL.run("hash", generate_password_hash, password, POOL.method)
+
+
+def verify_password(pwhash, password):
+    """(matches, new_hash): new_hash is set when the stored hash should be replaced."""
+    return POOL.run("verify", _verify_and_rehash, pwhash, password, POOL.method)
+
+
+def init_app(app):
+    POOL.configure(app.config["PASSWORD_POOL_WORKERS"], app.config["PASSWORD_POOL_QUEUE"],
+                   app.config["PASSWORD_POOL_TIMEOUT"], app.config["PASSWORD_POOL_RETRY_AFTER"],
+                   app.config["PASSWORD_HASH_METHOD"])
@@ -0,0 +1,38 @@
+# app/prefork.py
+"""
+Worker lifecycle under a pre-forking server (gunicorn.conf.py).
+
+The master imports the app once and forks every worker from it, so modules,
+compiled templates and the username index are shared copy-on-write. Nothing
+that owns a socket or a thread may cross the fork: database connections opened
+while the app was built would be used by several processes at once, and
+threads don't survive it at all. `after_fork` therefore drops the inherited
+connections (without closing them under the master) and starts the scheduler
+in the worker. The password and shard pools already start over when they see
+a new pid.
+
+Each worker's scheduler ticks, but the `job_lease` rows let one process do each
+job; `before_exit` hands the leases back so a reload or a recycled worker does
+not leave the jobs idle until JOB_LEASE_SECONDS run out.
+"""
+from app import db, passwords, ratelimit, sharding
+
+
+def after_fork(app):
+    with app.app_context():
+        for engine in {db.engine, *sharding.ROUTER.engines}:
+            engine.dispose(close=False)
+    ratelimit.after_fork()
+    if app.config["SCHEDULER_ENABLED"]:
+        from app.jobs import start_scheduler
+        start_scheduler(app)
+
+
+def before_exit(app):
+    scheduler = getattr(app, "apscheduler", None)
+    if scheduler is not None and scheduler.running:
+        from app.jobs import release_leases
+        scheduler.shutdown(wait=False)
+        with app.app_context():
+            release_leases()
+    passwords.POOL.shutdown()
@@ -0,0 +1,223 @@
+# app/profiling.py
+"""
+On-demand profiling of a single request.
+
+An admin adds `X-Profile: cprofile|sample` (or `?_profile=cprofile|sample`)
+to any request (from anyone else the flag is ignored):
+
+  cprofile  runs the view under cProfile and saves a .prof file (load it with
+            pstats, snakeviz, ...); the page itself is returned as usual.
+  sample    samples the request thread's stack every
+            PROFILE_SAMPLE_INTERVAL_MS and returns flame-graph-ready
+            collapsed stacks (`frame;frame;frame count`) instead of the page.
+
+Both also save the request's SQL breakdown (statements grouped by normalized
+text with count and time, from the main database and every shard) next to
+the profile in PROFILE_DIR, and report the profile id in the X-Profile-Id
+header. Saved profiles are listed on /admin/profiles. One request is
+profiled at a time per process.
+"""
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from flask import current_app, g, request, has_request_context, Response
+from flask_login import current_user
+from sqlalchemy import event
+
+from app.slowlog import normalize
+
+MODES = ("cprofile", "sample")
+EXTENSIONS = {"cprofile": ".prof", "sample": ".collapsed"}
+
+_busy = threading.Lock()
+
+
+def requested_mode():
+    mode = request.headers.get("X-Profile") or request.args.get("_profile")
+    if mode in ("1", "true"):
+        return "cprofile"
+    return mode if mode in MODES else None
+
+
+class Sampler(threading.Thread):
+    """Collects the stacks of one thread at a fixed interval."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval  = interval
+        self.stacks    = Counter()
+        self.stopped   = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    def collapsed(self):
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+
+def start():
+    mode = requested_mode()
+    if mode is None:
+        return None
+    if not (current_user.is_authenticated and current_user.is_admin):
+        return None                       # the flag means nothing to anyone else
+    if not _busy.acquire(blocking=False):
+        g.profile = {'mode': mode, 'busy': True}
+        return None
+
+    g.profile = {'mode': mode, 'sql': defaultdict(lambda: [0, 0.0]),
+                 'started': time.perf_counter()}
+    if mode == "cprofile":
+        g.profile['profiler'] = cProfile.Profile()
+        g.profile['profiler'].enable()
+    else:
+        interval = current_app.config["PROFILE_SAMPLE_INTERVAL_MS"] / 1000
+        g.profile['profiler'] = Sampler(threading.get_ident(), interval)
+        g.profile['profiler'].start()
+    return None
+
+
+def stop(profile):
+    """Stop the profiler (idempotent); returns the wall time in seconds."""
+    profiler = profile.pop('profiler', None)
+    if profiler is None:
+        return profile.get('elapsed', 0.0)
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+    else:
+        profiler.stop()
+    profile['elapsed'] = time.perf_counter() - profile['started']
+    profile['result']  = profiler
+    _busy.release()
+    return profile['elapsed']
+
+
+def finish(response):
+    profile = g.get("profile")
+    if profile is None:
+        return response
+    if profile.get('busy'):
+        response.headers["X-Profile"] = "busy"
+        return response
+
+    elapsed = stop(profile)
+    rule    = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+    pid     = f"{datetime.utcnow():%Y%m%d-%H%M%S-%f}-{request.endpoint or 'unmatched'}"
+    folder  = current_app.config["PROFILE_DIR"]
+    os.makedirs(folder, exist_ok=True)
+
+    sql = sorted(({'statement': s, 'count': n, 'total_ms': round(t * 1000, 3)}
+                  for s, (n, t) in profile['sql'].items()),
+                 key=lambda e: e['total_ms'], reverse=True)
+    with open(os.path.join(folder, pid + ".sql.json"), "w") as f:
+        json.dump({
+            'id':         pid,
+            'mode':       profile['mode'],
+            'method':     request.method,
+            'route':      rule,
+            'path':       request.full_path,
+            'status':     response.status_code,
+            'elapsed_ms': round(elapsed * 1000, 3),
+            'sql_count':  sum(e['count'] for e in sql),
+            'sql_ms':     round(sum(e['total_ms'] for e in sql), 3),
+            'statements': sql,
+        }, f, indent=2)
+
+    path = os.path.join(folder, pid + EXTENSIONS[profile['mode']])
+    if profile['mode'] == "cprofile":
+        profile['result'].dump_stats(path)
+    else:
+        collapsed = profile['result'].collapsed()
+        with open(path, "w") as f:
+            f.write(collapsed)
+        response = Response(collapsed, mimetype="text/plain")
+    prune(folder, current_app.config["PROFILE_KEEP"])
+
+    response.headers["X-Profile-Id"] = pid
+    response.headers["X-Profile-SQL"] = (f"{sum(e['count'] for e in sql)} queries, "
+                                         f"{sum(e['total_ms'] for e in sql):.1f} ms")
+    return response
+
+
+def teardown(exc=None):
+    # after_request is skipped when the response could not be built at all
+    profile = g.get("profile")
+    if profile is not None and not profile.get('busy'):
+        stop(profile)
+
+
+def prune(folder, keep):
+    ids = sorted({name.split(".", 1)[0] for name in os.listdir(folder)}, reverse=True)
+    for stale in ids[keep:]:
+        for ext in (".prof", ".collapsed", ".sql.json"):
+            if os.path.exists(os.path.join(folder, stale + ext)):
+                os.remove(os.path.join(folder, stale + ext))
+
+
+def saved_profiles(folder):
+    """Summaries of the saved profiles, newest first."""
+    if not os.path.isdir(folder):
+        return []
+    out = []
+    for name in sorted(os.listdir(folder), reverse=True):
+        if name.endswith(".sql.json"):
+            with open(os.path.join(folder, name)) as f:
+                meta = json.load(f)
+            meta.pop('statements')
+            meta['file'] = meta['id'] + EXTENSIONS[meta['mode']]
+            out.append(meta)
+    return out
+
+
+# ---- SQL breakdown ----
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["profile_started"].pop()
+    if has_request_context():
+        profile = g.get("profile")
+        if profile is not None and 'sql' in profile:
+            entry = profile['sql'][normalize(statement)]
+            entry[0] += 1
+            entry[1] += elapsed
+
+
+def init_app(app, engine):
+    app.config["PROFILE_DIR"] = app.config["PROFILE_DIR"] or os.path.join(app.instance_path,
+                                                                         "profiles")
+    if not app.config["PROFILE_ENABLED"]:
+        return
+    app.before_request(start)
+    app.after_request(finish)
+    app.teardown_request(teardown)
+    from app import sharding
+    for shard_engine in {engine, *sharding.ROUTER.engines}:
+        instrument_engine(shard_engine)
+
+
+def instrument_engine(engine):
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute",  _after_cursor_execute)
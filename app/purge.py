@@ -0,0 +1,237 @@
+# app/purge.py
+"""
+Set-based deletion of users and auctions.
+
+Deleting through the ORM cascades loaded every item, auction, bid and
+question of the target into the session and removed them one row at a time
+in a single transaction. Here a deletion is a list of steps, each a
+condition on one table. A step runs in chunks: select up to PURGE_CHUNK_SIZE
+matching ids (keyset by id, so a chunk never rescans what the previous one
+covered), delete or update exactly those ids, and commit. Locks are held for
+one chunk at a time.
+
+A chunk that deletes sold auctions (or clears their winner) first takes
+their sales (or the buyer side) out of the report rollups, in the same
+transaction: an auction the close job closes while the purge runs is taken
+out too, and a resumed job never takes a sale out twice.
+
+Progress is stored on a `PurgeJob` row after every chunk, so any process can
+report it (/rep/deletions/<id>). With PURGE_BACKGROUND the request only
+queues the job and a thread does the work. A job runs under its own
+`job_lease` ("purge/<id>"), renewed between chunks, so only one process (and
+one thread in it) works on it at a time. Chunks are idempotent, so a job
+interrupted by a restart is finished by the `purges` scheduler job, or by
+running it again.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import select, delete, update, or_
+
+from app import db, rollups
+from app.jobs import LeaseLost, acquire_lease, drop_lease, heartbeat, running
+from app.models import (User, Item, Auction, Bid, Question, Alert, PurgeJob, BidRange,
+                        ArchivedAuction, ArchivedBid, ArchivedQuestion)
+
+
+SALES_STEP = "sales rollups"
+
+_active      = set()      # ids of the jobs this process is running
+_active_lock = threading.Lock()
+
+
+def user_steps(uid, username):
+    """(name, model, condition, values) in dependency order; values=None deletes."""
+    items    = select(Item.id).where(Item.owner_id == uid)
+    auctions = select(Auction.id).where(or_(Auction.seller_id == uid, Auction.item_id.in_(items)))
+    archived = select(ArchivedAuction.id).where(or_(ArchivedAuction.seller_id == uid,
+                                                    ArchivedAuction.item_id.in_(items)))
+    # compacted ladders are keyed by auction id, live or archived
+    ranged   = or_(BidRange.auction_id.in_(auctions), BidRange.auction_id.in_(archived))
+    return [
+        ("bid ranges on their auctions",         BidRange,         ranged,                                    None),
+        ("their bid ranges",                     BidRange,         BidRange.bidder_id == uid,                 None),
+        # archived history first: it points at their items
+        ("archived bids on their auctions",      ArchivedBid,      ArchivedBid.auction_id.in_(archived),      None),
+        ("archived questions on their auctions", ArchivedQuestion, ArchivedQuestion.auction_id.in_(archived), None),
+        ("their archived bids",                  ArchivedBid,      ArchivedBid.bidder_id == uid,              None),
+        ("their archived questions",             ArchivedQuestion, ArchivedQuestion.user_id == uid,           None),
+        ("their archived answers",               ArchivedQuestion, ArchivedQuestion.answered_by_id == uid,    {'answered_by_id': None}),
+        ("archived auctions they won",           ArchivedAuction,  ArchivedAuction.winner_id == uid,          {'winner_id': None}),
+        ("archived auctions",                    ArchivedAuction,  ArchivedAuction.id.in_(archived),          None),
+        ("bids on their auctions",               Bid,              Bid.auction_id.in_(auctions),              None),
+        ("questions on their auctions",          Question,         Question.auction_id.in_(auctions),         None),
+        ("their bids",                           Bid,              Bid.bidder_id == uid,                      None),
+        ("their questions",                      Question,         Question.user_id == uid,                   None),
+        ("their answers",                        Question,         Question.answered_by_id == uid,            {'answered_by_id': None}),
+        ("auctions they won",                    Auction,          Auction.winner_id == uid,                  {'winner_id': None}),
+        ("auctions",                             Auction,          Auction.id.in_(auctions),                  None),
+        ("items",                                Item,             Item.owner_id == uid,                      None),
+        ("alerts",                               Alert,            Alert.username == username,                None),
+        ("user",                                 User,             User.id == uid,                            None),
+    ]
+
+
+def auction_steps(aid):
+    return [
+        ("bid ranges", BidRange, BidRange.auction_id == aid, None),
+        ("bids",       Bid,      Bid.auction_id == aid,      None),
+        ("questions",  Question, Question.auction_id == aid, None),
+        ("auction",    Auction,  Auction.id == aid,          None),
+    ]
+
+
+def sales_dimensions(model, values):
+    """Rollup dimensions a chunk of this step takes out of the report, or None."""
+    if model not in (Auction, ArchivedAuction):
+        return None
+    if values is None:
+        return rollups.DIMENSIONS
+    # auctions they won stay, without a buyer
+    return ('buyer',) if 'winner_id' in values else None
+
+
+def steps(job):
+    if job.kind == 'user':
+        return user_steps(job.target_id, job.label)
+    return auction_steps(job.target_id)
+
+
+def chunks(model, condition, values, size):
+    """
+    Apply one step `size` rows at a time; yields (rows, sales taken out of the
+    rollups) for each chunk.
+    """
+    dimensions = sales_dimensions(model, values)
+    last = 0
+    while True:
+        # sorted again: with sharding each shard returns its own first `size` ids
+        ids = sorted(db.session.scalars(
+            select(model.id).where(condition, model.id > last).order_by(model.id).limit(size)
+        ).all())[:size]
+        if not ids:
+            return
+        sold = 0
+        if dimensions:
+            sold = rollups.forget_sales(lambda t: t.id.in_(ids), dimensions, tables=(model,))
+        stmt = delete(model) if values is None else update(model).values(**values)
+        db.session.execute(stmt.where(model.id.in_(ids))
+                               .execution_options(synchronize_session=False))
+        last = ids[-1]
+        yield len(ids), sold
+
+
+def run(job_id):
+    """Run (or resume) a job to completion; returns the job."""
+    lease = f"purge/{job_id}"
+    ttl   = current_app.config["JOB_LEASE_SECONDS"]
+    # the lease keeps other processes off the job, _active other threads of this one
+    with _active_lock:
+        mine = job_id not in _active and acquire_lease(lease, ttl)
+        if mine:
+            _active.add(job_id)
+    if not mine:
+        return db.session.get(PurgeJob, job_id)
+    try:
+        with running(lease, ttl):
+            job = _run(job_id)
+    except LeaseLost:
+        # still 'running': the process holding the lease now finishes it
+        db.session.rollback()
+        current_app.logger.warning(f"Purge job {job_id} was taken over by another process")
+        return db.session.get(PurgeJob, job_id)
+    finally:
+        with _active_lock:
+            _active.discard(job_id)
+    drop_lease(lease)
+    return job
+
+
+def _run(job_id):
+    job = db.session.get(PurgeJob, job_id)
+    if job is None or job.status == 'done':
+        return job
+    size  = current_app.config["PURGE_CHUNK_SIZE"]
+    pause = current_app.config["PURGE_CHUNK_PAUSE_MS"] / 1000
+    email = (db.session.scalar(select(User.email).where(User.id == job.target_id))
+             if job.kind == 'user' else None)
+
+    job.status, job.error = 'running', None
+    job.updated_at = datetime.utcnow()
+    db.session.commit()
+    progress = dict(job.progress or {})
+    try:
+        for name, model, condition, values in steps(job):
+            job.step = name
+            for n, sold in chunks(model, condition, values, size):
+                progress[name] = progress.get(name, 0) + n
+                if sold:
+                    progress[SALES_STEP] = progress.get(SALES_STEP, 0) + sold
+                job.progress   = dict(progress)
+                job.updated_at = datetime.utcnow()
+                db.session.commit()
+                heartbeat()
+                if pause:
+                    time.sleep(pause)
+    except LeaseLost:
+        raise
+    except Exception as e:
+        db.session.rollback()
+        job.status, job.error = 'failed', repr(e)
+        job.updated_at = datetime.utcnow()
+        db.session.commit()
+        current_app.logger.exception(f"Purge job {job.id} ({job.kind} {job.target_id}) failed")
+        return job
+
+    job.status, job.step = 'done', None
+    job.finished_at = job.updated_at = datetime.utcnow()
+    db.session.commit()
+    if job.kind == 'user':
+        from app import identity, membership
+        identity.invalidate(job.target_id)
+        if email is not None:
+            membership.removed(job.label, email)
+    return job
+
+
+def _run_in_background(app, job_id):
+    with app.app_context():
+        run(job_id)
+
+
+def submit(kind, target_id, label=None, requested_by=None):
+    """
+    Queue a deletion. With PURGE_BACKGROUND it runs on a thread and the job is
+    returned still queued; otherwise it has run by the time this returns.
+    """
+    job = PurgeJob(kind=kind, target_id=target_id, label=label, requested_by=requested_by)
+    db.session.add(job)
+    db.session.commit()
+    if kind == 'user':
+        # signed out here and now; other workers once their cached copy expires
+        from app import identity
+        identity.invalidate(target_id)
+    if current_app.config["PURGE_BACKGROUND"]:
+        threading.Thread(target=_run_in_background, name=f"purge-{job.id}", daemon=True,
+                         args=(current_app._get_current_object(), job.id)).start()
+        return job
+    return run(job.id)
+
+
+def resume_stalled():
+    """
+    Scheduler job: finish deletions whose process died (no progress for a
+    while). A job whose lease is still held, e.g. by a thread in a slow chunk,
+    is left to it.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config["PURGE_STALL_SECONDS"])
+    stalled = db.session.scalars(
+        select(PurgeJob.id).where(PurgeJob.status.in_(('queued', 'running')),
+                                  PurgeJob.updated_at < cutoff)
+                           .order_by(PurgeJob.id)
+    ).all()
+    for job_id in stalled:
+        run(job_id)
+    return len(stalled)
@@ -0,0 +1,179 @@
+# app/ratelimit.py
+"""
+Admission control for bids: token buckets per bidder and per auction.
+
+A bucket holds up to `burst` tokens and refills at `rate` tokens a second.
+Every bid request takes one token from its bidder's bucket and one from its
+auction's before the view touches the database; when either is empty the
+request is turned away with 429 and a Retry-After of the seconds until a token
+is back, and a bidder token already taken is given back. A few bots hammering
+the last minutes of an auction then use up their own buckets (and at worst
+that auction's), not the whole site.
+
+The bidder is whoever the caller can vouch for: the logged-in user on the
+bid form, the client address together with the claimed username on the JSON
+API (which has no login), so nobody can drain another bidder's bucket by
+bidding in their name.
+
+Buckets live in process memory by default, so every worker enforces the limits
+on its own. With RATE_LIMIT_STORAGE set to a SQLite URI (relative paths live
+in instance/) the processes of a host share them: one row per bucket, taken
+and refilled by a single UPSERT.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import create_engine, text
+
+from app import metrics
+
+DECISIONS = metrics.Counter("rate_limit_requests_total",
+                            "Bid requests checked by limit (user, auction) and outcome "
+                            "(allowed, rejected).",
+                            ("limit", "outcome"))
+
+PRUNE_EVERY = 1000
+
+
+class RateLimited(Exception):
+    """A bucket is empty; a token is back after `retry_after` seconds."""
+
+    def __init__(self, limit, retry_after):
+        super().__init__(f"too many bids per {limit}")
+        self.limit       = limit
+        self.retry_after = retry_after
+
+
+class MemoryBuckets:
+    """Buckets of this process; past `maxsize` the least recently used are dropped (full)."""
+
+    def __init__(self, maxsize=100_000):
+        self.maxsize = maxsize
+        self._data   = OrderedDict()
+        self._lock   = threading.Lock()
+
+    def take(self, key, rate, burst):
+        """Take a token from `key`'s bucket; 0 if there was one, else the seconds to wait."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, stamp = self._data.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - stamp) * rate)
+            wait   = 0 if tokens >= 1 else (1 - tokens) / rate
+            self._data[key] = (tokens - 1 if not wait else tokens, now)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return wait
+
+    def give_back(self, key, burst):
+        with self._lock:
+            if key in self._data:
+                tokens, stamp = self._data[key]
+                self._data[key] = (min(burst, tokens + 1), stamp)
+
+
+class SQLiteBuckets:
+    """Buckets in a SQLite file shared by the processes of a host."""
+
+    CREATE = text("CREATE TABLE IF NOT EXISTS rate_bucket "
+                  "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, stamp REAL NOT NULL)")
+    # the WHERE keeps an empty bucket as it is; no row comes back then
+    TAKE = text("""
+        INSERT INTO rate_bucket (key, tokens, stamp) VALUES (:key, :burst - 1, :now)
+        ON CONFLICT (key) DO UPDATE SET
+            tokens = min(:burst, tokens + (:now - stamp) * :rate) - 1,
+            stamp  = :now
+        WHERE min(:burst, tokens + (:now - stamp) * :rate) >= 1
+        RETURNING tokens
+    """)
+    LEVEL = text("SELECT min(:burst, tokens + (:now - stamp) * :rate) "
+                 "FROM rate_bucket WHERE key = :key")
+    GIVE_BACK = text("UPDATE rate_bucket SET tokens = min(:burst, tokens + 1) WHERE key = :key")
+    PRUNE = text("DELETE FROM rate_bucket WHERE stamp < :before")
+
+    def __init__(self, engine):
+        self.engine  = engine
+        self.horizon = 0       # longest refill seen: older rows are full buckets
+        self._takes  = 0
+        with engine.begin() as conn:
+            conn.execute(self.CREATE)
+
+    def take(self, key, rate, burst):
+        now = time.time()
+        self.horizon = max(self.horizon, burst / rate)
+        self._takes += 1
+        params = {'key': key, 'rate': rate, 'burst': burst, 'now': now}
+        with self.engine.begin() as conn:
+            if conn.execute(self.TAKE, params).first() is not None:
+                wait = 0
+            else:
+                wait = (1 - conn.execute(self.LEVEL, params).scalar()) / rate
+            if self._takes % PRUNE_EVERY == 0:
+                conn.execute(self.PRUNE, {'before': now - self.horizon})
+        return wait
+
+    def give_back(self, key, burst):
+        with self.engine.begin() as conn:
+            conn.execute(self.GIVE_BACK, {'key': key, 'burst': burst})
+
+
+_buckets = None
+_limits  = {}     # limit -> (rate, burst), from config
+
+
+def admit_bid(auction_id, bidder):
+    """
+    Take this bid's tokens, or raise RateLimited (limits with a rate of 0 are
+    off). `bidder` is the caller's identity for the per-user bucket.
+    """
+    if _buckets is None:
+        return
+    taken = []
+    for limit, key in (("user", f"user:{bidder}"), ("auction", f"auction:{auction_id}")):
+        rate, burst = _limits[limit]
+        if rate <= 0:
+            continue
+        wait = _buckets.take(key, rate, burst)
+        DECISIONS.inc(limit=limit, outcome="rejected" if wait else "allowed")
+        if wait:
+            # a busy auction must not also cost the bidder their own allowance
+            for key, burst in taken:
+                _buckets.give_back(key, burst)
+            raise RateLimited(limit, wait)
+        taken.append((key, burst))
+
+
+def retry_after(e):
+    # whole seconds for the header, never 0 (which would invite an immediate retry)
+    return max(1, math.ceil(e.retry_after))
+
+
+def error_body(e):
+    """JSON body of the 429 answer (Flask and ASGI alike); Retry-After is the same value."""
+    return {"error": f"Too many bids per {e.limit} right now, please retry shortly",
+            "retry_after": retry_after(e)}
+
+
+def after_fork():
+    # a forked worker opens its own connections to the bucket file
+    if isinstance(_buckets, SQLiteBuckets):
+        _buckets.engine.dispose(close=False)
+
+
+def init_app(app):
+    global _buckets
+    _limits.update(
+        user=(app.config["BID_RATE_PER_USER"], app.config["BID_BURST_PER_USER"]),
+        auction=(app.config["BID_RATE_PER_AUCTION"], app.config["BID_BURST_PER_AUCTION"]),
+    )
+    if not app.config["RATE_LIMIT_ENABLED"]:
+        _buckets = None
+    elif app.config["RATE_LIMIT_STORAGE"] == "memory":
+        _buckets = MemoryBuckets()
+    else:
+        from app.engine import apply_sqlite_pragmas, sqlite_pragmas
+        from app.sharding import shard_url
+        engine = create_engine(shard_url(app.config["RATE_LIMIT_STORAGE"], app.instance_path))
+        apply_sqlite_pragmas(engine, sqlite_pragmas(app.config))
+        _buckets = SQLiteBuckets(engine)
@@ -0,0 +1,200 @@
+# app/rollups.py
+"""
+Sales-report rollups.
+
+`record_sales` is called in the same transaction that closes auctions (once
+per close-job tick, or once for an auction closed by a view) and adds each
+winning bid to one row per dimension (total, item, category, buyer) for both
+the all-time period and the day the auction ended. The admin report then
+reads a handful of pre-aggregated rows instead of re-joining the whole
+auction history on every view.
+
+Deleting sold auctions (or their buyer) takes the sales back out with
+`forget_sales`, and moving a sold item to another category moves its sales
+with `move_sales`, so the rows keep matching what `rebuild_rollups` computes
+and a later `forget_sales` finds them under the keys it subtracts from.
+"""
+from sqlalchemy import (func, update, insert, delete, select, literal, literal_column,
+                        union_all, tuple_, bindparam)
+
+from app import db, sharding
+from app.models import Auction, ArchivedAuction, Item, Category, User, SalesRollup
+
+ALL_TIME = 'all'
+DIMENSIONS = ('total', 'item', 'category', 'buyer')
+KEY_BATCH  = 500      # rollup keys per IN (...), well under SQLite's bound-parameter limit
+
+
+def _sold(t):
+    return (t.status == 'closed') & (t.winning_bid != None) & (t.winning_bid >= t.reserve_price)
+
+
+def _sales(where, tables=(Auction, ArchivedAuction)):
+    """Sold auctions (live and archived) matching `where(table)`, with their report labels."""
+    rows = []
+    for t in tables:
+        rows += db.session.execute(
+            select(t.end_time, t.winning_bid, t.winner_id, Item.id.label('item_id'), Item.title,
+                   Item.category_id, Category.name.label('category'),
+                   User.username.label('buyer'))
+            .join(Item, Item.id == t.item_id)
+            .join(Category, Category.id == Item.category_id)
+            .outerjoin(User, User.id == t.winner_id)
+            .where(_sold(t), where(t))
+        ).all()
+    return rows
+
+
+def _fold(rows, sign, dimensions=DIMENSIONS):
+    """Add (sign=1) or take out (sign=-1) `rows` in one batch of statements."""
+    deltas = {}
+    for r in rows:
+        keys = [('total', 0, 'total'),
+                ('item', r.item_id, r.title),
+                ('category', r.category_id, r.category)]
+        if r.buyer is not None:
+            keys.append(('buyer', r.winner_id, r.buyer))
+        for period in (ALL_TIME, r.end_time.date().isoformat()):
+            for dimension, key_id, label in keys:
+                if dimension in dimensions:
+                    d = deltas.setdefault((period, dimension, key_id), [label, 0.0, 0])
+                    d[1] += sign * r.winning_bid
+                    d[2] += sign
+    if not deltas:
+        return
+
+    t = SalesRollup.__table__
+    pk = tuple_(t.c.period, t.c.dimension, t.c.key_id)
+    keys = list(deltas)
+    existing = set()
+    for i in range(0, len(keys), KEY_BATCH):
+        existing.update(tuple(k) for k in db.session.execute(
+            select(t.c.period, t.c.dimension, t.c.key_id).where(pk.in_(keys[i:i + KEY_BATCH]))))
+    rows = [{'b_period': k[0], 'b_dimension': k[1], 'b_key_id': k[2],
+             'b_label': label, 'b_earnings': earnings, 'b_sales': sales}
+            for k, (label, earnings, sales) in deltas.items()]
+    found = [r for r in rows if (r['b_period'], r['b_dimension'], r['b_key_id']) in existing]
+    if found:
+        db.session.execute(
+            update(t)
+            .where(t.c.period == bindparam('b_period'), t.c.dimension == bindparam('b_dimension'),
+                   t.c.key_id == bindparam('b_key_id'))
+            .values(label=bindparam('b_label'),
+                    earnings=t.c.earnings + bindparam('b_earnings'),
+                    sales=t.c.sales + bindparam('b_sales')),
+            found)
+    new = [{c: r[f'b_{c}'] for c in ('period', 'dimension', 'key_id', 'label', 'earnings', 'sales')}
+           for r in rows
+           if (r['b_period'], r['b_dimension'], r['b_key_id']) not in existing and r['b_sales'] > 0]
+    if new:
+        db.session.execute(insert(t), new)
+    if sign < 0:
+        # a key with no sales left is one rebuild_rollups would not produce
+        for i in range(0, len(keys), KEY_BATCH):
+            db.session.execute(delete(t).where(pk.in_(keys[i:i + KEY_BATCH]), t.c.sales <= 0))
+
+
+def record_sales(auction_ids):
+    """Fold just-closed auctions into the rollups (those that didn't sell are skipped)."""
+    if auction_ids:
+        _fold(_sales(lambda t: t.id.in_(list(auction_ids)), tables=(Auction,)), 1)
+
+
+def forget_sales(where, dimensions=DIMENSIONS, tables=(Auction, ArchivedAuction)):
+    """Take the sales of auctions matching `where(table)` back out; returns how many."""
+    rows = _sales(where, tables)
+    _fold(rows, -1, dimensions)
+    return len(rows)
+
+
+def move_sales(where, change, dimensions=DIMENSIONS):
+    """
+    Re-key the sales of auctions matching `where(table)` around `change()`,
+    which alters what they are keyed on (an item's category): out under the
+    old keys, in under the new ones, in the caller's transaction.
+    """
+    _fold(_sales(where), -1, dimensions)
+    change()
+    db.session.flush()
+    _fold(_sales(where), 1, dimensions)
+
+
+def rebuild_rollups():
+    """
+    Recompute every rollup from auction history (backfill / repair) with one
+    INSERT ... SELECT ... GROUP BY per (period, dimension), so it stays fast on
+    millions of auctions. Archived auctions count too. With sharding the shards
+    run the same GROUP BYs in parallel and their groups are added up here.
+    """
+    SalesRollup.query.delete()
+    sales = union_all(*(
+        select(t.item_id, t.winner_id, t.end_time, t.winning_bid)
+        .where(t.status == 'closed', t.winning_bid != None, t.winning_bid >= t.reserve_price)
+        for t in (Auction, ArchivedAuction)
+    )).subquery('sales')
+    dimensions = [
+        ('total',    None,        literal_column("'total'"), []),
+        ('item',     Item.id,     Item.title,    [(Item, Item.id == sales.c.item_id)]),
+        ('category', Category.id, Category.name, [(Item, Item.id == sales.c.item_id),
+                                                  (Category, Category.id == Item.category_id)]),
+        ('buyer',    User.id,     User.username, [(User, User.id == sales.c.winner_id)]),
+    ]
+    columns = ['period', 'dimension', 'key_id', 'label', 'earnings', 'sales']
+    for period in (literal_column(f"'{ALL_TIME}'"), func.date(sales.c.end_time)):
+        for dimension, key, label, joins in dimensions:
+            stmt = select(period, literal(dimension), key if key is not None else literal(0),
+                          func.max(label), func.sum(sales.c.winning_bid), func.count())
+            stmt = stmt.select_from(sales)
+            for target, on in joins:
+                stmt = stmt.join(target, on)
+            stmt = stmt.group_by(period, *([key] if key is not None else []))
+            if sharding.ROUTER.enabled:
+                _insert_merged(columns, sharding.gather(stmt))
+            else:
+                db.session.execute(insert(SalesRollup).from_select(columns, stmt))
+    db.session.commit()
+    return sum(n for n, in sharding.gather(select(func.count()).select_from(sales)))
+
+
+def _insert_merged(columns, rows):
+    # each shard grouped its own sales; add up the groups they share
+    merged = {}
+    for period, dimension, key_id, label, earnings, sales in rows:
+        row = merged.setdefault((period, dimension, key_id), [label, 0.0, 0])
+        row[0] = max(row[0], label)
+        row[1] += earnings
+        row[2] += sales
+    if merged:
+        db.session.execute(insert(SalesRollup.__table__),
+                           [dict(zip(columns, (*k, *v))) for k, v in merged.items()])
+
+
+def top(dimension, limit=None, start=None, end=None):
+    """
+    [(label, earnings), ...] for one dimension, best first.
+    With `start`/`end` (ISO dates, inclusive) the daily rows are summed instead
+    of reading the all-time rows.
+    """
+    if start is None and end is None:
+        q = (db.session.query(SalesRollup.label, SalesRollup.earnings)
+               .filter(SalesRollup.dimension == dimension,
+                       SalesRollup.period == ALL_TIME)
+               .order_by(SalesRollup.earnings.desc()))
+    else:
+        earnings = func.sum(SalesRollup.earnings)
+        q = (db.session.query(func.max(SalesRollup.label), earnings)
+               .filter(SalesRollup.dimension == dimension,
+                       SalesRollup.period != ALL_TIME))
+        if start:
+            q = q.filter(SalesRollup.period >= start)
+        if end:
+            q = q.filter(SalesRollup.period <= end)
+        q = q.group_by(SalesRollup.key_id).order_by(earnings.desc())
+    if limit:
+        q = q.limit(limit)
+    return q.all()
+
+
+def total(start=None, end=None):
+    rows = top('total', start=start, end=end)
+    return rows[0][1] if rows else 0.0
@@ -0,0 +1,152 @@
+# app/schema.py
+"""
+Schema setup, run as explicit CLI steps instead of on every process start.
+
+    flask --app run init-db     # empty database: every table and index
+    flask --app run migrate     # existing database: whatever it is missing
+
+`migrate` only adds: new tables, indexes declared on the models, and
+nullable (or server-defaulted) columns. It never drops or alters anything,
+with one exception: SQLite tables the models declare AUTOINCREMENT (auction,
+bid, question, whose archived and compacted rows keep their ids) are rebuilt
+with it, rows and indexes copied over, and their id sequence is raised past
+every id the archive and bid_range tables hold.
+
+With SHARD_DATABASE_URIS set, both also give every shard file its own copy
+of the sharded tables (app/sharding.py).
+"""
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.schema import CreateTable
+
+from app import db
+from app import models   # noqa: F401  (registers every table on db.metadata)
+from app.sharding import ROUTER, SHARDED
+
+
+@contextmanager
+def _shard_engines():
+    # plain engines: with `home` attached, table lookups would see the main file
+    engines = [create_engine(url) for url in ROUTER.urls[1:]]
+    try:
+        yield engines
+    finally:
+        for engine in engines:
+            engine.dispose()
+
+
+# AUTOINCREMENT table -> (table, largest id) for ids it handed out that now live elsewhere
+RETIRED_IDS = {
+    'auction':  [('auction_archive', 'max(id)')],
+    'bid':      [('bid_archive', 'max(id)'),
+                 ('bid_range', 'max(id + (steps - 1) * id_step)')],
+    'question': [('question_archive', 'max(id)')],
+}
+
+
+def _sharded_tables():
+    return [t for t in db.metadata.sorted_tables if t.name in SHARDED]
+
+
+def init_db():
+    """create_all on the current engine(s); returns the number of tables defined."""
+    db.create_all()
+    with _shard_engines() as engines:
+        for engine in engines:
+            db.metadata.create_all(engine, tables=_sharded_tables())
+    return len(db.metadata.tables)
+
+
+def migrate():
+    """Bring an existing database (and shard files) up to the models; returns what was changed."""
+    changes = _migrate(db.engine, db.metadata.sorted_tables)
+    with _shard_engines() as engines:
+        for engine in engines:
+            changes += [f"{engine.url.database}: {c}"
+                        for c in _migrate(engine, _sharded_tables())]
+    return changes
+
+
+def _migrate(engine, tables):
+    inspector = inspect(engine)
+    existing  = set(inspector.get_table_names())
+    changes   = []
+
+    missing = [t for t in tables if t.name not in existing]
+    if missing:
+        db.metadata.create_all(engine, tables=missing)
+        changes += [f"created table {t.name}" for t in missing]
+
+    preparer = engine.dialect.identifier_preparer
+    for table in tables:
+        if table.name not in existing:
+            continue
+        columns = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in columns:
+                continue
+            if not column.nullable and column.server_default is None:
+                changes.append(f"SKIPPED {table.name}.{column.name}: NOT NULL without a "
+                               f"server default, add it by hand")
+                continue
+            ddl = column.type.compile(engine.dialect)
+            default = (f" DEFAULT {column.server_default.arg}"
+                       if column.server_default is not None else "")
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {preparer.quote(table.name)} ADD COLUMN "
+                                  f"{preparer.quote(column.name)} {ddl}{default}"))
+            changes.append(f"added column {table.name}.{column.name}")
+
+        indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in indexes:
+                index.create(engine)
+                changes.append(f"created index {index.name} on {table.name}")
+
+    if engine.dialect.name == 'sqlite':
+        for table in tables:
+            if table.dialect_options['sqlite']['autoincrement']:
+                changes += _autoincrement(engine, table)
+    return changes
+
+
+def _autoincrement(engine, table):
+    """Rebuild `table` with AUTOINCREMENT if it lacks it, then raise its sequence."""
+    changes = []
+    with engine.begin() as conn:
+        sql = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' "
+                                "AND name = :name"), {'name': table.name}).scalar()
+        if 'AUTOINCREMENT' not in sql.upper():
+            # SQLite cannot ALTER a primary key: copy into a new table and swap it in
+            indexes = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'index' "
+                                        "AND tbl_name = :name AND sql IS NOT NULL"),
+                                   {'name': table.name}).scalars().all()
+            new  = f"{table.name}__new"
+            ddl  = str(CreateTable(table).compile(dialect=engine.dialect))
+            q    = engine.dialect.identifier_preparer.quote
+            cols = ", ".join(q(c.name) for c in table.columns)
+            conn.execute(text(ddl.replace(f"CREATE TABLE {q(table.name)} ",
+                                          f"CREATE TABLE {q(new)} ", 1)))
+            conn.execute(text(f"INSERT INTO {q(new)} ({cols}) SELECT {cols} FROM {q(table.name)}"))
+            conn.execute(text(f"DROP TABLE {q(table.name)}"))
+            conn.execute(text(f"ALTER TABLE {q(new)} RENAME TO {q(table.name)}"))
+            for index in indexes:
+                conn.execute(text(index))
+            changes.append(f"rebuilt table {table.name} with AUTOINCREMENT")
+
+        existing = set(inspect(conn).get_table_names())
+        retired  = [conn.execute(text(f"SELECT {expr} FROM {other}")).scalar()
+                    for other, expr in RETIRED_IDS.get(table.name, []) if other in existing]
+        floor = max([r for r in retired if r is not None], default=0)
+        seq   = conn.execute(text("SELECT seq FROM sqlite_sequence WHERE name = :name"),
+                             {'name': table.name}).scalar()
+        if floor > (seq or 0):
+            if seq is None:
+                conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)"),
+                             {'name': table.name, 'seq': floor})
+            else:
+                conn.execute(text("UPDATE sqlite_sequence SET seq = :seq WHERE name = :name"),
+                             {'name': table.name, 'seq': floor})
+            changes.append(f"raised {table.name} ids past {floor}")
+    return changes
@@ -0,0 +1,334 @@
+# app/sharding.py
+"""
+Optional horizontal sharding of auctions and bids across SQLite files.
+
+With SHARD_DATABASE_URIS set, `auction` and `bid` (with their archive and
+`bid_range` tables) are partitioned by auction id over several database
+files: shard 0 is the main database, shards 1.. are the extra files.
+Everything else (users, items, questions, rollups, leases) stays in the main
+database, which every shard connection ATTACHes as `home`, so a shard can
+still join its auctions to items and users.
+
+Shards own disjoint id ranges: shard k hands out ids from k << SHARD_BITS
+upwards, for auctions and bids alike. An id alone therefore names its shard,
+the rows already in the main database are shard 0 as they are, and turning
+sharding on needs no data migration. New auctions are placed round-robin, so
+writes to independent auctions land on different files (and write locks).
+
+`ShardedSession` routes ORM and Core statements that touch a sharded table:
+to one shard when the WHERE clause pins the shard key (`auction.id = ?`,
+`bid.auction_id IN (...)`, a lazy load from a sharded row, or `using(k)`),
+otherwise to every shard with the results concatenated. Flushes go to the
+shard of each row. Cross-shard reads that need an order (list endpoints,
+exports) use `gather`, which runs on all shards in parallel and merges the
+already-sorted parts; aggregates are combined by the caller. A transaction
+that touches several files commits them one after the other.
+"""
+import heapq
+import itertools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from flask_sqlalchemy.session import Session
+from sqlalchemy import column, create_engine, event, func, select, table as sql_table
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter, BooleanClauseList
+from sqlalchemy.sql.util import find_tables
+
+SHARD_BITS = 40
+
+# sharded table -> its shard key; (table, column) pairs whose value names the shard
+SHARDED = {
+    'auction':         'id',
+    'bid':             'auction_id',
+    'auction_archive': 'id',
+    'bid_archive':     'auction_id',
+    'bid_range':       'auction_id',
+}
+KEY_COLUMNS = {(table, key) for table, key in SHARDED.items()} | {(table, 'id') for table in SHARDED}
+
+_pinned = ContextVar("shard", default=None)
+
+
+class ShardingError(Exception):
+    """A statement that cannot be split across shards."""
+
+
+def shard_of(row_id):
+    return row_id >> SHARD_BITS
+
+
+def id_base(shard):
+    return shard << SHARD_BITS
+
+
+class ShardRouter:
+    def __init__(self):
+        self.engines   = []
+        self.urls      = []
+        self._turn     = itertools.count()
+        self._executor = None
+        self._pid      = None
+        self._lock     = threading.Lock()
+
+    @property
+    def enabled(self):
+        return len(self.engines) > 1
+
+    @property
+    def count(self):
+        return max(len(self.engines), 1)
+
+    def shards(self):
+        return range(self.count)
+
+    def configure(self, app, main_engine):
+        from app import metrics, slowlog
+        from app.engine import apply_sqlite_pragmas, sqlite_pragmas
+
+        self.engines = [main_engine]
+        self.urls    = [main_engine.url]
+        uris = app.config["SHARD_DATABASE_URIS"]
+        if not uris:
+            return
+        if main_engine.dialect.name != 'sqlite':
+            raise ShardingError("SHARD_DATABASE_URIS needs a SQLite main database")
+        for uri in uris:
+            url = shard_url(uri, app.instance_path)
+            engine = create_engine(url)
+            apply_sqlite_pragmas(engine, sqlite_pragmas(app.config))
+            attach_home(engine, main_engine.url.database)
+            if app.config["METRICS_ENABLED"]:
+                metrics.instrument_engine(engine)
+            if app.config["SLOW_QUERY_MS"] > 0:
+                slowlog.instrument_engine(engine)
+            self.engines.append(engine)
+            self.urls.append(url)
+
+    def index_of(self, engine):
+        return self.engines.index(engine)
+
+    def place(self):
+        """Shard for a new auction: round-robin, or the `using(k)` shard."""
+        pinned = _pinned.get()
+        if pinned is not None:
+            return pinned
+        return next(self._turn) % self.count
+
+    def executor(self):
+        # one thread per shard; recreated after a fork like the password pool
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=self.count,
+                                                        thread_name_prefix="shard")
+                    self._pid = os.getpid()
+        return self._executor
+
+
+ROUTER = ShardRouter()
+
+
+def shard_url(uri, instance_path):
+    """Relative SQLite paths resolve against the instance folder, as for the main URI."""
+    url = make_url(uri)
+    if url.database and url.database != ':memory:' and not os.path.isabs(url.database):
+        url = url.set(database=os.path.join(instance_path, url.database))
+    return url
+
+
+def attach_home(engine, home_path):
+    """ATTACH the main database as `home` on every new connection of a shard engine."""
+    sync_engine = getattr(engine, 'sync_engine', engine)
+
+    @event.listens_for(sync_engine, 'connect')
+    def attach(dbapi_conn, _record):
+        cursor = dbapi_conn.cursor()
+        cursor.execute("ATTACH DATABASE ? AS home", (home_path,))
+        cursor.close()
+
+
+@contextmanager
+def using(shard):
+    """Send statements on sharded tables (and new auctions) to `shard` only."""
+    token = _pinned.set(shard)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+_sequence = sql_table("sqlite_sequence", column("name"), column("seq"))
+
+
+def next_id(table, shard):
+    """
+    Id expression for a row inserted on `shard`: one past the largest id the
+    shard's table ever handed out (its AUTOINCREMENT sequence, which keeps
+    counting archived and deleted rows), never below the shard's range. None
+    on shard 0, where SQLite's own AUTOINCREMENT fits.
+    """
+    if not shard:
+        return None
+    seq = select(_sequence.c.seq).where(_sequence.c.name == table.name).scalar_subquery()
+    return select(func.max(func.coalesce(seq, 0), func.coalesce(func.max(table.c.id), 0),
+                           id_base(shard)) + 1).scalar_subquery()
+
+
+def instance_shard(mapper, instance):
+    table = mapper.local_table.name
+    if table not in SHARDED:
+        return 0
+    if instance.id is not None:
+        return shard_of(instance.id)
+    key = getattr(instance, SHARDED[table])
+    if key is None and table == 'bid' and instance.auction is not None:
+        key = instance.auction.id
+    return ROUTER.place() if key is None else shard_of(key)
+
+
+# ---- statement routing ----
+
+def _sharded_tables(statement):
+    return {t.name for t in find_tables(statement, check_columns=True, include_aliases=True,
+                                        include_joins=True, include_selects=True,
+                                        include_crud=True)
+            if getattr(t, 'name', None) in SHARDED}
+
+
+def _is_key(expr):
+    table = getattr(expr, 'table', None)
+    return (table is not None and (getattr(table, 'name', None), getattr(expr, 'name', None))
+            in KEY_COLUMNS)
+
+
+def _bound_value(bind, parameters):
+    if bind.callable is not None:
+        return bind.callable()
+    if isinstance(parameters, dict) and bind.key in parameters:
+        return parameters[bind.key]
+    return bind.effective_value
+
+
+def _pinned_by_where(statement, parameters):
+    """Shards allowed by `key = ?` / `key IN (...)` terms AND-ed at the top of the WHERE."""
+    where = getattr(statement, 'whereclause', None)
+    if where is None:
+        return None
+    if isinstance(where, BooleanClauseList) and where.operator is operators.and_:
+        terms = where.clauses
+    else:
+        terms = [where]
+    found = None
+    for term in terms:
+        if not isinstance(term, BinaryExpression):
+            continue
+        column, other = term.left, term.right
+        if not _is_key(column):
+            column, other = other, column
+        if not _is_key(column) or not isinstance(other, BindParameter):
+            continue
+        value = _bound_value(other, parameters)
+        if term.operator is operators.eq:
+            values = [value]
+        elif term.operator is operators.in_op:
+            values = value or []
+        else:
+            continue
+        shards = {shard_of(v) for v in values if v is not None}
+        found = shards if found is None else found & shards
+    return found
+
+
+def shards_for(state):
+    """Shards an ORM execution must run on; None when it touches no sharded table."""
+    if not _sharded_tables(state.statement):
+        return None
+    if _pinned.get() is not None:
+        return [_pinned.get()]
+    parent = state.lazy_loaded_from if state.is_select else None
+    if parent is not None and parent.mapper.local_table.name in SHARDED:
+        return [instance_shard(parent.mapper, parent.obj())]
+    pinned = _pinned_by_where(state.statement, state.parameters)
+    if pinned is None:
+        return list(ROUTER.shards())
+    return sorted(k for k in pinned if k < ROUTER.count) or [0]
+
+
+class ShardedSession(Session):
+    """Flask-SQLAlchemy's session, plus per-shard binds when sharding is on."""
+
+    def __init__(self, db, **kwargs):
+        super().__init__(db, **kwargs)
+        if ROUTER.enabled:
+            self.connection_callable = self._connection_for_instance
+
+    def get_bind(self, mapper=None, clause=None, bind=None, shard=None, **kwargs):
+        if shard is not None and bind is None and ROUTER.enabled:
+            return ROUTER.engines[shard]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _connection_for_instance(self, mapper=None, instance=None, **kwargs):
+        shard = instance_shard(mapper, instance) if instance is not None else 0
+        return self.connection(bind_arguments={"shard": shard})
+
+
+@event.listens_for(ShardedSession, "do_orm_execute")
+def _route(state):
+    if not ROUTER.enabled or state.bind_arguments.get("shard") is not None:
+        return None
+    shards = shards_for(state)
+    if shards is None:
+        return None
+    if len(shards) == 1:
+        state.bind_arguments["shard"] = shards[0]
+        return None
+    if not state.is_select:
+        target = getattr(state.statement, 'table', None)
+        if getattr(target, 'name', None) not in SHARDED:
+            # the shards only read `home`; a write there must come from the main file
+            raise ShardingError(f"cannot fan out a write to {target} across shards")
+    # buffered: a merged ORM result iterated lazily (legacy Query.__iter__) stops
+    # after the first part
+    results = [state.invoke_statement(bind_arguments={"shard": k},
+                                      execution_options={"prebuffer_rows": True})
+               for k in shards]
+    return results[0].merge(*results[1:])
+
+
+def _assign_id(mapper, connection, target):
+    if target.id is None and ROUTER.enabled:
+        target.id = next_id(mapper.local_table, ROUTER.index_of(connection.engine))
+
+
+def gather(stmt, key=None, reverse=False):
+    """
+    Rows of a read-only Core select from every shard, fetched in parallel.
+    With `key`, each shard's rows must already be sorted by it and the parts
+    are merged in that order; otherwise they are concatenated by shard.
+    """
+    if not ROUTER.enabled:
+        from app import db
+        return db.session.execute(stmt).all()
+
+    def run(engine):
+        with engine.connect() as conn:
+            return conn.execute(stmt).all()
+
+    parts = list(ROUTER.executor().map(run, ROUTER.engines))
+    if key is None:
+        return list(itertools.chain.from_iterable(parts))
+    return list(heapq.merge(*parts, key=key, reverse=reverse))
+
+
+def init_app(app, main_engine):
+    ROUTER.configure(app, main_engine)
+    if ROUTER.enabled:
+        from app.models import Auction, Bid
+        for model in (Auction, Bid):
+            if not event.contains(model, "before_insert", _assign_id):
+                event.listen(model, "before_insert", _assign_id)
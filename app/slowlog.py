@@ -0,0 +1,169 @@
+# app/slowlog.py
+"""
+Slow-query log.
+
+Statements slower than SLOW_QUERY_MS are grouped by their normalized text
+(literals and IN-lists replaced by placeholders), so a query that is slow a
+thousand times is one entry with a count and total time. The first sighting
+also captures the bound-parameter shapes (types only, never values), the
+route that ran it and the database's query plan, and is logged once.
+
+Entries live in this process only and are shown, ranked by total time, on
+/admin/slow-queries.
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+
+from flask import has_request_context, request
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+EXPLAINABLE = ("SELECT", "WITH", "UPDATE", "DELETE", "INSERT")
+MAX_ROUTES  = 10
+
+_STRING  = re.compile(r"'(?:[^']|'')*'")
+_NUMBER  = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*(?:\?|%s|%\(\w+\)s)(?:\s*,\s*(?:\?|%s|%\(\w+\)s))*\s*\)",
+                      re.IGNORECASE)
+_SPACE   = re.compile(r"\s+")
+
+# set by the ASGI router, which runs its handlers outside a Flask request
+current_route = ContextVar("slowlog_route", default=None)
+
+
+def normalize(statement):
+    s = _STRING.sub("?", statement)
+    s = _NUMBER.sub("?", s)
+    s = _IN_LIST.sub("IN (...)", s)
+    return _SPACE.sub(" ", s).strip()
+
+
+def param_shape(parameters, executemany=False):
+    """Types of the bound parameters, e.g. "(int, str)" or "500 x (int, float)"."""
+    if executemany:
+        rows = list(parameters or ())
+        return f"{len(rows)} x {param_shape(rows[0])}" if rows else "0 x ()"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in parameters.items()) + "}"
+    return "(" + ", ".join(type(v).__name__ for v in parameters or ()) + ")"
+
+
+def route_label():
+    if not has_request_context():
+        return current_route.get() or "<background>"
+    rule = request.url_rule
+    return f"{request.method} {rule.rule if rule is not None else '<unmatched>'}"
+
+
+def explain(conn, statement, parameters):
+    """The query plan for `statement`, one step per line (SQLite and MySQL)."""
+    dialect = conn.dialect.name
+    cursor  = conn.connection.cursor()
+    try:
+        if dialect == "sqlite":
+            cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+            depth, lines = {0: -1}, []
+            for node, parent, _, detail in cursor.fetchall():
+                depth[node] = depth.get(parent, -1) + 1
+                lines.append("  " * depth[node] + detail)
+            return "\n".join(lines)
+        cursor.execute("EXPLAIN " + statement, parameters)
+        names = [d[0] for d in cursor.description]
+        return "\n".join(", ".join(f"{n}={v}" for n, v in zip(names, row) if v is not None)
+                         for row in cursor.fetchall())
+    finally:
+        cursor.close()
+
+
+class SlowQueryLog:
+    def __init__(self, threshold_ms=100, max_entries=500, capture_plans=True):
+        self.configure(threshold_ms, max_entries, capture_plans)
+        self.entries = {}
+        self.lock    = threading.Lock()
+
+    def configure(self, threshold_ms, max_entries, capture_plans):
+        self.threshold     = threshold_ms / 1000
+        self.max_entries   = max_entries
+        self.capture_plans = capture_plans
+
+    def record(self, conn, statement, parameters, executemany, elapsed):
+        key   = normalize(statement)
+        route = route_label()
+        with self.lock:
+            e = self.entries.get(key)
+            if e is not None:
+                e['count']    += 1
+                e['total_ms'] += elapsed * 1000
+                e['max_ms']    = max(e['max_ms'], elapsed * 1000)
+                e['last_at']   = datetime.utcnow()
+                if route in e['routes'] or len(e['routes']) < MAX_ROUTES:
+                    e['routes'][route] += 1
+                return
+            if len(self.entries) >= self.max_entries:
+                del self.entries[min(self.entries, key=lambda k: self.entries[k]['total_ms'])]
+            e = self.entries[key] = {
+                'statement': key,
+                'params':    param_shape(parameters, executemany),
+                'routes':    Counter({route: 1}),
+                'count':     1,
+                'total_ms':  elapsed * 1000,
+                'max_ms':    elapsed * 1000,
+                'first_at':  datetime.utcnow(),
+                'last_at':   datetime.utcnow(),
+                'plan':      None,
+            }
+
+        # outside the lock: EXPLAIN is another round trip
+        if self.capture_plans and key.split(" ", 1)[0].upper() in EXPLAINABLE:
+            first = parameters[0] if executemany and parameters else parameters
+            try:
+                e['plan'] = explain(conn, statement, first)
+            except Exception as exc:
+                e['plan'] = f"(EXPLAIN failed: {exc})"
+        logger.warning(f"Slow query ({elapsed * 1000:.0f}ms) from {route}: {key}"
+                       + (f"\n{e['plan']}" if e['plan'] else ""))
+
+    def ranked(self, limit=None):
+        with self.lock:
+            rows = [dict(e, routes=e['routes'].most_common()) for e in self.entries.values()]
+        rows.sort(key=lambda e: e['total_ms'], reverse=True)
+        for e in rows:
+            e['avg_ms'] = e['total_ms'] / e['count']
+        return rows[:limit] if limit else rows
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+LOG = SlowQueryLog()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("slowlog_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["slowlog_started"].pop()
+    if elapsed >= LOG.threshold:
+        LOG.record(conn, statement, parameters, executemany, elapsed)
+
+
+def instrument_engine(engine):
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute",  _after_cursor_execute)
+
+
+def init_app(app, engine):
+    if app.config["SLOW_QUERY_MS"] <= 0:
+        return
+    LOG.configure(app.config["SLOW_QUERY_MS"], app.config["SLOW_QUERY_MAX_ENTRIES"],
+                  app.config["SLOW_QUERY_EXPLAIN"])
+    instrument_engine(engine)
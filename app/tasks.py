@@ -2,28 +2,70 @@
 
 from datetime import datetime
 from flask import current_app
+from sqlalchemy import update
 from app import db
 from app.models import Auction, Alert, Item, Bid, User
+from app.rollups import record_sales
 
 
-def close_auctions():
-    to_close = Auction.query.filter(
+def close_auction(a, closed_ids=None):
+    """
+    Mark one auction closed, record its winner (if the reserve was met) and
+    fold the sale into the report rollups. The status flip is a conditional
+    UPDATE so an auction closed concurrently elsewhere is only counted once.
+    With `closed_ids` (the close job's batch) the id is appended there and the
+    caller records the whole batch with `record_sales`.
+    Returns False if someone else already closed it. Caller commits.
+    """
+    top = Bid.query.filter_by(auction_id=a.id) \
+                   .order_by(Bid.amount.desc()) \
+                   .first()
+    if top and top.amount >= a.reserve_price:
+        winner_id, winning_bid = top.bidder_id, top.amount
+    else:
+        winner_id, winning_bid = a.winner_id, (top.amount if top else None)
+
+    # synchronize_session updates `a` in place; no refresh needed
+    closed = db.session.execute(
+        update(Auction)
+        .where(Auction.id == a.id, Auction.status == 'open')
+        .values(status='closed', winner_id=winner_id, winning_bid=winning_bid)
+    ).rowcount
+    if closed:
+        if closed_ids is None:
+            record_sales([a.id])
+        else:
+            closed_ids.append(a.id)
+    return bool(closed)
+
+
+def close_auctions(shard=0, shards=1):
+    """
+    Close every expired open auction whose id falls in this shard
+    (auction.id % shards == shard); their sales go into the rollups in one batch.
+    Returns how many this call closed, leaving out any another worker (or a
+    page view of an ended auction) closed first.
+    """
+    now = datetime.utcnow()
+    q = Auction.query.filter(
         Auction.status=='open',
-        Auction.end_time < now
-    ).all()
+        Auction.end_time <= now
+    )
+    if shards > 1:
+        q = q.filter(Auction.id % shards == shard)
+    to_close = q.all()
 
+    closed_ids = []
     for a in to_close:
-        a.status = 'closed'
-        top = Bid.query.filter_by(auction_id=a.id) \
-                       .order_by(Bid.amount.desc()) \
-                       .first()
-        if top and top.amount >= a.reserve_price:
-            a.winning_bid = top.amount
-            winner = User.query.filter_by(username=top.bidder).first()
-            a.winner_id   = winner.id if winner else None
+        close_auction(a, closed_ids)
+    record_sales(closed_ids)
 
     db.session.commit()
-    current_app.logger.info(f"Closed {len(to_close)} auctions at {now.isoformat()}")
+    if closed_ids:
+        current_app.logger.info(
+            f"Closed {len(closed_ids)} auctions (shard {shard}/{shards}) at {now.isoformat()}"
+        )
+    return len(closed_ids)
 
 
 def process_alerts():
@@ -0,0 +1,7 @@
+from app.asgi import create_asgi_app
+
+app = create_asgi_app()
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="127.0.0.1", port=5000)
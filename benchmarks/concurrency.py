@@ -0,0 +1,142 @@
+# benchmarks/concurrency.py
+"""
+Concurrent-connection capacity: sync (Werkzeug, threaded), debug (the same with
+debug=True, as run.py starts it), async (uvicorn) and gunicorn (pre-forked gthread
+workers, gunicorn.conf.py).
+
+Seeds a throwaway SQLite database, starts each server in a subprocess and
+hammers GET /auctions/<id> with N concurrent clients for a fixed duration.
+
+    python -m benchmarks.concurrency --levels 10 100 500 --seconds 10
+    GUNICORN_WORKERS=4 python -m benchmarks.concurrency --modes debug gunicorn
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVERS = {
+    "sync":  [sys.executable, "-c",
+              "from app import create_app; "
+              "create_app().run(host='127.0.0.1', port={port}, threaded=True)"],
+    "debug": [sys.executable, "-c",
+              "from app import create_app; "
+              "create_app().run(host='127.0.0.1', port={port}, threaded=True, debug=True, "
+              "use_reloader=False)"],
+    "async": [sys.executable, "-m", "uvicorn", "asgi:app",
+              "--host", "127.0.0.1", "--port", "{port}", "--log-level", "warning"],
+    "gunicorn": [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+                 "--bind", "127.0.0.1:{port}", "wsgi:app"],
+}
+
+
+def seed(db_path, bids=50):
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    from app import create_app, db
+    from app.models import User, Category, Item, Auction, Bid
+
+    app = create_app()
+    with app.app_context():
+        from app.schema import init_db
+        init_db()
+        u = User(username="bench", email="bench@example.com")
+        u.set_password("bench")
+        cat = Category(name="Bench")
+        db.session.add_all([u, cat])
+        db.session.flush()
+        item = Item(title="Bench item", category_id=cat.id, owner_id=u.id)
+        db.session.add(item)
+        db.session.flush()
+        auc = Auction(item_id=item.id, seller_id=u.id,
+                      end_time=datetime.utcnow() + timedelta(days=1),
+                      init_price=1.0, increment=1.0, reserve_price=1.0)
+        db.session.add(auc)
+        db.session.flush()
+        db.session.add_all(Bid(auction_id=auc.id, bidder="bench", bidder_id=u.id,
+                               amount=2.0 + i) for i in range(bids))
+        db.session.commit()
+        return auc.id
+
+
+async def fetch(port, path):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    data = await reader.read()
+    writer.close()
+    return data.startswith(b"HTTP/1.1 200") or data.startswith(b"HTTP/1.0 200")
+
+
+async def drive(port, path, clients, seconds):
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + seconds
+
+    async def client():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            try:
+                ok = await asyncio.wait_for(fetch(port, path), timeout=10)
+            except (OSError, asyncio.TimeoutError):
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - t0)
+            else:
+                errors += 1
+
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return latencies, errors
+
+
+def wait_ready(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if asyncio.run(fetch(port, "/ping")):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not come up")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--levels",  type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--port",    type=int, default=5055)
+    parser.add_argument("--modes",   nargs="+", choices=SERVERS, default=list(SERVERS))
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    auc_id  = seed(db_path)
+    env     = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}")
+
+    print(f"{'mode':8} {'clients':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for mode in args.modes:
+        cmd  = SERVERS[mode]
+        proc = subprocess.Popen([c.format(port=args.port) for c in cmd], cwd=ROOT, env=env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_ready(args.port)
+            for clients in args.levels:
+                lat, errors = asyncio.run(drive(args.port, f"/auctions/{auc_id}",
+                                                clients, args.seconds))
+                lat.sort()
+                p50 = statistics.median(lat) * 1000 if lat else float("nan")
+                p99 = lat[int(len(lat) * 0.99) - 1] * 1000 if lat else float("nan")
+                print(f"{mode:8} {clients:7d} {len(lat) / args.seconds:9.1f} "
+                      f"{p50:8.1f} {p99:8.1f} {errors:7d}")
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+# benchmarks/datagen.py
+"""
+Synthetic data generator.
+
+Fills a database with users, a category tree, items, auctions (past and live),
+bid ladders including proxy auto-bid runs, alerts and questions, using batched
+Core executemany inserts with explicit ids (no per-row round trips). Every
+user's password is "password"; user 1 is an admin ("admin") and user 2 a
+customer rep ("rep").
+
+    python -m benchmarks.datagen --db /tmp/load.db --users 10000 --auctions 50000 --bids 20
+"""
+import argparse
+import os
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import create_engine, insert
+from werkzeug.security import generate_password_hash
+
+from app import db
+from app.engine import SQLITE_PROFILES, apply_sqlite_pragmas
+from app.models import User, Category, Item, Auction, Bid, Alert, Question
+
+BATCH = 10000
+WORDS = ("vintage camera lens guitar amp bicycle watch laptop phone desk lamp chair "
+         "record vinyl jacket boots console controller drone speaker monitor keyboard").split()
+
+
+def batched(conn, model, rows):
+    """executemany `rows` (an iterator of dicts) in BATCH-sized chunks; returns the count."""
+    n, chunk = 0, []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == BATCH:
+            conn.execute(insert(model), chunk)
+            n += len(chunk)
+            chunk = []
+    if chunk:
+        conn.execute(insert(model), chunk)
+        n += len(chunk)
+    return n
+
+
+def gen_users(n, pw_hash):
+    # every row carries every column: executemany takes its columns from the first one
+    born = lambda: date(1950, 1, 1) + timedelta(days=random.randrange(55 * 365))
+    yield {'id': 1, 'username': 'admin', 'email': 'admin@example.com',
+           'password_hash': pw_hash, 'full_name': 'Admin', 'date_of_birth': born(),
+           'is_admin': True, 'is_rep': False}
+    yield {'id': 2, 'username': 'rep', 'email': 'rep@example.com',
+           'password_hash': pw_hash, 'full_name': 'Rep', 'date_of_birth': born(),
+           'is_admin': False, 'is_rep': True}
+    for i in range(3, n + 1):
+        yield {'id': i, 'username': f'user{i}', 'email': f'user{i}@example.com',
+               'password_hash': pw_hash, 'full_name': f'User {i}', 'date_of_birth': born(),
+               'is_admin': False, 'is_rep': False}
+
+
+def gen_categories(roots, children):
+    cid = 0
+    for r in range(roots):
+        cid += 1
+        root = cid
+        yield {'id': root, 'name': f'{random.choice(WORDS).title()} {r}', 'parent_id': None}
+        for c in range(children):
+            cid += 1
+            yield {'id': cid, 'name': f'{random.choice(WORDS).title()} {r}.{c}',
+                   'parent_id': root}
+
+
+def gen_items(n, users, categories):
+    for i in range(1, n + 1):
+        title = ' '.join(random.sample(WORDS, 3))
+        yield {'id': i, 'title': title, 'description': f'A fine {title}, lightly used.',
+               'category_id': random.randint(1, categories),
+               'owner_id': random.randint(3, users)}
+
+
+class Ladders:
+    """Builds auctions and their bids together so winners and prices agree."""
+
+    def __init__(self, users, items, mean_bids, proxy_share, history_days, now):
+        self.users, self.items = users, items
+        self.mean_bids, self.proxy_share = mean_bids, proxy_share
+        self.history_days, self.now = history_days, now
+        self.bid_id = 0
+        self.pending_bids = []
+
+    def auctions(self, n):
+        for aid in range(1, n + 1):
+            start = self.now - timedelta(seconds=random.uniform(0, self.history_days * 86400))
+            end   = start + timedelta(days=random.choice((1, 3, 5, 7)))
+            init, inc = round(random.uniform(1, 200), 2), random.choice((0.5, 1.0, 5.0))
+            reserve = round(init * random.uniform(1.0, 3.0), 2)
+            seller  = random.randint(3, self.users)
+            bids    = self.ladder(aid, seller, start, min(end, self.now), init, inc)
+            self.pending_bids.extend(bids)
+
+            closed = end <= self.now
+            top    = bids[-1] if bids else None
+            sold   = closed and top is not None and top['amount'] >= reserve
+            yield {
+                'id': aid, 'item_id': random.randint(1, self.items), 'seller_id': seller,
+                'start_time': start, 'end_time': end, 'init_price': init,
+                'increment': inc, 'reserve_price': reserve,
+                'status': 'closed' if closed else 'open',
+                'winner_id': top['bidder_id'] if sold else None,
+                'winning_bid': top['amount'] if closed and top else None,
+                'winning_id': top['bidder_id'] if top else None,
+            }
+
+    def ladder(self, aid, seller, start, stop, price, inc):
+        n = int(random.expovariate(1 / self.mean_bids)) if self.mean_bids else 0
+        if n == 0 or stop <= start:
+            return []
+        span  = (stop - start).total_seconds()
+        times = sorted(start + timedelta(seconds=random.uniform(0, span)) for _ in range(n))
+        bids, last = [], None
+        i = 0
+        while i < n:
+            bidder = random.randint(3, self.users)
+            if bidder in (seller, last):
+                bidder = 3 + (bidder - 2) % (self.users - 2)
+            if random.random() < self.proxy_share and i + 2 < n:
+                # two proxies fight it out: alternating one-increment auto steps
+                rival = 3 + (bidder - 2) % (self.users - 2)
+                steps = random.randint(2, min(50, n - i))
+                ceiling = price + inc * (steps + 1)
+                for s in range(steps):
+                    who = (bidder, rival)[s % 2]
+                    price += inc
+                    bids.append(self.bid(aid, who, price, ceiling, times[i]))
+                    i += 1
+                last = (bidder, rival)[(steps - 1) % 2]
+            else:
+                price += inc * random.randint(1, 5)
+                bids.append(self.bid(aid, bidder, price, None, times[i]))
+                last = bidder
+                i += 1
+        return bids
+
+    def bid(self, aid, bidder, amount, max_bid, ts):
+        self.bid_id += 1
+        return {'id': self.bid_id, 'auction_id': aid, 'bidder': f'user{bidder}',
+                'bidder_id': bidder, 'amount': round(amount, 2), 'max_bid': max_bid,
+                'timestamp': ts}
+
+
+def gen_alerts(n, users, categories):
+    for i in range(1, n + 1):
+        crit = {'category_id': random.randint(1, categories)}
+        if random.random() < 0.5:
+            crit['max_price'] = round(random.uniform(10, 500), 2)
+        yield {'id': i, 'username': f'user{random.randint(3, users)}',
+               'criteria_json': crit, 'created_at': datetime.utcnow()}
+
+
+def gen_questions(n, users, auctions, now):
+    for i in range(1, n + 1):
+        asked = now - timedelta(seconds=random.uniform(0, 30 * 86400))
+        answered = random.random() < 0.6
+        yield {'id': i, 'user_id': random.randint(3, users),
+               'auction_id': random.randint(1, auctions),
+               'question_text': 'Is this still available?', 'created_at': asked,
+               'answer_text': 'Yes.' if answered else None,
+               'answered_by_id': 2 if answered else None,
+               'answered_at': asked + timedelta(hours=2) if answered else None}
+
+
+def generate(url, users=1000, roots=10, children=8, items=5000, auctions=5000,
+             bids=10, proxy_share=0.3, alerts=500, questions=2000, history_days=90,
+             seed=527, log=print):
+    random.seed(seed)
+    engine = create_engine(url)
+    apply_sqlite_pragmas(engine, SQLITE_PROFILES['unsafe'])
+    db.metadata.create_all(engine)
+
+    now        = datetime.utcnow()
+    categories = roots * (children + 1)
+    pw_hash    = generate_password_hash('password')
+    ladders    = Ladders(users, items, bids, proxy_share, history_days, now)
+
+    with engine.begin() as conn:
+        for name, model, rows in (
+            ('users',      User,     gen_users(users, pw_hash)),
+            ('categories', Category, gen_categories(roots, children)),
+            ('items',      Item,     gen_items(items, users, categories)),
+        ):
+            t0 = time.perf_counter()
+            log(f"{name:>10}: {batched(conn, model, rows):>9,} in {time.perf_counter() - t0:.1f}s")
+
+        t0, n_auc, n_bid = time.perf_counter(), 0, 0
+        chunk = []
+        for a in ladders.auctions(auctions):
+            chunk.append(a)
+            if len(chunk) == BATCH // 10:
+                n_auc += batched(conn, Auction, chunk)
+                n_bid += batched(conn, Bid, ladders.pending_bids)
+                chunk, ladders.pending_bids = [], []
+        n_auc += batched(conn, Auction, chunk)
+        n_bid += batched(conn, Bid, ladders.pending_bids)
+        log(f"{'auctions':>10}: {n_auc:>9,} in {time.perf_counter() - t0:.1f}s "
+            f"(with {n_bid:,} bids)")
+
+        for name, model, rows in (
+            ('alerts',    Alert,    gen_alerts(alerts, users, categories)),
+            ('questions', Question, gen_questions(questions, users, auctions, now)),
+        ):
+            t0 = time.perf_counter()
+            log(f"{name:>10}: {batched(conn, model, rows):>9,} in {time.perf_counter() - t0:.1f}s")
+    engine.dispose()
+    return {'users': users, 'auctions': auctions, 'bids': n_bid}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--db", required=True, help="SQLite file path or SQLAlchemy URL")
+    parser.add_argument("--users",       type=int,   default=1000)
+    parser.add_argument("--roots",       type=int,   default=10, help="top-level categories")
+    parser.add_argument("--children",    type=int,   default=8,  help="subcategories per root")
+    parser.add_argument("--items",       type=int,   default=5000)
+    parser.add_argument("--auctions",    type=int,   default=5000)
+    parser.add_argument("--bids",        type=float, default=10, help="mean bids per auction")
+    parser.add_argument("--proxy-share", type=float, default=0.3)
+    parser.add_argument("--alerts",      type=int,   default=500)
+    parser.add_argument("--questions",   type=int,   default=2000)
+    parser.add_argument("--days",        type=int,   default=90, help="history span")
+    parser.add_argument("--seed",        type=int,   default=527)
+    args = parser.parse_args()
+
+    url = args.db if "://" in args.db else f"sqlite:///{os.path.abspath(args.db)}"
+    generate(url, args.users, args.roots, args.children, args.items, args.auctions,
+             args.bids, args.proxy_share, args.alerts, args.questions, args.days, args.seed)
+    print(f"Done. Rebuild the report rollups with:\n"
+          f"  DATABASE_URL={url} flask --app run rebuild-rollups")
+
+
+if __name__ == "__main__":
+    main()
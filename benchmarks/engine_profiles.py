@@ -0,0 +1,113 @@
+# benchmarks/engine_profiles.py
+"""
+Bid-commit and read throughput for each SQLite PRAGMA profile.
+
+Writer threads insert one bid per transaction (like place_bid) while reader
+threads keep asking for the current high bid (like auction_detail), all
+against a fresh database file per profile.
+
+    python -m benchmarks.engine_profiles --seconds 5 --writers 2 --readers 4
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert, select, func
+from sqlalchemy.exc import OperationalError
+
+from app import db
+from app.engine import SQLITE_PROFILES, apply_sqlite_pragmas
+from app.models import User, Category, Item, Auction, Bid
+
+
+def setup(engine, auctions=20):
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{'id': 1, 'username': 'bench', 'email': 'b@x',
+                                     'password_hash': '-'}])
+        conn.execute(insert(Category), [{'id': 1, 'name': 'Bench'}])
+        conn.execute(insert(Item), [{'id': 1, 'title': 'Bench', 'category_id': 1,
+                                     'owner_id': 1}])
+        conn.execute(insert(Auction), [{
+            'id': i, 'item_id': 1, 'seller_id': 1, 'start_time': datetime.utcnow(),
+            'end_time': datetime.utcnow() + timedelta(days=1), 'init_price': 1.0,
+            'increment': 1.0, 'reserve_price': 1.0, 'status': 'open',
+        } for i in range(1, auctions + 1)])
+
+
+def run(profile, seconds, writers, readers, auctions=20):
+    path   = os.path.join(tempfile.mkdtemp(), f"{profile}.db")
+    engine = create_engine(f"sqlite:///{path}", pool_size=writers + readers)
+    apply_sqlite_pragmas(engine, SQLITE_PROFILES[profile])
+    setup(engine, auctions)
+
+    deadline = time.perf_counter() + seconds
+    commits, reads, read_lat, errors = [0], [0], [], [0]
+    lock = threading.Lock()
+
+    def writer(n):
+        amount = 1.0
+        while time.perf_counter() < deadline:
+            amount += 1
+            try:
+                with engine.begin() as conn:
+                    conn.execute(insert(Bid).values(
+                        auction_id=(n % auctions) + 1, bidder='bench', bidder_id=1,
+                        amount=amount, timestamp=datetime.utcnow()))
+                with lock:
+                    commits[0] += 1
+            except OperationalError:
+                with lock:
+                    errors[0] += 1
+
+    def reader(n):
+        i = n
+        while time.perf_counter() < deadline:
+            i += 1
+            t0 = time.perf_counter()
+            try:
+                with engine.connect() as conn:
+                    conn.execute(select(func.max(Bid.amount))
+                                 .where(Bid.auction_id == (i % auctions) + 1)).scalar()
+                with lock:
+                    reads[0] += 1
+                    read_lat.append(time.perf_counter() - t0)
+            except OperationalError:
+                with lock:
+                    errors[0] += 1
+
+    threads = ([threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+               + [threading.Thread(target=reader, args=(n,)) for n in range(readers)])
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    engine.dispose()
+
+    read_lat.sort()
+    p99 = read_lat[int(len(read_lat) * 0.99) - 1] * 1000 if read_lat else float('nan')
+    med = statistics.median(read_lat) * 1000 if read_lat else float('nan')
+    return commits[0] / seconds, reads[0] / seconds, med, p99, errors[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--profiles", nargs="+", default=list(SQLITE_PROFILES))
+    parser.add_argument("--seconds",  type=float, default=5)
+    parser.add_argument("--writers",  type=int, default=2)
+    parser.add_argument("--readers",  type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{'profile':8} {'commits/s':>10} {'reads/s':>9} {'read p50 ms':>12} "
+          f"{'read p99 ms':>12} {'errors':>7}")
+    for profile in args.profiles:
+        c, r, p50, p99, e = run(profile, args.seconds, args.writers, args.readers)
+        print(f"{profile:8} {c:10.1f} {r:9.1f} {p50:12.2f} {p99:12.2f} {e:7d}")
+
+
+if __name__ == "__main__":
+    main()
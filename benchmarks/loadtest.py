@@ -0,0 +1,217 @@
+# benchmarks/loadtest.py
+"""
+End-to-end load driver.
+
+Runs a weighted mix of browse, auction_detail, place_bid, list_auctions and
+admin_detail requests at a fixed concurrency, either in-process through the
+Flask test client or against a running server (--url), and reports
+p50/p95/p99 latency and throughput per route. Point it at a database built by
+benchmarks/datagen.py (users log in with "password"; user 1 is the admin).
+
+In-process runs switch the bid rate limits off, as a handful of users bid
+far faster than any person. A server under test (--url) keeps its own
+settings; its 429 answers are counted under "limited" and left out of the
+latencies, so they don't pass for fast bids.
+
+    python -m benchmarks.datagen  --db /tmp/load.db --users 10000 --auctions 50000
+    python -m benchmarks.loadtest --db /tmp/load.db --concurrency 16 --seconds 30
+    python -m benchmarks.loadtest --db /tmp/load.db --url http://127.0.0.1:5000
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+
+from sqlalchemy import create_engine, select, func
+
+from app.models import User, Auction, Category
+
+DEFAULT_MIX = "browse=3,auction_detail=3,place_bid=2,list_auctions=2,admin_detail=1"
+WORDS = ("camera guitar watch laptop lamp vinyl boots drone speaker keyboard").split()
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return float('nan')
+    k = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values))) - 1))
+    return sorted_values[k]
+
+
+class TestClientSession:
+    """Flask test client wrapper with the same call shape as HTTPSession."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, form=None, json_body=None):
+        resp = self.client.open(path, method=method, data=form, json=json_body)
+        return resp.status_code
+
+
+class HTTPSession:
+    def __init__(self, base_url):
+        self.base   = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()),
+            NoRedirect())
+
+    def request(self, method, path, form=None, json_body=None):
+        data, headers = None, {}
+        if form is not None:
+            data = urllib.parse.urlencode(form).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        elif json_body is not None:
+            data = json.dumps(json_body).encode()
+            headers['Content-Type'] = 'application/json'
+        req = urllib.request.Request(self.base + path, data=data, headers=headers, method=method)
+        try:
+            with self.opener.open(req, timeout=30) as resp:
+                resp.read()
+                return resp.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Workload:
+    def __init__(self, url):
+        engine = create_engine(url)
+        with engine.connect() as conn:
+            self.max_user   = conn.execute(select(func.max(User.id))).scalar()
+            self.open_ids   = conn.execute(select(Auction.id)
+                                           .where(Auction.status == 'open')
+                                           .limit(10000)).scalars().all()
+            self.categories = conn.execute(select(Category.id)).scalars().all()
+        engine.dispose()
+        if not self.open_ids:
+            raise SystemExit("no open auctions; generate data with benchmarks.datagen first")
+        self.bid_seq = 0
+        self.lock    = threading.Lock()
+
+    def next_max_bid(self):
+        with self.lock:
+            self.bid_seq += 1
+            return 1e6 + self.bid_seq * 100
+
+    # one method per route: takes a session, returns the HTTP status
+    def browse(self, s):
+        return s.request('GET', f'/browse?q={random.choice(WORDS)}')
+
+    def auction_detail(self, s):
+        return s.request('GET', f'/auctions/{random.choice(self.open_ids)}/detail')
+
+    def place_bid(self, s):
+        return s.request('POST', f'/auctions/{random.choice(self.open_ids)}/bid',
+                         json_body={'username': f'user{random.randint(3, self.max_user)}',
+                                    'max_bid': self.next_max_bid()})
+
+    def list_auctions(self, s):
+        return s.request('GET', f'/auctions?status=open&category_id={random.choice(self.categories)}')
+
+    def admin_detail(self, s):
+        return s.request('GET', '/admin/1')
+
+    ADMIN_ROUTES = {'admin_detail'}
+
+
+def login(session, username):
+    status = session.request('POST', '/auth/login',
+                             form={'username': username, 'password': 'password'})
+    if status not in (200, 302):
+        raise SystemExit(f"login as {username!r} failed with HTTP {status}")
+
+
+def run(make_session, workload, mix, concurrency, seconds):
+    routes, weights = zip(*mix.items())
+    stats   = defaultdict(list)
+    errors  = defaultdict(int)
+    limited = defaultdict(int)
+    lock   = threading.Lock()
+    deadline = [None]
+    # the clock starts once every worker has logged in
+    ready = threading.Barrier(concurrency + 1,
+                              action=lambda: deadline.__setitem__(0, time.perf_counter() + seconds))
+
+    def worker(n):
+        user_s, admin_s = make_session(), make_session()
+        login(user_s, f'user{3 + n % (workload.max_user - 2)}')
+        login(admin_s, 'admin')
+        ready.wait()
+        while time.perf_counter() < deadline[0]:
+            route = random.choices(routes, weights)[0]
+            s = admin_s if route in workload.ADMIN_ROUTES else user_s
+            t0 = time.perf_counter()
+            try:
+                status = getattr(workload, route)(s)
+            except OSError:
+                status = 599
+            dt = time.perf_counter() - t0
+            with lock:
+                if status == 429:
+                    limited[route] += 1
+                    continue
+                stats[route].append(dt)
+                if status >= 500 or status in (401, 403):
+                    errors[route] += 1
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    for t in threads:
+        t.start()
+    ready.wait()
+    for t in threads:
+        t.join()
+    return stats, errors, limited
+
+
+def report(stats, errors, limited, seconds):
+    print(f"{'route':15} {'count':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'errors':>7} {'limited':>8}")
+    total = 0
+    for route in sorted(stats.keys() | limited.keys()):
+        lat = sorted(stats[route])
+        total += len(lat)
+        print(f"{route:15} {len(lat):7d} {len(lat) / seconds:8.1f} "
+              f"{percentile(lat, 50) * 1000:8.1f} {percentile(lat, 95) * 1000:8.1f} "
+              f"{percentile(lat, 99) * 1000:8.1f} {errors[route]:7d} {limited[route]:8d}")
+    print(f"{'total':15} {total:7d} {total / seconds:8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--db", required=True, help="SQLite file path or SQLAlchemy URL")
+    parser.add_argument("--url", help="base URL of a running server (default: in-process)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="route=weight,...")
+    args = parser.parse_args()
+
+    db_url = args.db if "://" in args.db else f"sqlite:///{os.path.abspath(args.db)}"
+    mix = {k: float(v) for k, v in (p.split('=') for p in args.mix.split(','))}
+    workload = Workload(db_url)
+
+    if args.url:
+        make_session = lambda: HTTPSession(args.url)
+    else:
+        os.environ["DATABASE_URL"] = db_url
+        os.environ["RATE_LIMIT_ENABLED"] = "false"
+        from app import create_app
+        app = create_app()
+        make_session = lambda: TestClientSession(app)
+
+    stats, errors, limited = run(make_session, workload, mix, args.concurrency, args.seconds)
+    report(stats, errors, limited, args.seconds)
+
+
+if __name__ == "__main__":
+    main()
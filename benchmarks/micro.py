@@ -0,0 +1,393 @@
+# benchmarks/micro.py
+"""
+Microbenchmarks for the hot paths, with regression thresholds.
+
+Each benchmark runs against a database generated by benchmarks/datagen.py at a
+fixed scale (1k, 100k or 1m bids). The pristine file is cached in --data-dir
+and copied to a scratch file before every benchmark, so runs don't see each
+other's writes. A benchmark runs at least --repeat and MIN_RUNS times and,
+when it is quick, until it has taken MIN_SECONDS (at most MAX_RUNS times, and
+past MAX_SECONDS only up to --repeat). Times are CPU time of this process
+(time.process_time; the benchmarks run in-process and don't wait on anything
+else), which other processes competing for the CPU don't inflate the way they
+do wall time; the best wall time is recorded alongside. The best time, the
+least sensitive to a noisy machine, is compared to
+benchmarks/baselines/<scale>.json.
+
+Baselines are host-specific. Every timed run is preceded by a fixed reference
+workload (`reference`, pure Python and in-memory SQLite), and the baseline is
+also scaled by how much slower or faster the best reference time is now. A
+benchmark has regressed only if it is slower than both the recorded and the
+scaled baseline by more than the threshold: a busy machine slows the
+reference and the benchmarks, though not by the same factor. It is then
+measured once more and the better of the two counts; the run fails only if
+that is still too slow. Differences under NOISE_FLOOR_MS are never reported.
+
+    python -m benchmarks.micro --scale 1k                 # compare, exit 1 on regression
+    python -m benchmarks.micro --scale 1k --save          # record a new baseline
+    python -m benchmarks.micro --scale 100k --only browse close_expired_auctions
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+HERE      = os.path.dirname(os.path.abspath(__file__))
+BASELINES = os.path.join(HERE, "baselines")
+
+SCALES = {'1k': 1_000, '100k': 100_000, '1m': 1_000_000}
+DEFAULT_THRESHOLD_PCT = 25
+NOISE_FLOOR_MS = 2
+MIN_SECONDS = 1.0
+MIN_RUNS = 15             # best of 5 or 6 slow runs still swung by 40% under load
+MAX_SECONDS = 15.0
+MAX_RUNS = 200
+MEAN_BIDS = 10
+PROXY_STEPS = 50
+
+BENCHMARKS = {}
+
+
+def benchmark(fn):
+    """Register `fn(ctx)`; it does its untimed setup and returns the callable to time."""
+    BENCHMARKS[fn.__name__] = fn
+    return fn
+
+
+def reference():
+    """The fixed workload the benchmarks are measured against; a few ms."""
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, k INTEGER, v TEXT)")
+    conn.executemany("INSERT INTO t (k, v) VALUES (?, ?)",
+                     ((i % 97, f"value {i}") for i in range(1500)))
+    rows = conn.execute("SELECT k, count(*), max(v) FROM t GROUP BY k ORDER BY k").fetchall()
+    json.dumps(sorted(rows, key=lambda r: r[2]))
+    conn.close()
+
+
+# ---- the hot paths ----
+
+@benchmark
+def proxy_bid_resolution(ctx):
+    """auction_detail POST that triggers PROXY_STEPS rounds of the auto-bid loop."""
+    from app import db
+    from app.models import Bid
+    (rival_id, rival), (bidder_id, bidder) = ctx.users
+    a = ctx.next_open_auction(exclude_sellers=(rival_id, bidder_id))
+    top = db.session.query(db.func.max(Bid.amount)).filter_by(auction_id=a.id).scalar() \
+          or a.init_price
+    db.session.add(Bid(auction_id=a.id, bidder=rival, bidder_id=rival_id,
+                       amount=top + a.increment,
+                       max_bid=top + a.increment * PROXY_STEPS))
+    db.session.commit()
+    ceiling = top + a.increment * (PROXY_STEPS + 10)
+    client  = ctx.client_for(bidder)
+    return lambda: client.post(f'/auctions/{a.id}/detail', data={'max_bid': ceiling})
+
+
+@benchmark
+def close_expired_auctions(ctx):
+    """The scheduler's close job over a batch of freshly expired auctions."""
+    from app import db
+    from app.models import Auction
+    from app.tasks import close_auctions
+    ids = [a.id for a in Auction.query.filter(Auction.status == 'closed')
+                                      .order_by(Auction.id.desc()).limit(200)]
+    Auction.query.filter(Auction.id.in_(ids)).update(
+        {'status': 'open', 'winner_id': None, 'winning_bid': None,
+         'end_time': datetime.utcnow() - timedelta(minutes=1)},
+        synchronize_session=False)
+    db.session.commit()
+    return close_auctions
+
+
+@benchmark
+def process_alerts(ctx):
+    from app.tasks import process_alerts
+    return process_alerts
+
+
+@benchmark
+def admin_detail(ctx):
+    client = ctx.client_for('admin')
+    return lambda: client.get('/admin/1')
+
+
+@benchmark
+def browse(ctx):
+    client = ctx.client_for(ctx.users[0][1])
+    return lambda: client.get('/browse?q=camera&status=open')
+
+
+@benchmark
+def index(ctx):
+    """GET /: a card for every item."""
+    client = ctx.client_for(ctx.users[0][1])
+    return lambda: client.get('/')
+
+
+@benchmark
+def auction_page(ctx):
+    """GET /auctions/<id>/detail for the auction with the most bids."""
+    from app import db
+    from app.models import Bid
+    auction_id = db.session.execute(
+        db.select(Bid.auction_id).group_by(Bid.auction_id)
+          .order_by(db.func.count().desc()).limit(1)).scalar()
+    client = ctx.client_for(ctx.users[0][1])
+    return lambda: client.get(f'/auctions/{auction_id}/detail')
+
+
+@benchmark
+def list_auctions(ctx):
+    """GET /auctions: every auction as JSON."""
+    client = ctx.app.test_client()
+    return lambda: client.get('/auctions')
+
+
+@benchmark
+def search_auctions(ctx):
+    client = ctx.app.test_client()
+    return lambda: client.get('/auctions/search?status=open')
+
+
+@benchmark
+def user_auctions(ctx):
+    """GET /users/<name>/auctions for the seller with the most auctions."""
+    from app import db
+    from app.models import Auction, User
+    seller = db.session.execute(
+        db.select(User.username).join(Auction, Auction.seller_id == User.id)
+          .group_by(User.id).order_by(db.func.count().desc()).limit(1)).scalar()
+    client = ctx.app.test_client()
+    return lambda: client.get(f'/users/{seller}/auctions')
+
+
+@benchmark
+def list_bids(ctx):
+    """GET /auctions/<id>/bids for the auction with the most bids."""
+    from app import db
+    from app.models import Bid
+    auction_id = db.session.execute(
+        db.select(Bid.auction_id).group_by(Bid.auction_id)
+          .order_by(db.func.count().desc()).limit(1)).scalar()
+    client = ctx.app.test_client()
+    return lambda: client.get(f'/auctions/{auction_id}/bids')
+
+
+@benchmark
+def list_questions(ctx):
+    client = ctx.client_for(ctx.users[0][1])
+    return lambda: client.get('/questions')
+
+
+# ---- harness ----
+
+class Context:
+    """Per-benchmark state shared by its repetitions (plain values, no ORM objects)."""
+
+    def __init__(self, app):
+        from app.models import User
+        self.app     = app
+        self.clients = {}
+        with app.app_context():
+            self.users = [(u.id, u.username) for u in
+                          User.query.filter(User.is_admin == False, User.is_rep == False)
+                                    .order_by(User.id).limit(2)]
+        self._used   = set()
+
+    def client_for(self, username):
+        if username not in self.clients:
+            c = self.app.test_client()
+            c.post('/auth/login', data={'username': username, 'password': 'password'})
+            self.clients[username] = c
+        return self.clients[username]
+
+    def next_open_auction(self, exclude_sellers=()):
+        from app.models import Auction
+        a = (Auction.query
+                    .filter(Auction.status == 'open',
+                            Auction.end_time > datetime.utcnow() + timedelta(hours=1),
+                            ~Auction.seller_id.in_(exclude_sellers),
+                            ~Auction.id.in_(self._used or {0}))
+                    .order_by(Auction.id).first())
+        if a is None:
+            # small scales run out of open auctions: reopen one for another day
+            from app import db
+            a = (Auction.query
+                        .filter(~Auction.seller_id.in_(exclude_sellers),
+                                ~Auction.id.in_(self._used or {0}))
+                        .order_by(Auction.id).first())
+            a.status, a.winner_id, a.winning_bid = 'open', None, None
+            a.end_time = datetime.utcnow() + timedelta(days=1)
+            db.session.commit()
+        self._used.add(a.id)
+        return a
+
+
+def build(scale, data_dir):
+    """Pristine database for `scale` (generated once, rollups included)."""
+    pristine = os.path.join(data_dir, f"{scale}.db")
+    if os.path.exists(pristine):
+        return pristine
+    from benchmarks.datagen import generate
+    bids = SCALES[scale]
+    auctions = max(100, bids // MEAN_BIDS)
+    tmp = pristine + ".tmp"
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(tmp + suffix):
+            os.remove(tmp + suffix)
+    print(f"generating {scale} dataset in {pristine} ...", file=sys.stderr)
+    generate(f"sqlite:///{tmp}", users=max(100, bids // 100), items=max(100, auctions // 2),
+             auctions=auctions, bids=MEAN_BIDS, alerts=max(50, bids // 500),
+             questions=max(100, bids // 100), log=lambda *a: None)
+    subprocess.run([sys.executable, "-m", "flask", "--app", "run", "rebuild-rollups"],
+                   env=dict(os.environ, DATABASE_URL=f"sqlite:///{tmp}"), check=True,
+                   cwd=os.path.dirname(HERE), stdout=subprocess.DEVNULL)
+    os.replace(tmp, pristine)
+    return pristine
+
+
+def restore(app, pristine, work):
+    from app import db
+    with app.app_context():
+        db.engine.dispose()
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(work + suffix):
+            os.remove(work + suffix)
+    shutil.copyfile(pristine, work)
+
+
+def run_scale(scale, names, repeat, data_dir):
+    pristine = build(scale, data_dir)
+    work     = os.path.join(tempfile.mkdtemp(), "work.db")
+    shutil.copyfile(pristine, work)
+    os.environ["DATABASE_URL"] = f"sqlite:///{work}"
+    os.environ["RATE_LIMIT_ENABLED"] = "false"     # one user bids faster than any person
+
+    from app import create_app
+    app = create_app(scheduler=False)              # no background closing mid-benchmark
+    app.config['MAIL_SUPPRESS_SEND'] = True        # outbid e-mails
+
+    results = {}
+    for name in names:
+        restore(app, pristine, work)
+        times, walls, refs, ctx, warm = [], [], [], Context(app), False
+        # the first round only warms caches; quick benchmarks then get more runs,
+        # since the best of a handful of millisecond timings is still mostly noise
+        while not (len(times) >= repeat
+                   and ((len(times) >= MIN_RUNS and sum(times) >= MIN_SECONDS * 1000)
+                        or len(times) >= MAX_RUNS or sum(times) >= MAX_SECONDS * 1000)):
+            with app.app_context():
+                fn = BENCHMARKS[name](ctx)
+                c0 = time.process_time()
+                reference()
+                c1, t1 = time.process_time(), time.perf_counter()
+                result = fn()
+                if getattr(result, 'status_code', 200) >= 500:
+                    raise RuntimeError(f"{name}: HTTP {result.status_code}")
+                if warm:
+                    times.append((time.process_time() - c1) * 1000)
+                    walls.append((time.perf_counter() - t1) * 1000)
+                    refs.append((c1 - c0) * 1000)
+                warm = True
+        results[name] = {'median_ms':   round(statistics.median(times), 3),
+                         'min_ms':      round(min(times), 3),
+                         'ref_ms':      round(min(refs), 3),
+                         'wall_min_ms': round(min(walls), 3),
+                         'runs':        len(times)}
+    return results
+
+
+def compare(scale, results, threshold_pct):
+    """Print the comparison with the baseline; returns the names that regressed."""
+    path = os.path.join(BASELINES, f"{scale}.json")
+    if not os.path.exists(path):
+        print(f"no baseline at {path}; run with --save to record one")
+        return []
+    with open(path) as f:
+        baseline = json.load(f)
+    default = baseline.get('threshold_pct', threshold_pct)
+
+    regressed = []
+    print(f"{'benchmark (best of N)':26} {'baseline ms':>12} {'scaled ms':>10} {'now ms':>10} "
+          f"{'delta':>8}  status")
+    for name, r in results.items():
+        base = baseline['results'].get(name)
+        if base is None:
+            print(f"{name:26} {'-':>12} {'':>10} {r['min_ms']:10.2f} {'':>8}  new")
+            continue
+        limit = base.get('threshold_pct', default)
+        # the baseline scaled to this machine's speed right now (older files lack ref_ms);
+        # load slows the reference and the benchmarks by different factors, so only a
+        # benchmark slower than both the recorded and the scaled baseline has regressed
+        scaled = base['min_ms'] * (r['ref_ms'] / base['ref_ms'] if 'ref_ms' in base else 1)
+        expected = max(base['min_ms'], scaled)
+        delta = (r['min_ms'] / expected - 1) * 100
+        slow  = delta > limit and r['min_ms'] - expected > NOISE_FLOOR_MS
+        if slow:
+            regressed.append(name)
+        status = f'REGRESSION (> {limit}%)' if slow else 'ok'
+        print(f"{name:26} {base['min_ms']:12.2f} {scaled:10.2f} {r['min_ms']:10.2f} "
+              f"{delta:+7.1f}%  {status}")
+    return regressed
+
+
+def save(scale, results, threshold_pct):
+    os.makedirs(BASELINES, exist_ok=True)
+    path = os.path.join(BASELINES, f"{scale}.json")
+    merged = {}
+    if os.path.exists(path):                       # keep benchmarks not re-run (--only)
+        with open(path) as f:
+            merged = json.load(f)['results']
+    merged.update(results)
+    with open(path, "w") as f:
+        json.dump({
+            'scale':         scale,
+            'threshold_pct': threshold_pct,
+            'recorded_at':   datetime.utcnow().isoformat(timespec='seconds'),
+            'machine':       f"{platform.machine()} {platform.python_implementation()} "
+                             f"{platform.python_version()}",
+            'results':       merged,
+        }, f, indent=2, sort_keys=True)
+        f.write("\n")
+    print(f"saved {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scale", choices=SCALES, default="1k")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=list(BENCHMARKS))
+    parser.add_argument("--repeat", type=int, default=5, help="minimum timed runs")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD_PCT,
+                        help="allowed slowdown in percent (baseline file may override)")
+    parser.add_argument("--save", action="store_true", help="write results as the new baseline")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "dp_bench"))
+    args = parser.parse_args()
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    results = run_scale(args.scale, args.only, args.repeat, args.data_dir)
+    if args.save:
+        save(args.scale, results, args.threshold)
+        return
+    regressed = compare(args.scale, results, args.threshold)
+    if regressed:
+        # one slow sample is often the machine; a second measurement must agree
+        print(f"\nmeasuring again: {' '.join(regressed)}")
+        again = run_scale(args.scale, regressed, args.repeat, args.data_dir)
+        results = {name: min(results[name], again[name], key=lambda r: r['min_ms'] / r['ref_ms'])
+                   for name in regressed}
+        if compare(args.scale, results, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# benchmarks/startup.py
+"""
+Process startup cost: import, create_app, time to first request, loading the
+heavy templates, filling the membership index (servers only), CLI round trip.
+
+Every sample is a fresh interpreter, like a restarted or newly forked worker,
+against a throwaway SQLite database that already has the schema. The Jinja
+bytecode cache lives in a throwaway folder too, so only the first sample
+compiles the templates from source.
+
+    python -m benchmarks.startup --repeat 5
+    python -m benchmarks.startup --repeat 5 --users 300000   # a realistic user table
+    python -m benchmarks.startup --repeat 5 --scheduler     # with background jobs
+    JINJA_BYTECODE_CACHE=false python -m benchmarks.startup  # compile in every worker
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PHASES = r"""
+import json, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+application = app.create_app()
+t2 = time.perf_counter()
+client = application.test_client()
+client.get("/ping")
+t3 = time.perf_counter()
+for name in ("auctions/detail.html", "browse.html", "index.html", "rep/detail.html"):
+    application.jinja_env.get_template(name)
+t4 = time.perf_counter()
+app.membership.preload(application)        # what wsgi.py and the ASGI app add
+t5 = time.perf_counter()
+print(json.dumps({"import": t1 - t0, "create_app": t2 - t1, "first_request": t3 - t2,
+                  "templates": t4 - t3, "membership_preload": t5 - t4}))
+import os; os._exit(0)
+"""
+
+SERVER = ("from app import create_app; "
+          "create_app().run(host='127.0.0.1', port={port}, threaded=True)")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def in_process(env):
+    out = subprocess.run([sys.executable, "-c", PHASES], env=env, cwd=ROOT, check=True,
+                         capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def first_response(env, timeout=30):
+    """Seconds from spawning a server process to its first 200 on /ping."""
+    port = free_port()
+    t0   = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-c", SERVER.format(port=port)], env=env, cwd=ROOT,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - t0 < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/ping", timeout=1) as r:
+                    if r.status == 200:
+                        return time.perf_counter() - t0
+            except OSError:
+                time.sleep(0.005)
+        raise RuntimeError("server did not answer /ping")
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def cli(env):
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, "-m", "flask", "--app", "run", "routes"], env=env, cwd=ROOT,
+                   check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - t0
+
+
+def prepare(path, users):
+    """Create the schema once so the timed runs only pay for what a restart pays."""
+    from benchmarks.datagen import generate
+    generate(f"sqlite:///{path}", users=users, items=10, auctions=10, alerts=0, questions=0,
+             log=lambda *a: None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--scheduler", action="store_true",
+                        help="start the background scheduler in every process")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "startup.db")
+    env  = dict(os.environ, DATABASE_URL=f"sqlite:///{path}",
+                JINJA_CACHE_DIR=os.path.join(os.path.dirname(path), "jinja-cache"),
+                SCHEDULER_ENABLED="true" if args.scheduler else "false")
+    prepare(path, args.users)
+
+    samples = {"import": [], "create_app": [], "first_request": [], "templates": [],
+               "membership_preload": [],
+               "spawn_to_first_response": [], "cli_round_trip": []}
+    for _ in range(args.repeat):
+        for phase, seconds in in_process(env).items():
+            samples[phase].append(seconds)
+        samples["spawn_to_first_response"].append(first_response(env))
+        samples["cli_round_trip"].append(cli(env))
+
+    print(f"{'phase':26} {'median ms':>10} {'min ms':>8}")
+    for phase, values in samples.items():
+        print(f"{phase:26} {statistics.median(values) * 1000:10.1f} {min(values) * 1000:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
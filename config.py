@@ -10,4 +10,121 @@ class Config:
     MAIL_USE_TLS  = False
     MAIL_USERNAME = None
     MAIL_PASSWORD = None
-    MAIL_DEFAULT_SENDER = "no-reply@buyme.com"
\ No newline at end of file
+    MAIL_DEFAULT_SENDER = "no-reply@buyme.com"
+
+    # background jobs: each tick must win a lease row in `job_lease` first.
+    # Only processes with SCHEDULER_ENABLED=true (or `flask --app run scheduler`) run them.
+    SCHEDULER_ENABLED         = os.environ.get("SCHEDULER_ENABLED", "false").lower() == "true"
+    CLOSE_AUCTIONS_INTERVAL   = int(os.environ.get("CLOSE_AUCTIONS_INTERVAL", 60))
+    JOB_LEASE_SECONDS         = int(os.environ.get("JOB_LEASE_SECONDS", 180))
+    JOB_SHARDS                = int(os.environ.get("JOB_SHARDS", 1))
+    JOB_MAX_SHARDS_PER_WORKER = int(os.environ.get("JOB_MAX_SHARDS_PER_WORKER", 0))
+
+    # rows fetched per round trip by the streaming /admin/export endpoints
+    EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", 1000))
+
+    # logged-in user cache (app/identity.py); size 0 turns it off
+    USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", 10000))
+    USER_CACHE_TTL  = int(os.environ.get("USER_CACHE_TTL", 60))
+
+    # in-memory username/email index behind /auth/check_username and check_email
+    # (app/membership.py); MEMBERSHIP_EXACT=false keeps only the Bloom filter and
+    # asks the database when it says "maybe". MEMBERSHIP_PRELOAD fills it when a
+    # server (wsgi.py, the ASGI app) starts; elsewhere it is filled on first use
+    MEMBERSHIP_PRELOAD    = os.environ.get("MEMBERSHIP_PRELOAD", "true").lower() == "true"
+    MEMBERSHIP_EXACT      = os.environ.get("MEMBERSHIP_EXACT", "true").lower() == "true"
+    MEMBERSHIP_ERROR_RATE = float(os.environ.get("MEMBERSHIP_ERROR_RATE", 0.01))
+    MEMBERSHIP_REFRESH    = int(os.environ.get("MEMBERSHIP_REFRESH", 5))
+
+    # password hashing process pool (app/passwords.py); 0 workers hashes inline.
+    # Stored hashes made with another method are replaced on the next login.
+    PASSWORD_HASH_METHOD      = os.environ.get("PASSWORD_HASH_METHOD", "scrypt")
+    PASSWORD_POOL_WORKERS     = int(os.environ.get("PASSWORD_POOL_WORKERS", 2))
+    PASSWORD_POOL_QUEUE       = int(os.environ.get("PASSWORD_POOL_QUEUE", 16))
+    PASSWORD_POOL_TIMEOUT     = float(os.environ.get("PASSWORD_POOL_TIMEOUT", 10))
+    PASSWORD_POOL_RETRY_AFTER = int(os.environ.get("PASSWORD_POOL_RETRY_AFTER", 1))
+
+    # rows per panel page on the customer-rep dashboard
+    REP_PAGE_SIZE = int(os.environ.get("REP_PAGE_SIZE", 25))
+
+    # hot/cold archival (app/archive.py): closed auctions older than this move to
+    # the *_archive tables; 0 turns the scheduled job off
+    ARCHIVE_AFTER_DAYS = int(os.environ.get("ARCHIVE_AFTER_DAYS", 90))
+    ARCHIVE_CHUNK_SIZE = int(os.environ.get("ARCHIVE_CHUNK_SIZE", 200))
+    ARCHIVE_INTERVAL   = int(os.environ.get("ARCHIVE_INTERVAL", 3600))
+
+    # auto-bid ladder compaction on closed auctions (app/compaction.py): runs of at
+    # least BID_COMPACT_MIN_RUN proxy steps become two bid_range rows; 0 turns it off
+    BID_COMPACT_MIN_RUN    = int(os.environ.get("BID_COMPACT_MIN_RUN", 4))
+    BID_COMPACT_CHUNK_SIZE = int(os.environ.get("BID_COMPACT_CHUNK_SIZE", 200))
+    BID_COMPACT_INTERVAL   = int(os.environ.get("BID_COMPACT_INTERVAL", 3600))
+
+    # user/auction deletion (app/purge.py): rows per chunk and transaction, an
+    # optional pause between chunks, and whether requests only queue the work
+    PURGE_BACKGROUND      = os.environ.get("PURGE_BACKGROUND", "true").lower() == "true"
+    PURGE_CHUNK_SIZE      = int(os.environ.get("PURGE_CHUNK_SIZE", 500))
+    PURGE_CHUNK_PAUSE_MS  = int(os.environ.get("PURGE_CHUNK_PAUSE_MS", 0))
+    PURGE_STALL_SECONDS   = int(os.environ.get("PURGE_STALL_SECONDS", 120))
+    PURGE_RESUME_INTERVAL = int(os.environ.get("PURGE_RESUME_INTERVAL", 60))
+
+    # /users/search autocomplete: default and maximum results per page
+    USER_SEARCH_LIMIT     = int(os.environ.get("USER_SEARCH_LIMIT", 10))
+    USER_SEARCH_MAX_LIMIT = int(os.environ.get("USER_SEARCH_MAX_LIMIT", 100))
+
+    # horizontal sharding of auctions and bids (app/sharding.py): extra SQLite
+    # files, comma-separated (relative paths live in instance/); shard 0 is
+    # SQLALCHEMY_DATABASE_URI itself. Empty keeps everything in one database.
+    SHARD_DATABASE_URIS = [u.strip() for u in os.environ.get("SHARD_DATABASE_URIS", "").split(",")
+                           if u.strip()]
+
+    # engine tuning (app/engine.py): PRAGMA profile for SQLite, pool for server DBs
+    SQLITE_PROFILE      = os.environ.get("SQLITE_PROFILE", "wal")   # default | wal | unsafe
+    SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE")
+    SQLITE_SYNCHRONOUS  = os.environ.get("SQLITE_SYNCHRONOUS")
+    SQLITE_BUSY_TIMEOUT = os.environ.get("SQLITE_BUSY_TIMEOUT")
+    SQLITE_CACHE_SIZE   = os.environ.get("SQLITE_CACHE_SIZE")
+    SQLITE_TEMP_STORE   = os.environ.get("SQLITE_TEMP_STORE")
+    SQLITE_MMAP_SIZE    = os.environ.get("SQLITE_MMAP_SIZE")
+    DB_POOL_SIZE        = int(os.environ.get("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW     = int(os.environ.get("DB_MAX_OVERFLOW", 20))
+    DB_POOL_RECYCLE     = int(os.environ.get("DB_POOL_RECYCLE", 280))
+    DB_POOL_PRE_PING    = os.environ.get("DB_POOL_PRE_PING", "true")
+    DB_POOL_TIMEOUT     = int(os.environ.get("DB_POOL_TIMEOUT", 30))
+
+    # Prometheus metrics on /metrics (app/metrics.py), for logged-in admins and for
+    # scrapers sending "Authorization: Bearer <METRICS_TOKEN>". The Server-Timing
+    # header (SQL time and query count) goes to admins only; "all" or "off" instead.
+    METRICS_ENABLED         = os.environ.get("METRICS_ENABLED", "true").lower() == "true"
+    METRICS_TOKEN           = os.environ.get("METRICS_TOKEN")
+    METRICS_SLOW_REQUEST_MS = int(os.environ.get("METRICS_SLOW_REQUEST_MS", 1000))
+    SERVER_TIMING           = os.environ.get("SERVER_TIMING", "admin")     # admin | all | off
+
+    # slow-query log (app/slowlog.py, /admin/slow-queries); 0 turns it off
+    SLOW_QUERY_MS          = int(os.environ.get("SLOW_QUERY_MS", 100))
+    SLOW_QUERY_MAX_ENTRIES = int(os.environ.get("SLOW_QUERY_MAX_ENTRIES", 500))
+    SLOW_QUERY_EXPLAIN     = os.environ.get("SLOW_QUERY_EXPLAIN", "true").lower() == "true"
+
+    # per-request profiling for admins (app/profiling.py); files go to
+    # PROFILE_DIR (default instance/profiles), newest PROFILE_KEEP are kept
+    PROFILE_ENABLED            = os.environ.get("PROFILE_ENABLED", "true").lower() == "true"
+    PROFILE_DIR                = os.environ.get("PROFILE_DIR")
+    PROFILE_KEEP               = int(os.environ.get("PROFILE_KEEP", 50))
+    PROFILE_SAMPLE_INTERVAL_MS = float(os.environ.get("PROFILE_SAMPLE_INTERVAL_MS", 1))
+
+    # template caching (app/fragments.py): compiled templates on disk in
+    # JINJA_CACHE_DIR (default instance/jinja-cache), rendered fragments in
+    # memory (~1 KB each). / renders a card per item, so keep the fragment cache
+    # above the item count or every page evicts its own cards; 0 turns it off
+    JINJA_BYTECODE_CACHE = os.environ.get("JINJA_BYTECODE_CACHE", "true").lower() == "true"
+    JINJA_CACHE_DIR      = os.environ.get("JINJA_CACHE_DIR")
+    FRAGMENT_CACHE_SIZE  = int(os.environ.get("FRAGMENT_CACHE_SIZE", 65536))
+
+    # bid admission control (app/ratelimit.py): token buckets per bidder and per
+    # auction, RATE tokens a second up to BURST; a rate of 0 turns that limit off.
+    # Buckets are per process unless RATE_LIMIT_STORAGE names a shared SQLite file.
+    RATE_LIMIT_ENABLED    = os.environ.get("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_STORAGE    = os.environ.get("RATE_LIMIT_STORAGE", "memory")   # or sqlite:///ratelimit.db
+    BID_RATE_PER_USER     = float(os.environ.get("BID_RATE_PER_USER", 1))
+    BID_BURST_PER_USER    = int(os.environ.get("BID_BURST_PER_USER", 5))
+    BID_RATE_PER_AUCTION  = float(os.environ.get("BID_RATE_PER_AUCTION", 10))
+    BID_BURST_PER_AUCTION = int(os.environ.get("BID_BURST_PER_AUCTION", 30))
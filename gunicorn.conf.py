@@ -0,0 +1,38 @@
+# gunicorn.conf.py
+"""
+Production server: pre-forked gthread workers with the app preloaded.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+    kill -HUP  <master pid>    # graceful restart of the workers (same code)
+    kill -USR2 <master pid>    # new master with new code; then -QUIT the old one
+
+The app is built once in the master and shared copy-on-write by the workers.
+With preload_app a HUP starts new workers from the same code, finishing the
+old workers' requests within GUNICORN_GRACEFUL_TIMEOUT; USR2 re-executes the
+master to pick up new code. Per-worker state is set up in app/prefork.py.
+"""
+import multiprocessing
+import os
+
+bind                = os.environ.get("GUNICORN_BIND", "127.0.0.1:5000")
+workers             = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+threads             = int(os.environ.get("GUNICORN_THREADS", 4))
+worker_class        = "gthread"
+preload_app         = True
+timeout             = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout    = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive           = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+# recycle workers after this many requests (0: never), spread by the jitter
+max_requests        = int(os.environ.get("GUNICORN_MAX_REQUESTS", 0))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 50))
+accesslog           = os.environ.get("GUNICORN_ACCESS_LOG")     # "-" for stdout
+
+
+def post_fork(server, worker):
+    from app.prefork import after_fork
+    after_fork(server.app.wsgi())
+
+
+def worker_exit(server, worker):
+    from app.prefork import before_exit
+    before_exit(server.app.wsgi())
@@ -1,7 +1,10 @@
 from app import create_app
 
-app = create_app()
-
 if __name__ == "__main__":
+    # the dev server also runs the background jobs; other processes opt in
+    # with SCHEDULER_ENABLED=true or run `flask --app run scheduler`
+    app = create_app(scheduler=True)
     # debug=True enables auto-reload on code changes
     app.run(host="127.0.0.1", port=5000, debug=True)
+else:
+    app = create_app()
@@ -0,0 +1,8 @@
+from app import create_app, membership
+
+# production entry point: gunicorn -c gunicorn.conf.py wsgi:app
+# the scheduler starts in each worker after the fork (app/prefork.py), never in
+# the master, whose threads the workers would not inherit
+app = create_app(scheduler=False)
+# loaded once here, the workers share the username/email index copy-on-write
+membership.preload(app)